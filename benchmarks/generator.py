@@ -0,0 +1,256 @@
+import os
+import json
+import datetime
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# --- Synthetic GA4 data ---
+# Writes a Parquet replica (database/backend.py layout) with the shape of the
+# GA4 export: sessions of a few events from recurring users, skewed page,
+# browser and source popularity. Data is generated in fixed-size chunks so
+# 500M-row datasets never have to fit in memory.
+SCALES = {
+    "1m": 1_000_000,
+    "10m": 10_000_000,
+    "100m": 100_000_000,
+    "500m": 500_000_000,
+}
+CHUNK_ROWS = 1_000_000
+EVENTS_PER_SESSION = 8
+SESSIONS_PER_USER = 2.5
+START_DATE = datetime.date(2025, 1, 1)
+
+EVENT_NAMES = ["page_view", "user_engagement", "scroll", "session_start", "first_visit", "click", "conversion"]
+EVENT_WEIGHTS = [0.45, 0.2, 0.15, 0.08, 0.04, 0.06, 0.02]
+DEVICES = ["desktop", "mobile", "tablet"]
+DEVICE_WEIGHTS = [0.55, 0.4, 0.05]
+BROWSERS = ["Chrome", "Safari", "Edge", "Firefox", "Samsung Internet", "Opera"]
+BROWSER_WEIGHTS = [0.62, 0.2, 0.08, 0.05, 0.03, 0.02]
+SOURCES = ["google", "(direct)", "bing", "facebook", "linkedin", "newsletter", "duckduckgo"]
+SOURCE_WEIGHTS = [0.5, 0.25, 0.08, 0.07, 0.04, 0.04, 0.02]
+MEDIUMS = {"google": "organic", "(direct)": "(none)", "bing": "organic", "facebook": "referral",
+           "linkedin": "referral", "newsletter": "email", "duckduckgo": "organic"}
+PAGE_COUNT = 300
+SITE_URL = "https://tech2dsm.example/"
+
+
+def _zipf_weights(n, exponent=1.1):
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    return weights / weights.sum()
+
+
+PAGES = np.array([SITE_URL] + [f"{SITE_URL}page-{i}.html" for i in range(1, PAGE_COUNT)], dtype=object)
+PAGE_WEIGHTS = _zipf_weights(PAGE_COUNT)
+
+
+def _pick(rng, choices, weights, size):
+    return np.asarray(choices, dtype=object)[rng.choice(len(choices), size=size, p=weights)]
+
+
+def _chunk_sessions(total_rows, chunk_rows):
+    """Sessions per chunk; each chunk owns its sessions so none span two files."""
+    sessions = max(1, total_rows // EVENTS_PER_SESSION)
+    chunks = max(1, -(-total_rows // chunk_rows))
+    per_chunk = np.full(chunks, sessions // chunks, dtype=np.int64)
+    per_chunk[:sessions % chunks] += 1
+    return per_chunk
+
+
+def generate_chunk(chunk_index, sessions, first_session, user_count, days, seed=0, start_date=START_DATE):
+    """
+    One chunk of cleaned_events rows (the columns of the GA4 cleaning query).
+    Every row of a session shares its user, device, browser and source;
+    event times follow the session start by exponential gaps.
+    """
+    rng = np.random.default_rng([seed, chunk_index])
+    lengths = rng.geometric(1.0 / EVENTS_PER_SESSION, size=sessions)
+    rows = int(lengths.sum())
+    session_ids = np.arange(first_session, first_session + sessions)
+
+    starts = (
+        np.datetime64(start_date, "us")
+        + rng.integers(0, days * 86_400_000_000, size=sessions).astype("timedelta64[us]")
+    )
+    sources = _pick(rng, SOURCES, SOURCE_WEIGHTS, sessions)
+    per_session = {
+        "session_id": np.char.add("s", session_ids.astype(str)).astype(object),
+        "user_pseudo_id": np.char.add("u", rng.integers(0, user_count, size=sessions).astype(str)).astype(object),
+        "device_category": _pick(rng, DEVICES, DEVICE_WEIGHTS, sessions),
+        "browser": _pick(rng, BROWSERS, BROWSER_WEIGHTS, sessions),
+        "source": sources,
+        "medium": pd.Series(sources).map(MEDIUMS).to_numpy(dtype=object),
+    }
+
+    # Offset of each event inside its session: cumulative gaps, restarting per session
+    gaps = rng.exponential(45_000_000, size=rows).astype(np.int64)
+    session_of_row = np.repeat(np.arange(sessions), lengths)
+    elapsed = np.cumsum(gaps)
+    offsets = elapsed - np.repeat(elapsed[np.cumsum(lengths) - lengths], lengths)
+
+    pages = PAGES[rng.choice(PAGE_COUNT, size=rows, p=PAGE_WEIGHTS)]
+    df = pd.DataFrame({
+        "event_datetime": pd.to_datetime(starts[session_of_row] + offsets.astype("timedelta64[us]"), utc=True),
+        "event_name": _pick(rng, EVENT_NAMES, EVENT_WEIGHTS, rows),
+        "page_url": pages,
+        "page_title": pd.Series(pages).str.rsplit("/", n=1).str[-1].replace("", "Home").to_numpy(dtype=object),
+    })
+    for column, values in per_session.items():
+        df[column] = values[session_of_row]
+    return df[["event_datetime", "event_name", "session_id", "user_pseudo_id", "device_category",
+               "browser", "page_url", "page_title", "source", "medium"]]
+
+
+def raw_events_table(df):
+    """
+    The GA4 export form of a cleaned_events chunk: event_timestamp in
+    microseconds, page_location/page_title/ga_session_id in the repeated
+    event_params record, and the day's shard name in _TABLE_SUFFIX.
+    """
+    rows = len(df)
+    timestamps = df["event_datetime"].to_numpy(dtype="datetime64[us]")
+    ga_session_id = df["session_id"].str.slice(1).astype(np.int64).to_numpy()
+
+    # Three params per event, laid out row by row
+    keys = np.tile(np.array(["page_location", "page_title", "ga_session_id"], dtype=object), rows)
+    string_values = np.empty(rows * 3, dtype=object)
+    string_values[0::3] = df["page_url"].to_numpy(dtype=object)
+    string_values[1::3] = df["page_title"].to_numpy(dtype=object)
+    int_values = np.zeros(rows * 3, dtype=np.int64)
+    int_values[2::3] = ga_session_id
+    int_mask = np.ones(rows * 3, dtype=bool)
+    int_mask[2::3] = False
+
+    value = pa.StructArray.from_arrays(
+        [pa.array(string_values, type=pa.string()), pa.array(int_values, mask=int_mask)],
+        names=["string_value", "int_value"],
+    )
+    params = pa.ListArray.from_arrays(
+        pa.array(np.arange(0, rows * 3 + 1, 3, dtype=np.int32)),
+        pa.StructArray.from_arrays([pa.array(keys, type=pa.string()), value], names=["key", "value"]),
+    )
+    web_info = pa.StructArray.from_arrays(
+        [pa.array(df["browser"].to_numpy(dtype=object), type=pa.string())], names=["browser"]
+    )
+    device = pa.StructArray.from_arrays(
+        [pa.array(df["device_category"].to_numpy(dtype=object), type=pa.string()), web_info],
+        names=["category", "web_info"],
+    )
+    traffic_source = pa.StructArray.from_arrays(
+        [pa.array(df["source"].to_numpy(dtype=object), type=pa.string()),
+         pa.array(df["medium"].to_numpy(dtype=object), type=pa.string())],
+        names=["source", "medium"],
+    )
+    return pa.table({
+        "event_date": pa.array(np.char.replace(np.datetime_as_string(timestamps, unit="D"), "-", "")),
+        "event_timestamp": pa.array(timestamps.astype(np.int64)),
+        "event_name": pa.array(df["event_name"].to_numpy(dtype=object), type=pa.string()),
+        "user_id": pa.nulls(rows, type=pa.string()),
+        "user_pseudo_id": pa.array(df["user_pseudo_id"].to_numpy(dtype=object), type=pa.string()),
+        "event_params": params,
+        "device": device,
+        "traffic_source": traffic_source,
+        "_TABLE_SUFFIX": pa.array(np.char.replace(np.datetime_as_string(timestamps, unit="D"), "-", "")),
+    })
+
+
+def scored_sessions_frame(df, seed=0):
+    """Per-session features and a synthetic bounce score, in the scored_sessions layout."""
+    sessions = df.assign(page_view=(df["event_name"] == "page_view").astype(np.int64)).groupby("session_id", sort=False).agg(
+        device_category=("device_category", "first"),
+        browser=("browser", "first"),
+        source=("source", "first"),
+        medium=("medium", "first"),
+        pages_per_session=("page_view", "sum"),
+        first_event=("event_datetime", "min"),
+        last_event=("event_datetime", "max"),
+    ).reset_index()
+    rng = np.random.default_rng([seed, len(sessions)])
+    sessions["session_duration"] = (sessions["last_event"] - sessions["first_event"]).dt.total_seconds().astype(np.int64)
+    sessions["is_bounce"] = (sessions["pages_per_session"] <= 1).astype(np.int64)
+    sessions["bounce_probability"] = np.clip(0.7 * sessions["is_bounce"] + rng.normal(0.15, 0.1, len(sessions)), 0, 1)
+    sessions["bounce_prediction"] = (sessions["bounce_probability"] >= 0.5).astype(np.int64)
+    return sessions.drop(columns=["first_event", "last_event"])
+
+
+def _write(table_dir, name, table):
+    os.makedirs(table_dir, exist_ok=True)
+    if isinstance(table, pd.DataFrame):
+        table = pa.Table.from_pandas(table, preserve_index=False)
+    pq.write_table(table, os.path.join(table_dir, name))
+
+
+def generate_dataset(parquet_dir, rows, days=30, seed=0, chunk_rows=CHUNK_ROWS, start_date=START_DATE, log=print):
+    """
+    Writes cleaned_events, the raw events shards (read as events_*),
+    scored_sessions, scored_users and top_traffic_sources under parquet_dir.
+    Returns the dataset description also saved as parquet_dir/dataset.json.
+    """
+    per_chunk = _chunk_sessions(rows, chunk_rows)
+    user_count = max(1, int(per_chunk.sum() / SESSIONS_PER_USER))
+    first_session = 0
+    written = 0
+    source_sessions = pd.Series(0, index=SOURCES, dtype=np.int64)
+
+    for chunk_index, sessions in enumerate(per_chunk):
+        df = generate_chunk(chunk_index, int(sessions), first_session, user_count, days, seed, start_date)
+        name = f"part-{chunk_index:05d}.parquet"
+        _write(os.path.join(parquet_dir, "cleaned_events"), name, df)
+        _write(os.path.join(parquet_dir, "events"), name, raw_events_table(df))
+        _write(os.path.join(parquet_dir, "scored_sessions"), name, scored_sessions_frame(df, seed))
+        source_sessions = source_sessions.add(df.groupby("source")["session_id"].nunique(), fill_value=0)
+        first_session += int(sessions)
+        written += len(df)
+        log(f"chunk {chunk_index + 1}/{len(per_chunk)}: {written:,} events")
+
+    # Every user gets a segment; scored_users is written in chunks as well
+    for start in range(0, user_count, chunk_rows):
+        rng = np.random.default_rng([seed, 1, start])
+        user_ids = np.arange(start, min(start + chunk_rows, user_count))
+        _write(os.path.join(parquet_dir, "scored_users"), f"part-{start // chunk_rows:05d}.parquet", pd.DataFrame({
+            "user_pseudo_id": np.char.add("u", user_ids.astype(str)).astype(object),
+            "centroid_id": rng.integers(0, 4, size=len(user_ids)),
+        }))
+
+    _write(os.path.join(parquet_dir, "top_traffic_sources"), "part-0.parquet", pd.DataFrame({
+        "source": source_sessions.index.to_numpy(dtype=object),
+        "session_count": source_sessions.to_numpy(dtype=np.int64),
+    }))
+
+    description = {
+        "rows": written,
+        "sessions": first_session,
+        "users": user_count,
+        "start_date": start_date.isoformat(),
+        "end_date": (start_date + datetime.timedelta(days=days - 1)).isoformat(),
+        "days": days,
+        "seed": seed,
+    }
+    with open(os.path.join(parquet_dir, "dataset.json"), 'w') as f:
+        json.dump(description, f, indent=2)
+    return description
+
+
+def load_description(parquet_dir):
+    """The dataset.json written by generate_dataset, or None when there is none."""
+    try:
+        with open(os.path.join(parquet_dir, "dataset.json"), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generate a synthetic GA4 Parquet replica for the DuckDB backend.")
+    parser.add_argument("--scale", choices=SCALES, default="1m", help="Number of events to generate")
+    parser.add_argument("--rows", type=int, help="Exact number of events (overrides --scale)")
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="Output folder (default: data/bench/<scale>)")
+    args = parser.parse_args()
+
+    generate_dataset(args.out or os.path.join("data", "bench", args.scale),
+                     args.rows or SCALES[args.scale], days=args.days, seed=args.seed)
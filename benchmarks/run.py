@@ -0,0 +1,266 @@
+import os
+import sys
+import json
+import time
+import shutil
+import datetime
+import resource
+import statistics
+import tempfile
+import subprocess
+
+from benchmarks.generator import SCALES, generate_dataset, load_description
+
+# --- Dashboard benchmarks ---
+# Runs every SQL template and every tab's pandas/Altair pipeline against a
+# synthetic Parquet replica on the DuckDB backend. Each case runs in its own
+# process so its peak RSS is not inflated by the cases before it.
+REPO_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+BENCH_DIR = os.path.join(REPO_DIR, "data", "bench")
+BASELINE_DIR = os.path.join(os.path.dirname(__file__), "baselines")
+DEFAULT_TOLERANCE = 0.25
+
+# Tabs not served by the dashboard cube or the top-K sketches, and the query that feeds each
+TAB_QUERIES = {
+    "User Segments": "phase_5_user_clusters",
+    "Bounce Prediction": "phase_5_predicted_bounce",
+}
+CUBE_TAB_KEYS = {"Traffic Trends": "trends", "Devices": "device", "Browser": "browser"}
+# Tables generate_dataset writes; materialize_local adds the rollups (database/rollup.py)
+DATASET_TABLES = ("cleaned_events", "events", "scored_sessions", "scored_users", "top_traffic_sources")
+
+
+def list_cases():
+    """Case ids: query:<template>, cube, topk, paths, and tab:<tab name>."""
+    from database.queries import TEMPLATES
+    from dashboard.charts import TAB_PIPELINES
+
+    return [f"query:{name}" for name in TEMPLATES] + ["cube", "topk", "paths"] + [f"tab:{name}" for name in TAB_PIPELINES]
+
+
+def prepare_dataset(parquet_dir, rows, days, seed):
+    """
+    Generates the dataset and its local rollups unless a matching one is
+    already on disk. A stale dataset's tables are removed first, so no part
+    or day files of the old one are left behind.
+    """
+    from database.rollup import ROLLUPS, materialize_local
+
+    description = load_description(parquet_dir)
+    wanted = {"seed": seed, "requested_rows": rows, "days": days}
+    if description is None or any(description.get(key) != value for key, value in wanted.items()):
+        for table in DATASET_TABLES + tuple(ROLLUPS):
+            shutil.rmtree(os.path.join(parquet_dir, table), ignore_errors=True)
+        description = generate_dataset(parquet_dir, rows, days=days, seed=seed)
+        description["requested_rows"] = rows
+        materialize_local(
+            datetime.date.fromisoformat(description["start_date"]),
+            datetime.date.fromisoformat(description["end_date"]),
+            parquet_dir,
+        )
+        with open(os.path.join(parquet_dir, "dataset.json"), 'w') as f:
+            json.dump(description, f, indent=2)
+    return description
+
+
+def _peak_rss_mb():
+    # Linux carries ru_maxrss over from the forking parent, VmHWM starts fresh at exec
+    try:
+        with open("/proc/self/status", 'r') as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 ** 2 if sys.platform == "darwin" else 1024)
+
+
+def run_case(case, parquet_dir, repeat=3):
+    """
+    Runs one case repeat times in this process.
+    Returns {"latency_s": [...], "rows": input rows, "peak_rss_mb"} or {"skipped": reason}.
+    """
+    from database.backend import DuckDBBackend
+    from database.queries import run_query, stream_query
+    from database.paths import PATHS_QUERY, analyze_paths
+    from database.planner import load_dashboard_cube
+    from database.topk import TOP_PAGES_CANDIDATES, TOP_PAGES_QUERY, top_k
+    from dashboard.charts import TAB_PIPELINES
+    from dashboard.tabs import TOPK_TABS
+
+    description = load_description(parquet_dir)
+    start_date = datetime.date.fromisoformat(description["start_date"])
+    end_date = datetime.date.fromisoformat(description["end_date"])
+    backend = DuckDBBackend(parquet_dir)
+    # Sketches are built on the first repeat; later repeats measure the merge
+    sketch_tmp = tempfile.TemporaryDirectory(prefix="bench-topk-")
+    sketch_dir = sketch_tmp.name
+
+    if case.startswith("query:"):
+        name = case.split(":", 1)[1]
+        params = {}
+        if name == TOP_PAGES_QUERY:
+            # Bound to the sketch candidates, as database/topk.py runs it
+            candidates = top_k("page_url", start_date, end_date, TOP_PAGES_CANDIDATES, backend, sketch_dir)
+            params["pages"] = candidates["item"].tolist()
+        step = lambda: run_query(name, start_date, end_date, backend=backend, **params)
+        rows = description["rows"]
+    elif case == "cube":
+        step = lambda: load_dashboard_cube(start_date, end_date, backend=backend)
+        rows = description["rows"]
+    elif case == "topk":
+        step = lambda: top_k("page_url", start_date, end_date, 20, backend, sketch_dir)
+        rows = description["rows"]
+    elif case == "paths":
+        # Streamed in batches, so peak RSS stays flat as the range grows
+        step = lambda: analyze_paths(stream_query(PATHS_QUERY, start_date, end_date, backend=backend)).transitions()
+        rows = description["rows"]
+    elif case.startswith("tab:"):
+        tab = case.split(":", 1)[1]
+        # The query is not part of the measurement, only the transform and chart spec
+        try:
+            if tab in TAB_QUERIES:
+                df = run_query(TAB_QUERIES[tab], start_date, end_date, backend=backend)
+            elif tab in TOPK_TABS:
+                df = TOPK_TABS[tab](start_date, end_date, backend=backend, sketch_dir=sketch_dir)
+            else:
+                df = load_dashboard_cube(start_date, end_date, backend=backend)[CUBE_TAB_KEYS[tab]]
+        except Exception as e:
+            return {"skipped": f"{type(e).__name__}: {e}".splitlines()[0]}
+        step = lambda: TAB_PIPELINES[tab](df).to_dict()
+        rows = len(df)
+    else:
+        raise ValueError(f"Unknown benchmark case '{case}'")
+
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            # SQL the local backend cannot run (e.g. BigQuery-only functions)
+            return {"skipped": f"{type(e).__name__}: {e}".splitlines()[0]}
+        latencies.append(time.perf_counter() - started)
+    return {"latency_s": latencies, "rows": rows, "peak_rss_mb": _peak_rss_mb()}
+
+
+def run_isolated(case, parquet_dir, repeat):
+    """Runs a case in a child process and returns its result."""
+    command = [sys.executable, "-m", "benchmarks.run", "--case", case,
+               "--data-dir", parquet_dir, "--repeat", str(repeat)]
+    completed = subprocess.run(command, capture_output=True, text=True, cwd=REPO_DIR)
+    if completed.returncode != 0:
+        lines = completed.stderr.strip().splitlines() or ["no output"]
+        return {"skipped": f"crashed: {lines[-1]}"}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def summarize(result):
+    """Median latency, peak RSS and rows/sec for one case."""
+    if "skipped" in result:
+        return result
+    latency = statistics.median(result["latency_s"])
+    return {
+        "latency_s": round(latency, 4),
+        "peak_rss_mb": round(result["peak_rss_mb"], 1),
+        "rows_per_sec": round(result["rows"] / latency) if latency else None,
+    }
+
+
+# --- Baselines ---
+def baseline_path(scale):
+    return os.path.join(BASELINE_DIR, f"{scale}.json")
+
+
+def load_baseline(scale):
+    try:
+        with open(baseline_path(scale), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_baseline(scale, summaries):
+    """Stores the results for this scale; cases not run this time keep their previous baseline."""
+    baseline = {**(load_baseline(scale) or {}), **summaries}
+    os.makedirs(BASELINE_DIR, exist_ok=True)
+    with open(baseline_path(scale), 'w') as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+
+
+def compare(summaries, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Returns a message per case whose latency or peak RSS grew more than tolerance over the baseline."""
+    regressions = []
+    for case, summary in summaries.items():
+        previous = baseline.get(case)
+        if not previous or "skipped" in summary or "skipped" in previous:
+            continue
+        for metric in ("latency_s", "peak_rss_mb"):
+            if summary[metric] > previous[metric] * (1 + tolerance):
+                regressions.append(
+                    f"{case}: {metric} {previous[metric]} -> {summary[metric]} "
+                    f"(+{(summary[metric] / previous[metric] - 1) * 100:.0f}%)"
+                )
+    return regressions
+
+
+def print_report(summaries):
+    width = max(len(case) for case in summaries)
+    print(f"{'case':<{width}}  {'latency':>10}  {'peak RSS':>10}  {'rows/sec':>14}")
+    for case, summary in summaries.items():
+        if "skipped" in summary:
+            print(f"{case:<{width}}  skipped ({summary['skipped']})")
+        else:
+            rows_per_sec = f"{summary['rows_per_sec']:,}" if summary["rows_per_sec"] is not None else "-"
+            print(f"{case:<{width}}  {summary['latency_s']:>9.3f}s  "
+                  f"{summary['peak_rss_mb']:>7.1f} MB  {rows_per_sec:>14}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard data layer on synthetic GA4 data.")
+    parser.add_argument("--scale", choices=SCALES, default="1m", help="Dataset size")
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", help="Dataset folder (default: data/bench/<scale>)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per case; the median is reported")
+    parser.add_argument("--only", help="Run only cases whose id contains this text")
+    parser.add_argument("--save-baseline", action="store_true", help="Store the results as the baseline for this scale")
+    parser.add_argument("--compare", action="store_true", help="Exit with status 1 if a case regressed against the baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="Allowed slowdown, e.g. 0.25 for 25%%")
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    data_dir = os.path.abspath(args.data_dir or os.path.join(BENCH_DIR, args.scale))
+
+    if args.case:
+        # Child process: run one case and print its raw result as JSON
+        print(json.dumps(run_case(args.case, data_dir, args.repeat)))
+        sys.exit(0)
+
+    description = prepare_dataset(data_dir, SCALES[args.scale], args.days, args.seed)
+    print(f"Dataset: {description['rows']:,} events, {description['sessions']:,} sessions, "
+          f"{description['start_date']} to {description['end_date']}")
+
+    summaries = {}
+    for case in list_cases():
+        if args.only and args.only not in case:
+            continue
+        summaries[case] = summarize(run_isolated(case, data_dir, args.repeat))
+    print_report(summaries)
+
+    if args.save_baseline:
+        save_baseline(args.scale, summaries)
+        print(f"Saved baseline to {baseline_path(args.scale)}")
+
+    if args.compare:
+        baseline = load_baseline(args.scale)
+        if baseline is None:
+            sys.exit(f"No baseline for scale {args.scale}; run with --save-baseline first")
+        regressions = compare(summaries, baseline, args.tolerance)
+        for message in regressions:
+            print(f"REGRESSION {message}")
+        sys.exit(1 if regressions else 0)
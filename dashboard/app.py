@@ -1,49 +1,299 @@
 import streamlit as st
 import pandas as pd
-import altair as alt
 import os
 import sys
 import datetime
 
 # Add parent directory to system path for imports from the 'database' folder
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from database.conn import get_bq_client
-
-# --- SQL query file paths ---
-query_kpis_file = os.path.join(os.path.dirname(__file__), '..', 'database', 'phase_3_kpis.sql')
-query_trends_file = os.path.join(os.path.dirname(__file__), '..', 'database', 'phase_4_trends.sql')
-query_top_pages_file = os.path.join(os.path.dirname(__file__), '..', 'database', 'phase_4_top_pages.sql')
-query_device_file = os.path.join(os.path.dirname(__file__), '..', 'database', 'phase_4_device_breakdown.sql')
-query_browser_file = os.path.join(os.path.dirname(__file__), '..', 'database', 'phase_4_browser_breakdown.sql')
-query_traffic_file = os.path.join(os.path.dirname(__file__), '..', 'database', 'phase_4_traffic_source.sql')  # fixed typo
-query_user_clusters_file = os.path.join(os.path.dirname(__file__), '..', 'database', 'phase_5_user_clusters.sql')
-query_bounce_file = os.path.join(os.path.dirname(__file__), '..', 'database', 'phase_5_predicted_bounce.sql')
+from database.backend import get_backend
+from database.queries import estimate_query, run_query
+from database.properties import get_property, list_properties
+from database.planner import (
+    CUBE_QUERY, EXACT_TOP_PAGES_QUERY, EXACT_USERS_QUERY, HLL_RELATIVE_ERROR, UNIQUE_VISITORS_QUERY,
+    apply_exact_counts, load_dashboard_cube,
+)
+from database.shards import MAX_BYTES_BILLED, format_bytes
+from database.scheduler import QueryScheduler, get_gate
+from database.result_cache import CACHE_TTL, get_result_cache, is_closed
+from database.tracing import clear as clear_spans, recent_spans, span
+from database.live import LIVE_POLL_SECONDS, LIVE_SOURCE, get_live_counters, poll_if_due
+from database.topk import TOPK_QUERY, topk_dir
+from database.paths import PATHS_QUERY, default_funnel
+from dashboard import charts
+from dashboard.tabs import CUBE_TABS, EXACT_QUERIES, PATH_TABS, TAB_NAMES, TAB_QUERIES, TOPK_TABS, query_hourly_trends
+from dashboard.snapshots import STANDARD_RANGES, load_snapshot, standard_range
+from dashboard.rendering import TABLE_PAGE_SIZE, page_count, page_slice, pick_granularity, prepare_trends, top_n_with_other
+
+# How often a missing snapshot is looked for again
+SNAPSHOT_CHECK_SECONDS = 300
 
 # --- Streamlit caching ---
-@st.cache_data
-def get_data_from_bigquery(query_file_path, start_date, end_date):
-    try:
-        with open(query_file_path, 'r') as f:
-            query_template = f.read()
-
-        start_date_str = start_date.strftime('%Y-%m-%d')
-        end_date_str = end_date.strftime('%Y-%m-%d')
+# Errors are raised rather than returned so failed or cancelled queries are never cached.
+# Arguments starting with "_" are not hashed by st.cache_data.
+# The in-memory cache sits in front of the on-disk ResultCache (database/result_cache.py),
+# which survives restarts and reuses already-fetched days across date ranges.
+# Every cached function takes the GA4 property key, so properties never share entries.
+@st.cache_data(ttl=CACHE_TTL)
+def get_data_from_bigquery(property_key, query_name, start_date, end_date, _tracker=None):
+    """
+    Runs a dashboard query on the configured backend (BigQuery or the local
+    DuckDB replica, see database/backend.py) with the dates bound as parameters.
+    """
+    prop = get_property(property_key)
+    key = f"{query_name}/{start_date.isoformat()}/{end_date.isoformat()}"
+    return get_result_cache(prop.cache_dir).get_or_fetch(
+        key,
+        lambda: run_query(query_name, start_date, end_date, backend=get_backend(prop), tracker=_tracker),
+        immutable=is_closed(end_date),
+    )
+
+@st.cache_data(ttl=CACHE_TTL)
+def get_dashboard_cube(property_key, start_date, end_date, _tracker=None):
+    """
+    KPI, trends, device and browser data from a single scan (database/planner.py).
+    """
+    prop = get_property(property_key)
+    return load_dashboard_cube(
+        start_date, end_date, backend=get_backend(prop), tracker=_tracker, cache=get_result_cache(prop.cache_dir),
+    )
+
+@st.cache_data(ttl=CACHE_TTL)
+def get_topk_tab(property_key, tab_name, start_date, end_date, _tracker=None):
+    """
+    Top Pages and Traffic Sources from the per-day top-K sketches (database/topk.py),
+    merged for the range instead of aggregating it.
+    """
+    prop = get_property(property_key)
+    return TOPK_TABS[tab_name](
+        start_date, end_date, backend=get_backend(prop), sketch_dir=topk_dir(prop.cache_dir), tracker=_tracker,
+    )
+
+@st.cache_data(ttl=CACHE_TTL)
+def get_paths_tab(property_key, tab_name, start_date, end_date, funnel_steps=(), _tracker=None):
+    """
+    Page transitions, top paths and a funnel from one streamed pass over the
+    range's page views (database/paths.py), cached per range and funnel.
+    """
+    prop = get_property(property_key)
+    return PATH_TABS[tab_name](
+        start_date, end_date, funnel_steps, backend=get_backend(prop), cache=get_result_cache(prop.cache_dir), tracker=_tracker,
+    )
+
+@st.cache_data(ttl=SNAPSHOT_CHECK_SECONDS)
+def get_snapshot(property_key, range_key, start_date, end_date):
+    """
+    Precomputed tabs for a standard range (dashboard/snapshots.py), or None
+    when no current snapshot has been built. The dates only key the cache,
+    so a new day picks up the new snapshot.
+    """
+    return load_snapshot(range_key, get_property(property_key))
+
+@st.cache_data(ttl=CACHE_TTL)
+def get_scan_estimates(property_key, start_date, end_date):
+    """
+    Dry-run byte estimates for every dashboard query, run in parallel and
+    only when the sidebar asks for them, so they never delay the first tab.
+    The dry runs go through the property's gate on the shared query pool,
+    like its other queries. Returns ({query: bytes}, {query: error});
+    estimates are empty on the local backend, where scans are not billed.
+    """
+    query_names = [CUBE_QUERY, UNIQUE_VISITORS_QUERY, TOPK_QUERY, PATHS_QUERY, *TAB_QUERIES.values(), EXACT_USERS_QUERY, EXACT_TOP_PAGES_QUERY]
+    if pick_granularity(start_date, end_date) == "hour":
+        query_names.append(query_hourly_trends)
+    prop = get_property(property_key)
+    backend, gate = get_backend(prop), get_gate(prop.key, prop.max_concurrent)
+    futures = {
+        query_name: gate.submit(estimate_query, query_name, start_date, end_date, backend)
+        for query_name in query_names
+    }
+    estimates, errors = {}, {}
+    for query_name, future in futures.items():
+        try:
+            estimated_bytes = future.result()
+        except Exception as e:
+            errors[query_name] = str(e).splitlines()[0] if str(e) else type(e).__name__
+            continue
+        if estimated_bytes is not None:
+            estimates[query_name] = estimated_bytes
+    return estimates, errors
+
+# --- Tab data loaders ---
+REFINE_POLL_SECONDS = 2
+APPROX_HELP = (
+    f"Approximate: HyperLogLog estimate, ±{HLL_RELATIVE_ERROR:.1%} standard error "
+    f"(95% within ±{2 * HLL_RELATIVE_ERROR:.1%}). Exact counts are computed in the background."
+)
 
-        query = query_template.format(
-            start_date=f"DATE('{start_date_str}')",
-            end_date=f"DATE('{end_date_str}')"
+def current_property():
+    """The GA4 property selected in the sidebar."""
+    return get_property(st.session_state.get("property_key"))
+
+def get_scheduler():
+    """
+    Per-session QueryScheduler for the selected property. All sessions share
+    one bounded thread pool, and each property's queries are admitted to it
+    through that property's gate, so a busy property cannot starve the others.
+    """
+    prop = current_property()
+    schedulers = st.session_state.setdefault("query_schedulers", {})
+    if prop.key not in schedulers:
+        schedulers[prop.key] = QueryScheduler(gate=get_gate(prop.key, prop.max_concurrent))
+    return schedulers[prop.key]
+
+def submit_tab_query(tab_name, start_date, end_date):
+    """
+    Dispatches the query behind a tab without waiting for it. The cube tabs
+    share one job, so at most five queries are in flight per date range.
+    """
+    scheduler, property_key = get_scheduler(), current_property().key
+    if tab_name == "Traffic Trends" and pick_granularity(start_date, end_date) == "hour":
+        # The cube only has days; short ranges are plotted per hour from cleaned_events
+        return scheduler.submit(
+            "hourly_trends", get_data_from_bigquery, property_key, query_hourly_trends, start_date, end_date,
         )
-
-        client = get_bq_client()
-        if client is None:
-            st.error("Failed to connect to BigQuery. Check your credentials.")
-            return pd.DataFrame()
-
-        df = client.query(query).to_dataframe()
-        return df
+    if tab_name in CUBE_TABS:
+        return scheduler.submit("cube", get_dashboard_cube, property_key, start_date, end_date)
+    if tab_name in TOPK_TABS:
+        return scheduler.submit(tab_name, get_topk_tab, property_key, tab_name, start_date, end_date)
+    if tab_name in PATH_TABS:
+        return scheduler.submit(tab_name, get_paths_tab, property_key, tab_name, start_date, end_date)
+    return scheduler.submit(tab_name, get_data_from_bigquery, property_key, TAB_QUERIES[tab_name], start_date, end_date)
+
+def load_tab_data(tab_name, start_date, end_date):
+    """
+    Returns the DataFrame behind one tab, waiting only for that tab's query.
+    Tabs in the range's snapshot are served from it without a query.
+    """
+    if snapshot is not None and tab_name in snapshot.data:
+        return snapshot.data[tab_name]
+    try:
+        with st.spinner(f"Loading {tab_name}..."), span("tab", tab=tab_name):
+            result = submit_tab_query(tab_name, start_date, end_date).result()
     except Exception as e:
         st.error(f"Error fetching data: {e}")
         return pd.DataFrame()
+    if isinstance(result, dict) and tab_name in CUBE_TABS:
+        return result.get(CUBE_TABS[tab_name], pd.DataFrame())
+    return result
+
+def failed_exact_queries(start_date, end_date):
+    """
+    {query name: error} for the exact-count queries that failed for the
+    selected property and this date range in this session. They are not
+    resubmitted, so a query refused by its budget or quota, or cancelled on
+    timeout, is not retried on every rerun; other properties still try theirs.
+    """
+    failed = st.session_state.setdefault("failed_exact", {})
+    return failed.setdefault((current_property().key, start_date, end_date), {})
+
+def load_exact_counts(tab_name, df, start_date, end_date, wait):
+    """
+    Returns (df, exact) with the tab's HLL estimates replaced by exact counts
+    once phase_3_exact_users.sql / phase_4_top_pages_exact.sql has finished.
+    The exact query runs on the scheduler; with wait=False the estimates are
+    returned straight away and refine_when_ready() reruns the page when it lands.
+    """
+    if tab_name not in EXACT_QUERIES or df.empty:
+        return df, True
+    if snapshot is not None and tab_name in snapshot.data:
+        return df, True  # snapshots are built with exact counts
+    if tab_name == "Traffic Trends" and pick_granularity(start_date, end_date) == "hour":
+        return df, True  # phase_4_hourly_trends.sql already counts exactly
+    query_name, key = EXACT_QUERIES[tab_name]
+    failed = failed_exact_queries(start_date, end_date)
+    if query_name in failed:
+        st.warning(f"Exact counts unavailable, showing estimates: {failed[query_name]}")
+        return df, False
+    future = get_scheduler().submit(
+        f"exact/{query_name}", get_data_from_bigquery, current_property().key, query_name, start_date, end_date,
+    )
+    if not wait and not future.done():
+        refine_when_ready(future, query_name, start_date, end_date)
+        return df, False
+    try:
+        with st.spinner("Computing exact counts..."):
+            df_exact = future.result()
+    except Exception as e:
+        failed[query_name] = str(e) or type(e).__name__
+        st.warning(f"Exact counts unavailable, showing estimates: {failed[query_name]}")
+        return df, False
+    return apply_exact_counts(key, df, df_exact), True
+
+@st.fragment(run_every=REFINE_POLL_SECONDS)
+def refine_when_ready(future, query_name, start_date, end_date):
+    """
+    Reruns the page once a background exact-count query has succeeded. A
+    failed query is recorded for the range and reported instead of rerun.
+    """
+    if future.done():
+        error = "cancelled" if future.cancelled() else future.exception()
+        if error is None:
+            st.rerun()
+        failed_exact_queries(start_date, end_date)[query_name] = str(error) or type(error).__name__
+        st.warning(f"Exact counts unavailable, showing estimates: {failed_exact_queries(start_date, end_date)[query_name]}")
+        return
+    st.caption("⏳ Showing approximate distinct counts; refining to exact values in the background...")
+
+def render_chart(tab_name, build_chart, *args):
+    """
+    Builds and draws a tab's chart, timed as a "render" span for the Performance tab.
+    Tabs in the range's snapshot draw its prebuilt Vega-Lite spec instead.
+    """
+    with span("render", tab=tab_name):
+        if snapshot is not None and tab_name in snapshot.specs:
+            st.vega_lite_chart(snapshot.specs[tab_name], use_container_width=True)
+        else:
+            st.altair_chart(build_chart(*args), use_container_width=True)
+
+def show_table(df, key, page_size=TABLE_PAGE_SIZE):
+    """
+    st.dataframe for one page of rows at a time. Only the selected page is
+    serialized and sent to the browser; the full frame stays on the server.
+    """
+    pages = page_count(df, page_size)
+    page = 1
+    if pages > 1:
+        page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, step=1, key=f"{key}_page")
+    st.dataframe(page_slice(df, page, page_size))
+    if pages > 1:
+        st.caption(f"Rows {(page - 1) * page_size + 1}-{min(page * page_size, len(df))} of {len(df)}")
+
+def prefetch_tabs(tab_names, start_date, end_date):
+    """
+    Submits every other tab's query at once; they run concurrently on the
+    scheduler's pool and land in the cache as they finish.
+    """
+    for tab_name in tab_names:
+        if snapshot is None or tab_name not in snapshot.data:
+            submit_tab_query(tab_name, start_date, end_date)
+
+@st.fragment(run_every=LIVE_POLL_SECONDS)
+def live_panel():
+    """
+    Today's intraday events, refreshed on its own every LIVE_POLL_SECONDS
+    without rerunning the rest of the page. The counters are shared by every
+    session, so the intraday shard is polled once per interval in total.
+    """
+    prop = current_property()
+    counters = get_live_counters(prop.key)
+    try:
+        poll_if_due(counters, backend=get_backend(prop))
+    except Exception as e:
+        st.warning(f"Live data unavailable: {e}")
+    st.subheader("🔴 Live (today, UTC)")
+    col1, col2, col3, col4 = st.columns(4)
+    error = f"Approximate (HyperLogLog, ±{counters.users.relative_error:.1%})"
+    col1.metric("Users", f"{counters.users.count():,}", help=error)
+    col2.metric("Sessions", f"{counters.sessions.count():,}", help=error)
+    col3.metric("Page Views", f"{counters.page_views:,}")
+    col4.metric("New Events", f"{counters.last_rows:,}", help="Events read by the last poll")
+    df_minutes = counters.trend()
+    if not df_minutes.empty:
+        render_chart("Live", charts.live_trend_chart, df_minutes)
+        show_table(counters.top_pages(), "live_pages")
+    if counters.last_poll:
+        st.caption(f"Last polled {counters.last_poll:%H:%M:%S} UTC")
 
 # --- Streamlit Layout ---
 st.set_page_config(page_title="Sankalan Analytics Dashboard", layout="wide")
@@ -53,22 +303,89 @@ st.markdown("---")
 
 # --- Sidebar Filters ---
 st.sidebar.header("Filters")
-start_date = st.sidebar.date_input("Start Date")
-end_date = st.sidebar.date_input("End Date")
+properties = list_properties()
+if len(properties) > 1:
+    # ?property=<key> opens the dashboard on a given property
+    if "property_key" not in st.session_state and st.query_params.get("property") in [p.key for p in properties]:
+        st.session_state["property_key"] = st.query_params["property"]
+    st.sidebar.selectbox(
+        "Property", [p.key for p in properties], key="property_key",
+        format_func=lambda key: get_property(key).name,
+    )
+# Standard ranges are served from precomputed snapshots when they have been built
+range_key = st.sidebar.selectbox(
+    "Date range", [*STANDARD_RANGES, "custom"], format_func=lambda key: STANDARD_RANGES.get(key, "Custom"),
+)
+if range_key == "custom":
+    start_date = st.sidebar.date_input("Start Date")
+    end_date = st.sidebar.date_input("End Date")
+    snapshot = None
+else:
+    start_date, end_date = standard_range(range_key)
+    st.sidebar.caption(f"{start_date:%b %d, %Y} to {end_date:%b %d, %Y}")
+    snapshot = get_snapshot(current_property().key, range_key, start_date, end_date)
 
 if start_date > end_date:
     st.sidebar.error("Start Date cannot be after End Date")
 
-# --- Tabs ---
-tab1, tab2, tab3, tab4, tab5, tab6, tab7, tab8 = st.tabs(
-    ["KPIs", "Traffic Trends", "Top Pages", "Devices", "Browser", "Traffic Sources", "User Segments", "Bounce Prediction"]
+# Changing the date range cancels queries still running for the previous range
+get_scheduler().reset((start_date, end_date))
+
+if snapshot is not None:
+    st.sidebar.caption(f"⚡ Served from a snapshot built {snapshot.built_at[:16].replace('T', ' ')} UTC")
+# Dry runs are opt-in: every query already runs with maximum_bytes_billed as a hard cap
+elif st.sidebar.checkbox("Estimate scan cost", value=False):
+    scan_estimates, estimate_errors = get_scan_estimates(current_property().key, start_date, end_date)
+    with st.sidebar.expander(f"Estimated scan: {format_bytes(sum(scan_estimates.values()))}", expanded=True):
+        for query_name, estimated_bytes in scan_estimates.items():
+            over_budget = " ⛔ over budget" if estimated_bytes > MAX_BYTES_BILLED else ""
+            st.write(f"{query_name}: {format_bytes(estimated_bytes)}{over_budget}")
+        for query_name, error in estimate_errors.items():
+            st.write(f"{query_name}: ⚠️ estimate failed ({error})")
+        if not scan_estimates and not estimate_errors:
+            st.caption("Scans are not billed on the local backend.")
+
+prop = current_property()
+if prop.daily_bytes_quota:
+    st.sidebar.caption(
+        f"{prop.name}: {format_bytes(prop.bytes_billed_today)} of {format_bytes(prop.daily_bytes_quota)} daily quota used"
+    )
+
+prefetch = st.sidebar.checkbox("Prefetch other tabs in background", value=False)
+# Fast shows the rollups' HLL estimates at once and refines them; Exact waits for COUNT(DISTINCT)
+count_mode = st.sidebar.radio("Distinct counts", ["Fast (approximate)", "Exact"], horizontal=True)
+wait_for_exact = count_mode == "Exact"
+live_mode = st.sidebar.checkbox(
+    "Live mode (today's intraday events)", value=False,
+    help=f"Polls every {LIVE_POLL_SECONDS:.0f} s. " + (
+        "Reads the first-party collector's local files." if LIVE_SOURCE == "collector"
+        else "Each poll bills a scan of today's whole intraday shard; "
+             "DASHBOARD_LIVE_SOURCE=collector avoids it."
+    ),
 )
 
+if live_mode:
+    live_panel()
+    st.markdown("---")
+
+# --- Tabs ---
+# Only the selected tab runs its query; st.tabs would execute every tab on each rerun.
+# The Performance tab is hidden unless the page is opened with ?perf=1
+visible_tabs = TAB_NAMES + ["Performance"] if st.query_params.get("perf") == "1" else TAB_NAMES
+selected_tab = st.radio("View", visible_tabs, horizontal=True, key="selected_tab", label_visibility="collapsed")
+
+if prefetch:
+    prefetch_tabs([name for name in TAB_NAMES if name != selected_tab], start_date, end_date)
+    with st.sidebar.expander("Background queries"):
+        for key, state in get_scheduler().status().items():
+            st.write(f"{key}: {state}")
+
 # -------------------------------
 # Tab 1: KPIs
 # -------------------------------
-with tab1:
-    df_kpis = get_data_from_bigquery(query_kpis_file, start_date, end_date)
+if selected_tab == "KPIs":
+    df_kpis = load_tab_data("KPIs", start_date, end_date)
+    df_kpis, exact = load_exact_counts("KPIs", df_kpis, start_date, end_date, wait_for_exact)
     if not df_kpis.empty:
         col1, col2, col3, col4, col5, col6 = st.columns(6)
         col1.metric("Total Sessions", int(df_kpis['total_sessions'].fillna(0)[0]))
@@ -80,7 +397,11 @@ with tab1:
 
         col4.metric("Avg Engagement Rate (%)", round(df_kpis['avg_engagement_rate'].fillna(0)[0]*100, 2))
         col5.metric("Avg Bounce Rate (%)", round(df_kpis['avg_bounce_rate'].fillna(0)[0]*100, 2))
-        col6.metric("Unique Visitors", int(df_kpis['unique_visitors'].fillna(0)[0]))  # new KPI
+        unique_visitors = int(df_kpis['unique_visitors'].fillna(0)[0])
+        col6.metric(
+            "Unique Visitors", f"{unique_visitors:,}" if exact else f"≈{unique_visitors:,}",
+            help=None if exact else APPROX_HELP,
+        )
 
         # Narrative
         bounce_rate = round(df_kpis['avg_bounce_rate'].fillna(0)[0]*100, 2)
@@ -94,39 +415,34 @@ with tab1:
 # -------------------------------
 # Tab 2: Traffic Trends
 # -------------------------------
-with tab2:
-    df_trends = get_data_from_bigquery(query_trends_file, start_date, end_date)
+if selected_tab == "Traffic Trends":
+    df_trends = load_tab_data("Traffic Trends", start_date, end_date)
+    df_trends, exact = load_exact_counts("Traffic Trends", df_trends, start_date, end_date, wait_for_exact)
     if not df_trends.empty:
-        chart = alt.Chart(df_trends).mark_line().encode(
-            x=alt.X('event_date:T', axis=alt.Axis(title='Date', format='%b %d')),
-            y=alt.Y('daily_page_views:Q', axis=alt.Axis(title='Page Views')),
-            tooltip=[
-                alt.Tooltip('event_date:T', title='Date', format='%Y-%m-%d'),
-                alt.Tooltip('daily_page_views:Q', title='Page Views', format=',')
-            ]
-        ).properties(title="Daily Page Views Over Time").interactive()
-        st.altair_chart(chart, use_container_width=True)
-
-        latest_views = df_trends['daily_page_views'].iloc[-1]
-        st.write(f"📈 On the last recorded day, your site had **{latest_views} page views**.")
+        granularity = pick_granularity(start_date, end_date)
+        df_trends = prepare_trends(df_trends, granularity)
+        render_chart("Traffic Trends", charts.trends_chart, df_trends, granularity)
+        if not exact:
+            st.caption(f"Users are approximate (±{HLL_RELATIVE_ERROR:.1%}).")
+
+        latest_views = df_trends['page_views'].iloc[-1]
+        st.write(f"📈 In the last recorded {granularity}, your site had **{latest_views} page views**.")
     else:
         st.warning("No traffic trend data available.")
 
 # -------------------------------
 # Tab 3: Top Pages
 # -------------------------------
-with tab3:
-    df_pages = get_data_from_bigquery(query_top_pages_file, start_date, end_date)
+if selected_tab == "Top Pages":
+    df_pages = load_tab_data("Top Pages", start_date, end_date)
+    df_pages, exact = load_exact_counts("Top Pages", df_pages, start_date, end_date, wait_for_exact)
     if not df_pages.empty:
-        df_pages['page_views'] = df_pages['page_views'].fillna(0).astype(int)
-        chart_pages = alt.Chart(df_pages).mark_bar().encode(
-            x='page_views:Q',
-            y=alt.Y('page_url:N', sort='-x'),
-            tooltip=['page_url', 'page_views', 'sessions', 'unique_users']
-        )
-        st.altair_chart(chart_pages, use_container_width=True)
+        df_pages = charts.prepare_top_pages(df_pages)
+        render_chart("Top Pages", charts.top_pages_chart, df_pages)
         st.subheader("📋 Top Pages Data")
-        st.dataframe(df_pages)
+        show_table(df_pages, "top_pages")
+        if not exact:
+            st.caption(f"Sessions and unique users are approximate (±{HLL_RELATIVE_ERROR:.1%}).")
 
         top_page = df_pages.loc[df_pages['page_views'].idxmax()]
         st.write(f"🔥 Your most visited page is **{top_page['page_url']}** with **{top_page['page_views']} views**.")
@@ -136,18 +452,11 @@ with tab3:
 # -------------------------------
 # Tab 4: Devices
 # -------------------------------
-with tab4:
-    df_device = get_data_from_bigquery(query_device_file, start_date, end_date)
+if selected_tab == "Devices":
+    df_device = load_tab_data("Devices", start_date, end_date)
     if not df_device.empty:
-        df_device['sessions'] = df_device['sessions'].fillna(0).astype(int)
-        df_device['percentage'] = (df_device['sessions'] / df_device['sessions'].sum()) * 100
-
-        chart_device = alt.Chart(df_device).mark_arc(innerRadius=50).encode(
-            theta='sessions:Q',
-            color='device_category:N',
-            tooltip=['device_category', 'sessions', 'percentage']
-        )
-        st.altair_chart(chart_device, use_container_width=True)
+        df_device = charts.prepare_breakdown(df_device)
+        render_chart("Devices", charts.device_chart, df_device)
 
         top_device = df_device.loc[df_device['sessions'].idxmax()]
         st.write(f"📱 Most users are on **{top_device['device_category']}** ({top_device['percentage']:.1f}%).")
@@ -157,21 +466,14 @@ with tab4:
 # -------------------------------
 # Tab 5: Browser
 # -------------------------------
-with tab5:
-    df_browser = get_data_from_bigquery(query_browser_file, start_date, end_date)
+if selected_tab == "Browser":
+    df_browser = load_tab_data("Browser", start_date, end_date)
     if not df_browser.empty:
-        df_browser['sessions'] = df_browser['sessions'].fillna(0).astype(int)
-        df_browser['percentage'] = (df_browser['sessions'] / df_browser['sessions'].sum()) * 100
-
-        chart_browser = alt.Chart(df_browser).mark_bar().encode(
-            x='sessions:Q',
-            y=alt.Y('browser:N', sort='-x'),
-            color='browser:N',
-            tooltip=['browser', 'sessions', 'percentage']
-        )
-        st.altair_chart(chart_browser, use_container_width=True)
+        df_browser = charts.prepare_breakdown(df_browser)
+        # The long tail of browsers is drawn as one "Other" bar; the table below keeps every row
+        render_chart("Browser", charts.breakdown_bar_chart, top_n_with_other(df_browser, 'browser'), 'browser')
         st.subheader("📋 Browser Data")
-        st.dataframe(df_browser)
+        show_table(df_browser, "browser")
 
         top_browser = df_browser.loc[df_browser['sessions'].idxmax()]
         st.write(f"🌐 Most visitors use **{top_browser['browser']}** ({top_browser['percentage']:.1f}% of sessions).")
@@ -181,22 +483,13 @@ with tab5:
 # -------------------------------
 # Tab 6: Traffic Sources
 # -------------------------------
-with tab6:
-    df_traffic = get_data_from_bigquery(query_traffic_file, start_date, end_date)
+if selected_tab == "Traffic Sources":
+    df_traffic = load_tab_data("Traffic Sources", start_date, end_date)
     if not df_traffic.empty:
-        df_traffic = df_traffic.rename(columns={'session_count': 'sessions'})
-        df_traffic['sessions'] = df_traffic['sessions'].fillna(0).astype(int)
-        df_traffic['percentage'] = (df_traffic['sessions'] / df_traffic['sessions'].sum()) * 100
-
-        chart_traffic = alt.Chart(df_traffic).mark_bar().encode(
-            x='sessions:Q',
-            y=alt.Y('source:N', sort='-x'),
-            color='source:N',
-            tooltip=['source', 'sessions', 'percentage']
-        )
-        st.altair_chart(chart_traffic, use_container_width=True)
+        df_traffic = charts.prepare_breakdown(df_traffic, {'session_count': 'sessions'})
+        render_chart("Traffic Sources", charts.breakdown_bar_chart, top_n_with_other(df_traffic, 'source'), 'source')
         st.subheader("📋 Traffic Sources Data")
-        st.dataframe(df_traffic)
+        show_table(df_traffic, "traffic_sources")
 
         top_source = df_traffic.loc[df_traffic['sessions'].idxmax()]
         st.write(f"🚀 Most traffic comes from **{top_source['source']}** with {top_source['sessions']} sessions.")
@@ -206,23 +499,13 @@ with tab6:
 # -------------------------------
 # Tab 7: User Segments
 # -------------------------------
-with tab7:
-    df_clusters = get_data_from_bigquery(query_user_clusters_file, start_date, end_date)
+if selected_tab == "User Segments":
+    df_clusters = load_tab_data("User Segments", start_date, end_date)
     if not df_clusters.empty:
         st.subheader("📊 User Segmentation")
         st.dataframe(df_clusters)
 
-        chart_clusters = alt.Chart(df_clusters).mark_arc(innerRadius=80).encode(
-            theta=alt.Theta(field='users', type='quantitative'),
-            color=alt.Color(field='cluster_name', type='nominal', legend=alt.Legend(title="User Segment")),
-            tooltip=[
-                alt.Tooltip('cluster_name:N', title='Segment'),
-                alt.Tooltip('users:Q', title='Users'),
-                alt.Tooltip('pct_users:Q', title='Percentage', format='.2f')
-            ]
-        ).properties(title="User Segments Distribution", width=700, height=400)
-
-        st.altair_chart(chart_clusters, use_container_width=True)
+        render_chart("User Segments", charts.segments_chart, df_clusters)
 
         top_cluster = df_clusters.loc[df_clusters['users'].idxmax()]
         st.write(f"🚀 Largest segment: **{top_cluster['cluster_name']}** with {top_cluster['users']} users ({top_cluster['pct_users']}%).")
@@ -232,19 +515,11 @@ with tab7:
 # -------------------------------
 # Tab 8: Bounce Prediction
 # -------------------------------
-with tab8:
-    df_bounce = get_data_from_bigquery(query_bounce_file, start_date, end_date)
+if selected_tab == "Bounce Prediction":
+    df_bounce = load_tab_data("Bounce Prediction", start_date, end_date)
     if not df_bounce.empty:
-        if 'bounce_prediction' in df_bounce.columns:
-            df_bounce = df_bounce.rename(columns={'bounce_prediction': 'predicted_is_bounce'})
-        df_bounce = df_bounce.dropna(subset=['predicted_is_bounce'])
-
-        chart_bounce = alt.Chart(df_bounce).mark_bar().encode(
-            x=alt.X('predicted_is_bounce:N', title='Bounce Prediction'),
-            y=alt.Y('count()', title='Number of Sessions'),
-            color='predicted_is_bounce:N'
-        ).properties(title='Bounce Prediction Distribution')
-        st.altair_chart(chart_bounce, use_container_width=True)
+        df_bounce = charts.prepare_bounce(df_bounce)
+        render_chart("Bounce Prediction", charts.bounce_chart, df_bounce)
 
         bounce_count = (df_bounce['predicted_is_bounce'] == 1).sum()
         st.write(f"🔮 About **{bounce_count} sessions** are predicted to bounce soon.")
@@ -256,4 +531,124 @@ with tab8:
         else:
             st.warning("Bounce prediction column not found.")
     else:
-        st.warning("No bounce prediction data available.")
\ No newline at end of file
+        st.warning("No bounce prediction data available.")
+
+# -------------------------------
+# Tab 9: Page Weight
+# -------------------------------
+if selected_tab == "Page Weight":
+    df_weight = load_tab_data("Page Weight", start_date, end_date)
+    if not df_weight.empty:
+        st.caption("Landing pages' transfer size from the last site build (sitebuild/weight.py) against their bounce rate.")
+        render_chart("Page Weight", charts.page_weight_chart, df_weight)
+
+        saved = (df_weight['transfer_bytes_before'] - df_weight['transfer_bytes']).clip(lower=0)
+        weighted_saving = (saved * df_weight['entrances']).sum() / df_weight['entrances'].sum()
+        st.write(f"📦 The optimized build saves **{weighted_saving / 1024:,.0f} KB** per landing on average.")
+
+        heavy = df_weight['transfer_bytes'] >= df_weight['transfer_bytes'].median()
+        if heavy.any() and (~heavy).any():
+            st.write(
+                f"Bounce rate on the heavier half of landing pages: **{df_weight.loc[heavy, 'bounce_rate'].mean():.1%}**, "
+                f"lighter half: **{df_weight.loc[~heavy, 'bounce_rate'].mean():.1%}**."
+            )
+
+        st.subheader("Heaviest Landing Pages")
+        st.dataframe(df_weight.sort_values('transfer_bytes', ascending=False).head(20))
+    else:
+        st.warning("No page weight data available. Build the site with `python -m sitebuild.build --report` first.")
+
+# -------------------------------
+# Tab 10: Paths & Funnels
+# -------------------------------
+if selected_tab == "Paths & Funnels":
+    paths = load_tab_data("Paths & Funnels", start_date, end_date)
+    if isinstance(paths, dict) and not paths["transitions"].empty:
+        df_transitions, df_paths = paths["transitions"], paths["paths"]
+        render_chart("Paths & Funnels", charts.transitions_chart, charts.prepare_transitions(df_transitions))
+
+        st.subheader("🧭 Most Common Paths")
+        st.caption("The first pages of each session; repeated views of a page count once.")
+        render_chart("Paths", charts.paths_chart, charts.prepare_paths(df_paths))
+        show_table(df_paths, "paths")
+
+        st.subheader("Funnel")
+        pages = (
+            df_transitions[~df_transitions['to_page'].isin(["(entrance)", "(exit)"])]
+            .groupby('to_page')['transitions'].sum().sort_values(ascending=False).index.tolist()
+        )
+        default_steps = [page for page in default_funnel(df_paths) if page in pages]
+        funnel_steps = st.multiselect("Pages, in order", pages, default=default_steps, key="funnel_steps")
+        if len(funnel_steps) >= 2:
+            try:
+                with st.spinner("Loading funnel..."), span("tab", tab="Funnel"):
+                    df_funnel = get_scheduler().submit(
+                        f"funnel/{'|'.join(funnel_steps)}", get_paths_tab, current_property().key,
+                        "Paths & Funnels", start_date, end_date, tuple(funnel_steps),
+                    ).result()["funnel"]
+            except Exception as e:
+                st.error(f"Error fetching data: {e}")
+                df_funnel = pd.DataFrame()
+            if not df_funnel.empty:
+                render_chart("Funnel", charts.funnel_chart, df_funnel)
+                st.dataframe(df_funnel)
+                completed = df_funnel['pct_of_first'].iloc[-1]
+                worst = df_funnel.iloc[1:].loc[df_funnel['drop_off'].iloc[1:].idxmax()]
+                st.write(f"🏁 **{completed:.1f}%** of sessions that reached step 1 completed the funnel; "
+                         f"the largest drop-off is before step {worst['step']} ({worst['page']}).")
+        else:
+            st.info("Pick at least two pages to see how many sessions go from one to the next.")
+    else:
+        st.warning("No navigation path data available for the selected date range.")
+# -------------------------------
+# Performance (hidden, see visible_tabs)
+# -------------------------------
+if selected_tab == "Performance":
+    df_spans = pd.DataFrame(recent_spans())
+    if not df_spans.empty:
+        st.caption("Timings recorded by this server process since it started (database/tracing.py).")
+
+        df_queries = df_spans[df_spans['name'] == 'query']
+        if not df_queries.empty:
+            aggregations = {
+                'runs': ('duration', 'size'),
+                'p50_seconds': ('duration', 'median'),
+                'p95_seconds': ('duration', lambda d: d.quantile(0.95)),
+                'total_seconds': ('duration', 'sum'),
+                'errors': ('status', lambda s: int((s == 'error').sum())),
+            }
+            # Job statistics only exist for BigQuery jobs
+            for column, how in [('bytes_processed', 'sum'), ('bytes_billed', 'sum'), ('cache_hit', 'mean'), ('slot_millis', 'sum')]:
+                if column in df_queries.columns:
+                    aggregations[column] = (column, how)
+            df_summary = df_queries.groupby('query').agg(**aggregations).sort_values('total_seconds', ascending=False)
+            st.subheader("Queries by total latency")
+            st.dataframe(df_summary)
+
+        df_stages = (
+            df_spans[df_spans['name'].isin(['dry_run', 'submit', 'wait', 'download', 'to_pandas'])]
+            .groupby(['query', 'name'], as_index=False)
+            .agg(seconds=('duration', 'sum'), runs=('duration', 'size'))
+            .rename(columns={'name': 'stage'})
+        )
+        if not df_stages.empty:
+            render_chart("Performance", charts.stage_chart, df_stages)
+
+        df_tabs = df_spans[df_spans['name'].isin(['tab', 'render'])]
+        if not df_tabs.empty:
+            st.subheader("Tab wait and render time")
+            st.dataframe(df_tabs.pivot_table(index='tab', columns='name', values='duration', aggfunc='median'))
+
+        df_errors = df_spans[df_spans['status'] == 'error']
+        if not df_errors.empty:
+            st.subheader("Recent errors")
+            st.dataframe(df_errors[['name', 'query', 'tab', 'error']].tail(20))
+
+        with st.expander("Recent spans"):
+            show_table(df_spans.iloc[::-1], "recent_spans")
+
+        if st.button("Clear timings"):
+            clear_spans()
+            st.rerun()
+    else:
+        st.info("No timings recorded yet. Open a few tabs first.")
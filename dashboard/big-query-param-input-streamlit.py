@@ -1,50 +1,82 @@
 import streamlit as st
-from google.cloud import bigquery
-from database.conn import get_bq_client
+import os
+import sys
 import datetime
 
-# Initialize BigQuery client
-client = get_bq_client()
+# Add parent directory to system path for imports from the 'database' folder
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from database.backend import get_backend
+from database.properties import get_property, list_properties
+from database.explorer import (
+    COLUMNS, DEFAULT_COLUMNS, EXPORT_DIR, export_parquet, open_explorer, page_count,
+)
+
+# --- Raw event explorer ---
+# Streams the events_* export a page at a time instead of downloading the
+# whole range; see database/explorer.py.
+st.title("🔎 Raw Event Explorer")
+
+properties = list_properties()
+property_key = properties[0].key
+if len(properties) > 1:
+    property_key = st.selectbox("Property", [p.key for p in properties], format_func=lambda key: get_property(key).name)
 
 # Set default dates
 start_date = st.date_input("Start Date", value=datetime.date(2025, 9, 1))
 end_date = st.date_input("End Date", value=datetime.date(2025, 9, 8))
 
-# Convert dates to string suffixes
-start_suffix = start_date.strftime('%Y%m%d')
-end_suffix = end_date.strftime('%Y%m%d')
-
-# Define your table pattern
-table_pattern = "`brilliant-dryad-439810-q6.analytics_453034732.events_*`"
-
-# Construct the query with specific columns and date filtering
-query = f"""
-SELECT 
-  event_date,
-  event_timestamp,
-  event_name,
-  user_id,
-  user_pseudo_id
-FROM {table_pattern}
-WHERE _TABLE_SUFFIX BETWEEN @start_suffix AND @end_suffix
-LIMIT 10
-"""
-
-# Set query parameters
-job_config = bigquery.QueryJobConfig(
-    query_parameters=[
-        bigquery.ScalarQueryParameter("start_suffix", "STRING", start_suffix),
-        bigquery.ScalarQueryParameter("end_suffix", "STRING", end_suffix),
-    ]
-)
+if start_date > end_date:
+    st.error("Start Date cannot be after End Date")
+    st.stop()
+
+# Column projection and event filter are pushed into the SQL
+columns = st.multiselect("Columns", list(COLUMNS), default=DEFAULT_COLUMNS)
+event_names_text = st.text_input("Event names (comma separated, empty for all)", value="")
+event_names = [name.strip() for name in event_names_text.split(",") if name.strip()]
+
+if not columns:
+    st.warning("Select at least one column.")
+    st.stop()
+
+# One query per distinct selection; paging reuses its result
+selection = (property_key, start_date, end_date, tuple(columns), tuple(event_names))
+if st.session_state.get("explorer_selection") != selection:
+    try:
+        with st.spinner("Running query..."):
+            st.session_state["explorer_pager"] = open_explorer(
+                start_date, end_date, columns, event_names, backend=get_backend(get_property(property_key)),
+            )
+        st.session_state["explorer_selection"] = selection
+    except Exception as e:
+        st.error(f"Error running query: {e}")
+        st.stop()
 
-# Run the query
-query_job = client.query(query, job_config=job_config)
-results = query_job.result()
+pager = st.session_state["explorer_pager"]
+pages = page_count(pager)
+st.write(f"**{pager.total_rows:,}** events match.")
 
-# Convert results to DataFrame
-import pandas as pd
-df = results.to_dataframe()
+page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, step=1)
+try:
+    df = pager.page(page)
+except Exception as e:
+    st.error(f"Error fetching page: {e}")
+else:
+    st.dataframe(df)
 
-# Display the DataFrame in Streamlit
-st.dataframe(df)
\ No newline at end of file
+# --- Export ---
+with st.expander("Export to Parquet"):
+    file_name = st.text_input("File name", value=f"events_{start_date:%Y%m%d}_{end_date:%Y%m%d}.parquet")
+    if st.button("Export full result"):
+        path = os.path.join(EXPORT_DIR, os.path.basename(file_name))
+        progress = st.progress(0.0)
+        try:
+            written = export_parquet(
+                pager, path,
+                on_progress=lambda rows: progress.progress(min(rows / max(pager.total_rows, 1), 1.0)),
+            )
+            if written:
+                st.success(f"Wrote {written:,} rows to {os.path.abspath(path)}")
+            else:
+                st.info("The result is empty; no file was written.")
+        except Exception as e:
+            st.error(f"Export failed: {e}")
@@ -0,0 +1,209 @@
+import re
+import altair as alt
+import pyarrow as pa
+
+from database.paths import PATH_SEPARATOR
+from dashboard.rendering import GRANULARITIES, lttb, prepare_trends, top_n_with_other, top_transitions
+
+# --- Tab transforms and charts ---
+# Pure pandas/Altair code shared by dashboard/app.py and the benchmarks, kept
+# free of Streamlit calls so it can run outside a Streamlit session.
+
+
+def chart_data(df):
+    """
+    Hands Altair a pyarrow.Table instead of a DataFrame. Query results are
+    ArrowDtype-backed (database/backend.py), so this wraps the existing
+    buffers without copying.
+    """
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def prepare_breakdown(df, rename=None):
+    """Integer session counts plus each row's share of all sessions (device, browser, source tabs)."""
+    if rename:
+        df = df.rename(columns=rename)
+    df = df.copy()
+    df['sessions'] = df['sessions'].fillna(0).astype(int)
+    df['percentage'] = (df['sessions'] / df['sessions'].sum()) * 100
+    return df
+
+
+def prepare_top_pages(df):
+    df = df.copy()
+    df['page_views'] = df['page_views'].fillna(0).astype(int)
+    return df
+
+
+def prepare_bounce(df):
+    if 'bounce_prediction' in df.columns:
+        df = df.rename(columns={'bounce_prediction': 'predicted_is_bounce'})
+    return df.dropna(subset=['predicted_is_bounce'])
+
+
+def short_url(url):
+    """A page URL without its scheme and host, for axis labels."""
+    return re.sub(r"^https?://[^/]+", "", url) or "/"
+
+
+def prepare_transitions(df):
+    df = top_transitions(df).copy()
+    df['from_page'] = df['from_page'].astype(str).map(short_url)
+    df['to_page'] = df['to_page'].astype(str).map(short_url)
+    return df
+
+
+def prepare_paths(df):
+    df = df.copy()
+    df['path'] = df['path'].astype(str).map(lambda path: PATH_SEPARATOR.join(short_url(page) for page in path.split(PATH_SEPARATOR)))
+    return df
+
+
+def trends_chart(df_trends, granularity="day"):
+    """Page views per period, from prepare_trends(); long series are reduced with LTTB first."""
+    _, axis_format, title = GRANULARITIES[granularity]
+    return alt.Chart(chart_data(lttb(df_trends, 'period', 'page_views'))).mark_line().encode(
+        x=alt.X('period:T', axis=alt.Axis(title='Date', format=axis_format)),
+        y=alt.Y('page_views:Q', axis=alt.Axis(title='Page Views')),
+        tooltip=[
+            alt.Tooltip('period:T', title='Date', format='%Y-%m-%d %H:%M' if granularity == "hour" else '%Y-%m-%d'),
+            alt.Tooltip('page_views:Q', title='Page Views', format=','),
+            alt.Tooltip('users:Q', title='Users', format=','),
+        ]
+    ).properties(title=f"{title} Page Views Over Time").interactive()
+
+
+def live_trend_chart(df_minutes):
+    """Page views per minute from LiveCounters.trend()."""
+    return alt.Chart(chart_data(df_minutes)).mark_line(point=True).encode(
+        x=alt.X('minute:T', axis=alt.Axis(title='Minute (UTC)', format='%H:%M')),
+        y=alt.Y('page_views:Q', axis=alt.Axis(title='Page Views')),
+        tooltip=[
+            alt.Tooltip('minute:T', title='Minute', format='%H:%M'),
+            alt.Tooltip('page_views:Q', title='Page Views', format=','),
+            alt.Tooltip('users:Q', title='Users (approx.)', format=','),
+        ]
+    ).properties(title="Page Views per Minute (live)")
+
+
+def top_pages_chart(df_pages):
+    return alt.Chart(chart_data(df_pages)).mark_bar().encode(
+        x='page_views:Q',
+        y=alt.Y('page_url:N', sort='-x'),
+        tooltip=['page_url', 'page_views', 'sessions', 'unique_users']
+    )
+
+
+def device_chart(df_device):
+    return alt.Chart(chart_data(df_device)).mark_arc(innerRadius=50).encode(
+        theta='sessions:Q',
+        color='device_category:N',
+        tooltip=['device_category', 'sessions', 'percentage']
+    )
+
+
+def breakdown_bar_chart(df, column):
+    """Horizontal bar chart of sessions per browser or per traffic source."""
+    return alt.Chart(chart_data(df)).mark_bar().encode(
+        x='sessions:Q',
+        y=alt.Y(f'{column}:N', sort='-x'),
+        color=f'{column}:N',
+        tooltip=[column, 'sessions', 'percentage']
+    )
+
+
+def segments_chart(df_clusters):
+    return alt.Chart(chart_data(df_clusters)).mark_arc(innerRadius=80).encode(
+        theta=alt.Theta(field='users', type='quantitative'),
+        color=alt.Color(field='cluster_name', type='nominal', legend=alt.Legend(title="User Segment")),
+        tooltip=[
+            alt.Tooltip('cluster_name:N', title='Segment'),
+            alt.Tooltip('users:Q', title='Users'),
+            alt.Tooltip('pct_users:Q', title='Percentage', format='.2f')
+        ]
+    ).properties(title="User Segments Distribution", width=700, height=400)
+
+
+def bounce_chart(df_bounce):
+    return alt.Chart(chart_data(df_bounce)).mark_bar().encode(
+        x=alt.X('predicted_is_bounce:N', title='Bounce Prediction'),
+        y=alt.Y('count()', title='Number of Sessions'),
+        color='predicted_is_bounce:N'
+    ).properties(title='Bounce Prediction Distribution')
+
+
+def page_weight_chart(df_weight):
+    """Transfer size vs bounce rate per landing page, sized by entrances (Page Weight tab)."""
+    return alt.Chart(chart_data(df_weight)).mark_circle(opacity=0.6).encode(
+        x=alt.X('transfer_bytes:Q', title='Transfer size (bytes)', scale=alt.Scale(type='log')),
+        y=alt.Y('bounce_rate:Q', title='Bounce rate', axis=alt.Axis(format='%')),
+        size=alt.Size('entrances:Q', title='Entrances'),
+        tooltip=[
+            'page_path',
+            alt.Tooltip('entrances:Q', format=','),
+            alt.Tooltip('bounce_rate:Q', format='.1%'),
+            alt.Tooltip('transfer_bytes:Q', format=','),
+            alt.Tooltip('critical_path_bytes:Q', format=','),
+        ]
+    ).properties(title="Page Weight vs Bounce Rate").interactive()
+
+
+def transitions_chart(df_transitions):
+    """Heatmap of page -> next page, coloured by the share of the from page's exits (Paths & Funnels tab)."""
+    return alt.Chart(chart_data(df_transitions)).mark_rect().encode(
+        x=alt.X('to_page:N', title='Next page', sort='-color'),
+        y=alt.Y('from_page:N', title='From page'),
+        color=alt.Color('share:Q', title='Share', scale=alt.Scale(scheme='blues'), legend=alt.Legend(format='%')),
+        tooltip=[
+            'from_page', 'to_page',
+            alt.Tooltip('transitions:Q', format=','),
+            alt.Tooltip('share:Q', format='.1%'),
+        ]
+    ).properties(title="Page Transitions")
+
+
+def paths_chart(df_paths):
+    return alt.Chart(chart_data(df_paths)).mark_bar().encode(
+        x=alt.X('sessions:Q', title='Sessions'),
+        y=alt.Y('path:N', sort='-x', title=None),
+        tooltip=['path', alt.Tooltip('sessions:Q', format=','), alt.Tooltip('pct_sessions:Q', format='.2f')]
+    ).properties(title="Most Common Paths")
+
+
+def funnel_chart(df_funnel):
+    """Sessions reaching each funnel step, in order."""
+    df_funnel = df_funnel.assign(label=[f"{step}. {short_url(page)}" for step, page in zip(df_funnel['step'], df_funnel['page'])])
+    return alt.Chart(chart_data(df_funnel)).mark_bar().encode(
+        x=alt.X('sessions:Q', title='Sessions'),
+        y=alt.Y('label:N', sort=alt.EncodingSortField('step'), title=None),
+        tooltip=[
+            'label',
+            alt.Tooltip('sessions:Q', format=','),
+            alt.Tooltip('pct_of_first:Q', title='% of step 1', format='.1f'),
+            alt.Tooltip('drop_off:Q', format=','),
+        ]
+    ).properties(title="Funnel")
+
+
+def stage_chart(df_stages):
+    """Stacked bar of time per query, split by stage (Performance tab)."""
+    return alt.Chart(chart_data(df_stages)).mark_bar().encode(
+        x=alt.X('seconds:Q', title='Total seconds'),
+        y=alt.Y('query:N', sort='-x', title=None),
+        color=alt.Color('stage:N', title='Stage'),
+        tooltip=['query', 'stage', alt.Tooltip('seconds:Q', format='.3f'), 'runs']
+    ).properties(title="Where query time goes")
+
+
+# Tab name -> function(DataFrame) returning the tab's chart, transform included
+TAB_PIPELINES = {
+    "Traffic Trends": lambda df: trends_chart(prepare_trends(df, "day")),
+    "Top Pages": lambda df: top_pages_chart(prepare_top_pages(df)),
+    "Devices": lambda df: device_chart(prepare_breakdown(df)),
+    "Browser": lambda df: breakdown_bar_chart(top_n_with_other(prepare_breakdown(df), 'browser'), 'browser'),
+    "Traffic Sources": lambda df: breakdown_bar_chart(
+        top_n_with_other(prepare_breakdown(df, {'session_count': 'sessions'}), 'source'), 'source'),
+    "User Segments": segments_chart,
+    "Bounce Prediction": lambda df: bounce_chart(prepare_bounce(df)),
+    "Page Weight": page_weight_chart,
+}
@@ -7,44 +7,66 @@ import datetime
 
 # Add parent directory to system path for imports from the 'database' folder
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from database.conn import get_bq_client
-
-# --- SQL query file paths ---
-query_kpis_file = os.path.join(os.path.dirname(__file__), '..', 'database', 'phase_3_kpis.sql')
-query_trends_file = os.path.join(os.path.dirname(__file__), '..', 'database', 'phase_4_trends.sql')
-query_top_pages_file = os.path.join(os.path.dirname(__file__), '..', 'database', 'phase_4_top_pages.sql')
-query_device_file = os.path.join(os.path.dirname(__file__), '..', 'database', 'phase_4_device_breakdown.sql')
-query_browser_file = os.path.join(os.path.dirname(__file__), '..', 'database', 'phase_4_browser_breakdown.sql')
-query_trafiic_file = os.path.join(os.path.dirname(__file__), '..', 'database', 'phase_4_traffic_source.sql')
-query_user_clusters_file = os.path.join(os.path.dirname(__file__), '..', 'database', 'phase_5_user_clusters.sql')
-query_bounce_file = os.path.join(os.path.dirname(__file__), '..', 'database', 'phase_5_predicted_bounce.sql')
+from database.queries import run_query
+from database.result_cache import CACHE_TTL
+from database.scheduler import QueryScheduler
+
+# --- SQL query names (database/*.sql, loaded once by database/queries.py) ---
+query_kpis = "phase_3_kpis"
+query_trends = "phase_4_trends"
+query_top_pages = "phase_4_top_pages"
+query_device = "phase_4_device_breakdown"
+query_browser = "phase_4_browser_breakdown"
+query_trafiic = "phase_4_traffic_source"
+query_user_clusters = "phase_5_user_clusters"
+query_bounce = "phase_5_predicted_bounce"
 
 # --- Streamlit caching ---
-@st.cache_data
-def get_data_from_bigquery(query_file_path, start_date, end_date):
+# Errors are raised rather than returned so failed or cancelled queries are never cached.
+# Arguments starting with "_" are not hashed by st.cache_data.
+@st.cache_data(ttl=CACHE_TTL)
+def fetch_data(query_name, start_date, end_date, _tracker=None):
+    # Dates are bound as @start_date/@end_date query parameters
+    return run_query(query_name, start_date, end_date, tracker=_tracker)
+
+def get_scheduler():
+    """This session's QueryScheduler (database/scheduler.py)."""
+    if "query_scheduler" not in st.session_state:
+        st.session_state["query_scheduler"] = QueryScheduler()
+    return st.session_state["query_scheduler"]
+
+def get_data_from_bigquery(query_name, start_date, end_date):
+    """
+    Runs the query on the scheduler, sharing the run a prefetch already
+    started, and reports errors on the script thread.
+    """
     try:
-        with open(query_file_path, 'r') as f:
-            query_template = f.read()
-
-        start_date_str = start_date.strftime('%Y-%m-%d')
-        end_date_str = end_date.strftime('%Y-%m-%d')
-
-        query = query_template.format(
-            start_date=f"DATE('{start_date_str}')",
-            end_date=f"DATE('{end_date_str}')"
-        )
-
-        client = get_bq_client()
-        if client is None:
-            st.error("Failed to connect to BigQuery. Check your credentials.")
-            return pd.DataFrame()
-
-        df = client.query(query).to_dataframe()
-        return df
+        return get_scheduler().submit(query_name, fetch_data, query_name, start_date, end_date).result()
     except Exception as e:
         st.error(f"Error fetching data: {e}")
         return pd.DataFrame()
 
+# --- Tab queries ---
+TAB_QUERIES = {
+    "KPIs": query_kpis,
+    "Traffic Trends": query_trends,
+    "Top Pages": query_top_pages,
+    "Devices": query_device,
+    "Browser": query_browser,
+    "Traffic Sources": query_trafiic,
+    "User Segments": query_user_clusters,
+    "Bounce Prediction": query_bounce,
+}
+
+def prefetch_tabs(tab_names, start_date, end_date):
+    """
+    Submits the given tabs' queries to the scheduler's pool. Each runs at
+    most once per date range; a failed one is retried, and its error shown,
+    when its tab is opened.
+    """
+    for tab_name in tab_names:
+        get_scheduler().submit(TAB_QUERIES[tab_name], fetch_data, TAB_QUERIES[tab_name], start_date, end_date)
+
 # --- Streamlit Layout ---
 st.set_page_config(page_title="Sankalan Analytics Dashboard", layout="wide")
 st.title("📊 Website Analytics Dashboard")
@@ -56,16 +78,23 @@ st.sidebar.header("Filters")
 start_date = st.sidebar.date_input("Start Date")
 end_date = st.sidebar.date_input("End Date")
 
+prefetch = st.sidebar.checkbox("Prefetch other tabs in background", value=False)
+
+# Changing the date range cancels queries still running for the previous range
+get_scheduler().reset((start_date, end_date))
+
 # --- Tabs ---
-tab1, tab2, tab3, tab4, tab5, tab6, tab7, tab8 = st.tabs(
-    ["KPIs", "Traffic Trends", "Top Pages", "Devices", "Browser", "Traffic Sources", "User Segments", "Bounce Prediction"]
-)
+# Only the selected tab runs its query; st.tabs would execute every tab on each rerun.
+selected_tab = st.radio("View", list(TAB_QUERIES), horizontal=True, key="selected_tab", label_visibility="collapsed")
+
+if prefetch:
+    prefetch_tabs([name for name in TAB_QUERIES if name != selected_tab], start_date, end_date)
 
 # -------------------------------
 # Tab 1: KPIs
 # -------------------------------
-with tab1:
-    df_kpis = get_data_from_bigquery(query_kpis_file, start_date, end_date)
+if selected_tab == "KPIs":
+    df_kpis = get_data_from_bigquery(query_kpis, start_date, end_date)
     if not df_kpis.empty:
         col1, col2, col3, col4, col5 = st.columns(5)
         col1.metric("Total Sessions", int(df_kpis['total_sessions'].fillna(0)[0]))
@@ -91,8 +120,8 @@ with tab1:
 # -------------------------------
 # Tab 2: Traffic Trends
 # -------------------------------
-with tab2:
-    df_trends = get_data_from_bigquery(query_trends_file, start_date, end_date)
+if selected_tab == "Traffic Trends":
+    df_trends = get_data_from_bigquery(query_trends, start_date, end_date)
     if not df_trends.empty:
         chart = alt.Chart(df_trends).mark_line().encode(
             x=alt.X('event_date:T', axis=alt.Axis(title='Date', format='%b %d')),
@@ -113,8 +142,8 @@ with tab2:
 # -------------------------------
 # Tab 3: Top Pages
 # -------------------------------
-with tab3:
-    df_pages = get_data_from_bigquery(query_top_pages_file, start_date, end_date)
+if selected_tab == "Top Pages":
+    df_pages = get_data_from_bigquery(query_top_pages, start_date, end_date)
     if not df_pages.empty:
         df_pages['page_views'] = df_pages['page_views'].fillna(0).astype(int)
         chart_pages = alt.Chart(df_pages).mark_bar().encode(
@@ -135,8 +164,8 @@ with tab3:
 # -------------------------------
 # Tab 4: Devices
 # -------------------------------
-with tab4:
-    df_device = get_data_from_bigquery(query_device_file, start_date, end_date)
+if selected_tab == "Devices":
+    df_device = get_data_from_bigquery(query_device, start_date, end_date)
     if not df_device.empty:
         df_device['sessions'] = df_device['sessions'].fillna(0).astype(int)
         df_device['percentage'] = (df_device['sessions'] / df_device['sessions'].sum()) * 100
@@ -158,8 +187,8 @@ with tab4:
 # -------------------------------
 # Tab 5: Browser
 # -------------------------------
-with tab5:
-    df_browser = get_data_from_bigquery(query_browser_file, start_date, end_date)
+if selected_tab == "Browser":
+    df_browser = get_data_from_bigquery(query_browser, start_date, end_date)
     if not df_browser.empty:
         df_browser['sessions'] = df_browser['sessions'].fillna(0).astype(int)
         df_browser['percentage'] = (df_browser['sessions'] / df_browser['sessions'].sum()) * 100
@@ -184,8 +213,8 @@ with tab5:
 # -------------------------------
 # Tab 6: Traffic Sources
 # -------------------------------
-with tab6:
-    df_traffic = get_data_from_bigquery(query_trafiic_file, start_date, end_date)
+if selected_tab == "Traffic Sources":
+    df_traffic = get_data_from_bigquery(query_trafiic, start_date, end_date)
     if not df_traffic.empty:
         df_traffic = df_traffic.rename(columns={'session_count': 'sessions'})
         df_traffic['sessions'] = df_traffic['sessions'].fillna(0).astype(int)
@@ -210,8 +239,8 @@ with tab6:
 # -------------------------------
 # Tab 7: User Segments
 # -------------------------------
-with tab7:
-    df_clusters = get_data_from_bigquery(query_user_clusters_file, start_date, end_date)
+if selected_tab == "User Segments":
+    df_clusters = get_data_from_bigquery(query_user_clusters, start_date, end_date)
     if not df_clusters.empty:
         st.subheader("📊 User Segmentation for Tutorial Website")
         st.dataframe(df_clusters)
@@ -242,8 +271,8 @@ with tab7:
 # -------------------------------
 # Tab 8: Bounce Prediction
 # -------------------------------
-with tab8:
-    df_bounce = get_data_from_bigquery(query_bounce_file, start_date, end_date)
+if selected_tab == "Bounce Prediction":
+    df_bounce = get_data_from_bigquery(query_bounce, start_date, end_date)
     if not df_bounce.empty:
         if 'bounce_prediction' in df_bounce.columns:
             df_bounce = df_bounce.rename(columns={'bounce_prediction': 'predicted_is_bounce'})
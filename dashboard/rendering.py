@@ -0,0 +1,129 @@
+import numpy as np
+import pandas as pd
+
+# --- Chart payload limits ---
+# Altair embeds every row it is given in the Vega-Lite spec sent to the
+# browser, so data is reduced here before it reaches a chart or table.
+HOURLY_MAX_DAYS = 3
+DAILY_MAX_DAYS = 92
+WEEKLY_MAX_DAYS = 730
+MAX_LINE_POINTS = 500
+TOP_CATEGORIES = 8
+# Pages per axis of the transition heatmap (n x n cells)
+TRANSITION_PAGES = 15
+OTHER_LABEL = "Other"
+TABLE_PAGE_SIZE = 50
+
+# Granularity -> (pandas period alias, axis label format, chart title prefix)
+GRANULARITIES = {
+    "hour": ("h", "%b %d %H:%M", "Hourly"),
+    "day": ("D", "%b %d", "Daily"),
+    "week": ("W-SUN", "%b %d", "Weekly"),
+    "month": ("M", "%b %Y", "Monthly"),
+}
+
+
+def pick_granularity(start_date, end_date):
+    """
+    Time bucket for the trends chart, from the width of the date range:
+    hours for a few days, days up to a quarter, weeks up to two years, then months.
+    """
+    days = (end_date - start_date).days + 1
+    if days <= HOURLY_MAX_DAYS:
+        return "hour"
+    if days <= DAILY_MAX_DAYS:
+        return "day"
+    if days <= WEEKLY_MAX_DAYS:
+        return "week"
+    return "month"
+
+
+def prepare_trends(df, granularity):
+    """
+    Normalizes trends rows to period, sessions, users, page_views and rolls
+    them up to the granularity.
+    - Accepts phase_4_trends.sql (daily) or phase_4_hourly_trends.sql rows
+    - Weekly and monthly users are sums of daily users, so they over-count
+      visitors who return on several days
+    """
+    df = df.rename(columns={
+        'event_date': 'period', 'event_hour': 'period',
+        'daily_sessions': 'sessions', 'daily_users': 'users', 'daily_page_views': 'page_views',
+    })
+    df = df[['period', 'sessions', 'users', 'page_views']].copy()
+    period = pd.to_datetime(df['period'])
+    # Hours arrive as UTC timestamps, days as dates; plot both as naive datetimes
+    df['period'] = period.dt.tz_convert(None) if period.dt.tz is not None else period
+    for column in ('sessions', 'users', 'page_views'):
+        df[column] = df[column].fillna(0).astype('int64')
+
+    if granularity in ("week", "month"):
+        df['period'] = df['period'].dt.to_period(GRANULARITIES[granularity][0]).dt.start_time
+        df = df.groupby('period', as_index=False)[['sessions', 'users', 'page_views']].sum()
+    return df.sort_values('period').reset_index(drop=True)
+
+
+def lttb(df, x, y, threshold=MAX_LINE_POINTS):
+    """
+    Largest-Triangle-Three-Buckets downsampling of a line series sorted by x.
+    Keeps the first and last points and, from each of threshold - 2 buckets,
+    the point forming the largest triangle with its neighbours, so peaks and
+    dips survive while the number of points drops to threshold.
+    """
+    n = len(df)
+    if threshold < 3 or n <= threshold:
+        return df
+
+    if pd.api.types.is_datetime64_any_dtype(df[x]):
+        xs = df[x].to_numpy(dtype="datetime64[ns]").astype(np.int64).astype(np.float64)
+    else:
+        xs = df[x].to_numpy(dtype=np.float64)
+    ys = df[y].to_numpy(dtype=np.float64)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+
+    keep = [0]
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        # Average of the next bucket (the last point for the final bucket)
+        next_start, next_end = end, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x, avg_y = xs[next_start:next_end].mean(), ys[next_start:next_end].mean()
+        ax, ay = xs[keep[-1]], ys[keep[-1]]
+        areas = np.abs((ax - avg_x) * (ys[start:end] - ay) - (ax - xs[start:end]) * (avg_y - ay))
+        keep.append(start + int(areas.argmax()))
+    keep.append(n - 1)
+    return df.iloc[keep].reset_index(drop=True)
+
+
+def top_n_with_other(df, label, value='sessions', n=TOP_CATEGORIES, other_label=OTHER_LABEL):
+    """
+    Keeps the n largest rows by value and sums every other numeric column of
+    the remaining long tail into a single "Other" row.
+    """
+    if len(df) <= n + 1:
+        return df
+    df = df.sort_values(value, ascending=False)
+    head, tail = df.iloc[:n], df.iloc[n:]
+    numeric = [column for column in df.columns if column != label and pd.api.types.is_numeric_dtype(df[column])]
+    other = pd.DataFrame({column: [tail[column].sum()] for column in numeric})
+    other[label] = other_label
+    return pd.concat([head, other.reindex(columns=df.columns)], ignore_index=True)
+
+
+def top_transitions(df, n=TRANSITION_PAGES, keep=("(entrance)", "(exit)")):
+    """
+    Transition rows between the n pages with the most outgoing transitions
+    (plus the entrance/exit markers), so the heatmap stays n x n.
+    """
+    volume = df.groupby('from_page')['transitions'].sum()
+    pages = set(volume.drop(list(keep), errors='ignore').nlargest(n).index) | set(keep)
+    return df[df['from_page'].isin(pages) & df['to_page'].isin(pages)].reset_index(drop=True)
+
+
+def page_count(df, page_size=TABLE_PAGE_SIZE):
+    return max(1, -(-len(df) // page_size))
+
+
+def page_slice(df, page, page_size=TABLE_PAGE_SIZE):
+    """Rows of one 1-based page, so only that page is sent to the browser."""
+    start = (page - 1) * page_size
+    return df.iloc[start:start + page_size]
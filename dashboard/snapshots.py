@@ -0,0 +1,193 @@
+import os
+import re
+import json
+import shutil
+import datetime
+import pandas as pd
+
+from database.backend import get_backend
+from database.planner import apply_exact_counts, load_dashboard_cube
+from database.properties import get_property
+from database.queries import run_query
+from database.result_cache import get_result_cache
+from database.topk import topk_dir
+from dashboard import charts
+from dashboard.rendering import pick_granularity, prepare_trends
+from dashboard.tabs import CUBE_TABS, EXACT_QUERIES, PATH_TABS, TAB_NAMES, TAB_QUERIES, TOPK_TABS
+
+# --- Precomputed dashboard snapshots ---
+# Every tab's data and chart for the standard date ranges, built ahead of time
+# (e.g. from a daily cron job) so the default views open without running a
+# query or building a chart. Custom ranges still query live.
+# Layout: <SNAPSHOT_DIR>/<property>/<range>/manifest.json plus one
+# <tab>.parquet and <tab>.vl.json (Vega-Lite spec) per tab.
+SNAPSHOT_DIR = os.environ.get(
+    "DASHBOARD_SNAPSHOT_DIR",
+    os.path.join(os.path.dirname(__file__), '..', 'data', 'snapshots')
+)
+PARQUET_COMPRESSION = "zstd"
+
+# Range key -> label shown in the sidebar
+STANDARD_RANGES = {
+    "last_7_days": "Last 7 days",
+    "last_30_days": "Last 30 days",
+    "last_90_days": "Last 90 days",
+    "month_to_date": "Month to date",
+}
+
+
+def standard_range(range_key, today=None):
+    """
+    (start_date, end_date) of a standard range. Ranges end yesterday: the
+    daily export for today is not complete yet.
+    """
+    end_date = (today or datetime.date.today()) - datetime.timedelta(days=1)
+    if range_key == "month_to_date":
+        return end_date.replace(day=1), end_date
+    days = int(re.match(r"last_(\d+)_days$", range_key).group(1))
+    return end_date - datetime.timedelta(days=days - 1), end_date
+
+
+def _file_name(tab_name):
+    return re.sub(r"\W+", "_", tab_name.lower())
+
+
+class Snapshot:
+    """
+    One built range.
+    - data: {tab name: DataFrame} as dashboard/app.py's load_tab_data() returns it,
+      with exact distinct counts already applied
+    - specs: {tab name: Vega-Lite dict} for the tabs with a chart
+    """
+
+    def __init__(self, range_key, start_date, end_date, built_at, data, specs):
+        self.range_key = range_key
+        self.start_date = start_date
+        self.end_date = end_date
+        self.built_at = built_at
+        self.data = data
+        self.specs = specs
+
+
+def load_tab(tab_name, start_date, end_date, backend, cube=None, sketch_dir=None):
+    """Queries one tab's data the way the dashboard does, with exact distinct counts."""
+    if tab_name in CUBE_TABS:
+        df = cube[CUBE_TABS[tab_name]]
+    elif tab_name in TOPK_TABS:
+        df = TOPK_TABS[tab_name](start_date, end_date, backend=backend, sketch_dir=sketch_dir)
+    else:
+        df = run_query(TAB_QUERIES[tab_name], start_date, end_date, backend=backend)
+    if tab_name in EXACT_QUERIES and not df.empty:
+        query_name, key = EXACT_QUERIES[tab_name]
+        df = apply_exact_counts(key, df, run_query(query_name, start_date, end_date, backend=backend))
+    return df
+
+
+def build_chart(tab_name, df, start_date, end_date):
+    """The chart dashboard/app.py draws for a tab, or None for tabs without one."""
+    if df.empty or tab_name not in charts.TAB_PIPELINES:
+        return None
+    if tab_name == "Traffic Trends":
+        granularity = pick_granularity(start_date, end_date)
+        return charts.trends_chart(prepare_trends(df, granularity), granularity)
+    return charts.TAB_PIPELINES[tab_name](df)
+
+
+def build_snapshot(range_key, prop=None, today=None, snapshot_dir=SNAPSHOT_DIR, log=print):
+    """
+    Builds one range's snapshot and swaps it in place of the previous one.
+    A tab whose query fails is left out and logged; the dashboard queries
+    it live. Returns the snapshot directory.
+    """
+    prop = prop or get_property()
+    start_date, end_date = standard_range(range_key, today)
+    backend = get_backend(prop)
+    cube = load_dashboard_cube(start_date, end_date, backend=backend, cache=get_result_cache(prop.cache_dir))
+
+    target = os.path.join(snapshot_dir, prop.key, range_key)
+    staging = target + ".building"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    tabs = {}
+    for tab_name in TAB_NAMES:
+        if tab_name in PATH_TABS:
+            continue  # several views, cached per range by database/paths.py instead
+        try:
+            df = load_tab(tab_name, start_date, end_date, backend, cube, topk_dir(prop.cache_dir))
+        except Exception as e:
+            log(f"{range_key}: skipped {tab_name}: {e}")
+            continue
+        name = _file_name(tab_name)
+        entry = {"data": f"{name}.parquet", "chart": None, "rows": len(df)}
+        df.to_parquet(os.path.join(staging, entry["data"]), index=False, compression=PARQUET_COMPRESSION)
+        chart = build_chart(tab_name, df, start_date, end_date)
+        if chart is not None:
+            entry["chart"] = f"{name}.vl.json"
+            with open(os.path.join(staging, entry["chart"]), 'w') as f:
+                json.dump(chart.to_dict(), f)
+        tabs[tab_name] = entry
+
+    with open(os.path.join(staging, "manifest.json"), 'w') as f:
+        json.dump({
+            "property": prop.key,
+            "range": range_key,
+            "start_date": start_date.isoformat(),
+            "end_date": end_date.isoformat(),
+            "built_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "tabs": tabs,
+        }, f, indent=2)
+    # Swap with renames: the range has a complete directory at every moment
+    # except between the two renames, which load_snapshot treats as not built
+    retired = target + ".old"
+    shutil.rmtree(retired, ignore_errors=True)
+    if os.path.exists(target):
+        os.rename(target, retired)
+    os.rename(staging, target)
+    shutil.rmtree(retired, ignore_errors=True)
+    return target
+
+
+def load_snapshot(range_key, prop=None, today=None, snapshot_dir=SNAPSHOT_DIR):
+    """
+    Reads a range's snapshot. Returns None when it has not been built, was
+    built for a different day (its dates no longer match the range), or a
+    file went missing while it was read (e.g. a rebuild swapped it out), so
+    the dashboard falls back to live queries.
+    """
+    prop = prop or get_property()
+    path = os.path.join(snapshot_dir, prop.key, range_key)
+    try:
+        with open(os.path.join(path, "manifest.json"), 'r') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    start_date, end_date = standard_range(range_key, today)
+    if (manifest["start_date"], manifest["end_date"]) != (start_date.isoformat(), end_date.isoformat()):
+        return None
+
+    data, specs = {}, {}
+    try:
+        for tab_name, entry in manifest["tabs"].items():
+            data[tab_name] = pd.read_parquet(os.path.join(path, entry["data"]), dtype_backend="pyarrow")
+            if entry["chart"]:
+                with open(os.path.join(path, entry["chart"]), 'r') as f:
+                    specs[tab_name] = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return Snapshot(range_key, start_date, end_date, manifest["built_at"], data, specs)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Precompute dashboard snapshots for the standard date ranges.")
+    parser.add_argument("--range", choices=list(STANDARD_RANGES), action="append",
+                        help="Range to build (repeatable); all standard ranges by default")
+    parser.add_argument("--property", help="GA4 property key from the registry (database/properties.py)")
+    parser.add_argument("--out", default=SNAPSHOT_DIR)
+    args = parser.parse_args()
+
+    prop = get_property(args.property)
+    for range_key in args.range or list(STANDARD_RANGES):
+        path = build_snapshot(range_key, prop, snapshot_dir=args.out)
+        print(f"Built {STANDARD_RANGES[range_key]} snapshot in {path}")
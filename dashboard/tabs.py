@@ -0,0 +1,39 @@
+from database.planner import EXACT_TOP_PAGES_QUERY, EXACT_USERS_QUERY
+from database.paths import load_paths
+from database.topk import load_top_pages, load_traffic_sources
+
+# --- Dashboard tabs ---
+# Which query feeds each tab, shared by dashboard/app.py and the snapshot
+# builder (dashboard/snapshots.py) so both load tabs the same way.
+
+# SQL query names (database/*.sql, loaded once by database/queries.py)
+query_user_clusters = "phase_5_user_clusters"
+query_bounce = "phase_5_predicted_bounce"
+query_hourly_trends = "phase_4_hourly_trends"
+query_page_weight = "phase_4_page_weight"
+
+TAB_NAMES = ["KPIs", "Traffic Trends", "Top Pages", "Devices", "Browser", "Traffic Sources", "User Segments", "Bounce Prediction", "Page Weight", "Paths & Funnels"]
+
+# Tabs served by the consolidated cube query -> key in load_dashboard_cube()
+CUBE_TABS = {"KPIs": "kpis", "Traffic Trends": "trends", "Devices": "device", "Browser": "browser"}
+
+# Tabs answered from the per-day top-K sketches (database/topk.py) -> loader
+TOPK_TABS = {"Top Pages": load_top_pages, "Traffic Sources": load_traffic_sources}
+
+# Tabs answered by the streaming path engine (database/paths.py) -> loader
+# returning {"transitions", "paths", "funnel"} DataFrames
+PATH_TABS = {"Paths & Funnels": load_paths}
+
+# Tabs with their own query
+TAB_QUERIES = {
+    "User Segments": query_user_clusters,
+    "Bounce Prediction": query_bounce,
+    "Page Weight": query_page_weight,
+}
+
+# Tabs showing HLL distinct counts -> (query with the exact counts, key for apply_exact_counts)
+EXACT_QUERIES = {
+    "KPIs": (EXACT_USERS_QUERY, "kpis"),
+    "Traffic Trends": (EXACT_USERS_QUERY, "trends"),
+    "Top Pages": (EXACT_TOP_PAGES_QUERY, "top_pages"),
+}
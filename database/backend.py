@@ -0,0 +1,468 @@
+import os
+import re
+import glob
+import datetime
+import threading
+from concurrent.futures import CancelledError
+
+from database.conn import get_bq_client, get_bqstorage_client
+from database.shards import MAX_BYTES_BILLED
+from database.tracing import record_job, span
+
+# --- Backend configuration ---
+# DASHBOARD_BACKEND selects where the SQL files run: "bigquery" (default) or "duckdb".
+# The DuckDB backend reads Parquet snapshots laid out as <PARQUET_DIR>/<table>/**/*.parquet
+BACKEND_NAME = os.environ.get("DASHBOARD_BACKEND", "bigquery").lower()
+PARQUET_DIR = os.environ.get(
+    "DASHBOARD_PARQUET_DIR",
+    os.path.join(os.path.dirname(__file__), '..', 'data', 'parquet')
+)
+# The dataset database/*.sql is written against. Other GA4 properties run the
+# same files with this name pointed at their own dataset (qualify_tables).
+DATASET = "analytics_453034732"
+
+
+class BigQueryBackend:
+    """
+    Runs queries against BigQuery using the client from database.conn.
+    - start() submits a QueryJob and returns immediately
+    - wait_arrow() blocks until the job finishes and downloads the result as
+      a pyarrow.Table, through the Storage Read API when it is available
+    - With a property (database/properties.py), queries run in its project
+      and dataset, and the bytes they bill count against its daily quota:
+      each job's cap is reserved when it starts and settled when it finishes
+    """
+    name = "bigquery"
+
+    def __init__(self, prop=None):
+        self.prop = prop
+        # id(job) -> bytes reserved from the property's quota, released by _settle()
+        self._reserved = {}
+        self._waiting = set()
+        self._lock = threading.Lock()
+
+    def _client(self):
+        return get_bq_client(self.prop.project if self.prop else None)
+
+    def _sql(self, sql):
+        return qualify_tables(sql, self.prop.dataset) if self.prop else sql
+
+    def start(self, sql, params=None):
+        from google.cloud import bigquery
+
+        budget = self.prop.reserve(MAX_BYTES_BILLED) if self.prop else MAX_BYTES_BILLED
+        job_config = bigquery.QueryJobConfig(
+            query_parameters=[bq_query_parameter(name, value) for name, value in (params or {}).items()],
+            # Hard limit: BigQuery fails the job instead of billing past the budget
+            maximum_bytes_billed=budget or None,
+        )
+        try:
+            job = self._client().query(self._sql(sql), job_config=job_config)
+        except Exception:
+            if self.prop:
+                self.prop.settle(budget, 0)
+            raise
+        if self.prop:
+            with self._lock:
+                self._reserved[id(job)] = budget
+        return job
+
+    def _settle(self, job):
+        """Swaps the job's quota reservation for the bytes it billed. Runs once per job."""
+        with self._lock:
+            self._waiting.discard(id(job))
+            if id(job) not in self._reserved:
+                return
+            reserved = self._reserved.pop(id(job))
+        self.prop.settle(reserved, job.total_bytes_billed or 0)
+
+    def _result(self, job, **kwargs):
+        """job.result(), settling the quota reservation whether the job succeeds, fails or is cancelled."""
+        with self._lock:
+            self._waiting.add(id(job))
+        try:
+            with span("wait"):
+                rows = job.result(**kwargs)
+        finally:
+            self._settle(job)
+        record_job(job)
+        return rows
+
+    def estimate_bytes(self, sql, params=None):
+        """Dry-runs the query and returns the bytes it would process. Dry runs are free."""
+        from google.cloud import bigquery
+
+        job_config = bigquery.QueryJobConfig(
+            query_parameters=[bq_query_parameter(name, value) for name, value in (params or {}).items()],
+            dry_run=True,
+            use_query_cache=False,
+        )
+        return self._client().query(self._sql(sql), job_config=job_config).total_bytes_processed
+
+    def wait_rows(self, job):
+        """Waits for the job and returns its RowIterator; rows are only downloaded when iterated."""
+        return self._result(job)
+
+    def wait_arrow(self, job):
+        rows = self._result(job)
+        with span("download"):
+            return rows.to_arrow(bqstorage_client=get_bqstorage_client(job.project))
+
+    def wait_batches(self, job, batch_rows):
+        """Streams the finished job's result as pyarrow.RecordBatches of about batch_rows rows."""
+        rows = self._result(job, page_size=batch_rows)
+        # ORDER BY results are read through a single stream, so row order is kept
+        return rows.to_arrow_iterable(bqstorage_client=get_bqstorage_client(job.project))
+
+    def wait(self, job):
+        return arrow_to_pandas(self.wait_arrow(job))
+
+    def cancel(self, job):
+        job.cancel()
+        # A job nobody waits on (cancelled before wait) would hold its reservation forever
+        with self._lock:
+            waiting = id(job) in self._waiting
+        if not waiting:
+            self._settle(job)
+
+    def query(self, sql, params=None):
+        return self.wait(self.start(sql, params))
+
+
+def bq_query_parameter(name, value):
+    """Builds a BigQuery query parameter, inferring its type from the Python value."""
+    from google.cloud import bigquery
+
+    if isinstance(value, (list, tuple)):
+        element_type = _bq_type(value[0]) if value else "STRING"
+        return bigquery.ArrayQueryParameter(name, element_type, list(value))
+    return bigquery.ScalarQueryParameter(name, _bq_type(value), value)
+
+
+def _bq_type(value):
+    if isinstance(value, bool):
+        return "BOOL"
+    if isinstance(value, int):
+        return "INT64"
+    if isinstance(value, float):
+        return "FLOAT64"
+    if isinstance(value, datetime.datetime):
+        return "TIMESTAMP"
+    if isinstance(value, datetime.date):
+        return "DATE"
+    return "STRING"
+
+
+class _LocalJob:
+    """A DuckDB statement bound to its own cursor so it can be interrupted."""
+
+    def __init__(self, cursor, sql, params):
+        self.cursor = cursor
+        self.sql = sql
+        self.params = params
+
+
+class DuckDBBackend:
+    """
+    Runs the same BigQuery SQL files against a local DuckDB replica.
+    - Every sub-folder of parquet_dir becomes a view in the analytics dataset schema
+    - Folders whose files carry a _TABLE_SUFFIX column (daily shards, e.g. events)
+      are also registered as the "<table>_*" wildcard table
+    - BigQuery-only syntax is rewritten by translate_to_duckdb before execution
+    """
+    name = "duckdb"
+
+    def __init__(self, parquet_dir=PARQUET_DIR, dataset=DATASET):
+        import duckdb
+
+        self.parquet_dir = os.path.abspath(parquet_dir)
+        self.dataset = dataset
+        self._con = duckdb.connect(database=":memory:")
+        self._lock = threading.Lock()
+        self.tables = set()
+        self.register_tables()
+
+    def register_tables(self):
+        """
+        (Re)creates one view per Parquet table folder found under parquet_dir.
+        Folders without Parquet files yet (e.g. a collector that has not
+        flushed) are skipped until the next call.
+        """
+        with self._lock:
+            self._con.execute(f"CREATE SCHEMA IF NOT EXISTS {self.dataset}")
+            if not os.path.isdir(self.parquet_dir):
+                return
+            for table in sorted(os.listdir(self.parquet_dir)):
+                table_dir = os.path.join(self.parquet_dir, table)
+                if not os.path.isdir(table_dir) or not glob.glob(f"{table_dir}/**/*.parquet", recursive=True):
+                    continue
+                self._con.execute(
+                    f'CREATE OR REPLACE VIEW {self.dataset}."{table}" AS '
+                    f"SELECT * FROM read_parquet('{table_dir}/**/*.parquet', union_by_name=true, hive_partitioning=false)"
+                )
+                self.tables.add(table)
+                columns = [row[0] for row in self._con.execute(f'DESCRIBE {self.dataset}."{table}"').fetchall()]
+                if "_TABLE_SUFFIX" in columns:
+                    self._con.execute(
+                        f'CREATE OR REPLACE VIEW {self.dataset}."{table}_*" AS SELECT * FROM {self.dataset}."{table}"'
+                    )
+
+    def start(self, sql, params=None):
+        # A cursor is an independent connection to the same database, so
+        # concurrent Streamlit sessions do not share statement state.
+        with self._lock:
+            cursor = self._con.cursor()
+        sql = translate_to_duckdb(sql)
+        # DuckDB rejects named parameters the statement does not use
+        used = set(re.findall(r"\$(\w+)", sql))
+        return _LocalJob(cursor, sql, {name: value for name, value in (params or {}).items() if name in used})
+
+    def wait_arrow(self, job):
+        try:
+            with span("wait"):
+                result = job.cursor.execute(job.sql, job.params or None)
+            with span("download"):
+                return _bigquery_types(result.fetch_arrow_table())
+        finally:
+            job.cursor.close()
+
+    def wait_batches(self, job, batch_rows):
+        try:
+            with span("wait"):
+                result = job.cursor.execute(job.sql, job.params or None)
+            for batch in result.fetch_record_batch(batch_rows):
+                yield batch
+        finally:
+            job.cursor.close()
+
+    def wait(self, job):
+        return arrow_to_pandas(self.wait_arrow(job))
+
+    def cancel(self, job):
+        job.cursor.interrupt()
+
+    def estimate_bytes(self, sql, params=None):
+        # Local scans are not billed, so there is nothing to budget.
+        return None
+
+    def query(self, sql, params=None):
+        return self.wait(self.start(sql, params))
+
+
+def _bigquery_types(table):
+    """
+    DuckDB returns SUM() of integers as HUGEINT (decimal128); cast those back
+    to the INT64/FLOAT64 types BigQuery would return for the same query.
+    """
+    import pyarrow as pa
+
+    for i, field in enumerate(table.schema):
+        if pa.types.is_decimal(field.type):
+            target = pa.int64() if field.type.scale == 0 else pa.float64()
+            table = table.set_column(i, field.name, table.column(i).cast(target))
+    return table
+
+
+def arrow_to_pandas(table):
+    """
+    Wraps a pyarrow.Table in a pandas DataFrame backed by ArrowDtype columns.
+    The Arrow buffers are reused instead of converted to NumPy, and
+    self_destruct releases each column as soon as it has been handed over.
+    """
+    import pandas as pd
+
+    with span("to_pandas", rows=table.num_rows):
+        return table.to_pandas(types_mapper=pd.ArrowDtype, self_destruct=True, split_blocks=True)
+
+
+# --- BigQuery -> DuckDB SQL translation ---
+def _split_args(text):
+    """Splits a function argument list on top-level commas."""
+    args, depth, current = [], 0, ""
+    for char in text:
+        if char in "([":
+            depth += 1
+        elif char in ")]":
+            depth -= 1
+        if char == "," and depth == 0:
+            args.append(current.strip())
+            current = ""
+        else:
+            current += char
+    if current.strip():
+        args.append(current.strip())
+    return args
+
+
+def _rewrite_call(sql, name, rewrite):
+    """
+    Replaces every NAME(...) call with rewrite(args).
+    Parentheses are matched so nested calls like MAX(event_datetime) survive.
+    """
+    pattern = re.compile(r"(?<![\w.])" + re.escape(name) + r"\s*\(", re.IGNORECASE)
+    out, pos = "", 0
+    while True:
+        match = pattern.search(sql, pos)
+        if not match:
+            return out + sql[pos:]
+        depth, i = 1, match.end()
+        while depth and i < len(sql):
+            if sql[i] == "(":
+                depth += 1
+            elif sql[i] == ")":
+                depth -= 1
+            i += 1
+        inner = _rewrite_call(sql[match.end():i - 1], name, rewrite)
+        out += sql[pos:match.start()] + rewrite(_split_args(inner))
+        pos = i
+
+
+def translate_to_duckdb(sql, dataset=DATASET):
+    """
+    Rewrites the BigQuery dialect used in database/*.sql into DuckDB SQL.
+    Only the constructs the dashboard queries use are covered; ML.PREDICT and
+    UNNEST(event_params) remain BigQuery-only. HLL sketches are emulated with
+    exact lists of distinct values, which merge the same way.
+    """
+    # Table references: drop backticks and the project prefix, quote wildcard tables
+    sql = sql.replace("`", "")
+    # Query parameters: @name -> $name
+    sql = re.sub(r"@(\w+)", r"$\1", sql)
+    # Array parameters: x IN UNNEST(@list) -> list_contains($list, x)
+    sql = re.sub(r"([\w.]+)\s+IN\s+UNNEST\((\$\w+)\)", r"list_contains(\2, \1)", sql, flags=re.IGNORECASE)
+    sql = re.sub(r"[a-z][a-z0-9-]*[a-z0-9]\.(" + dataset + r")\.", r"\1.", sql)
+    sql = re.sub(dataset + r"\.(\w+\*)", dataset + r'."\1"', sql)
+
+    sql = _rewrite_call(sql, "COUNTIF", lambda a: f"count_if({a[0]})")
+    sql = _rewrite_call(sql, "TIMESTAMP_DIFF", lambda a: f"date_diff('{a[2].lower()}', {a[1]}, {a[0]})")
+    sql = _rewrite_call(sql, "TIMESTAMP_MICROS", lambda a: f"make_timestamp({a[0]})")
+    sql = _rewrite_call(sql, "TIMESTAMP_TRUNC", lambda a: f"date_trunc('{a[1].lower()}', {a[0]})")
+    sql = _rewrite_call(sql, "FORMAT_DATE", lambda a: f"strftime({a[1]}, {a[0]})")
+    sql = _rewrite_call(sql, "PARSE_DATE", lambda a: f"CAST(strptime({a[1]}, {a[0]}) AS DATE)")
+    sql = _rewrite_call(sql, "DATE_SUB", lambda a: f"({a[0]} - {a[1]})")
+    sql = _rewrite_call(sql, "DATE_ADD", lambda a: f"({a[0]} + {a[1]})")
+    sql = _rewrite_call(sql, "SAFE_DIVIDE", lambda a: f"({a[0]} / NULLIF({a[1]}, 0))")
+    sql = _rewrite_call(sql, "HLL_COUNT.INIT", lambda a: f"list(DISTINCT {a[0]})")
+    sql = _rewrite_call(sql, "HLL_COUNT.MERGE", lambda a: f"len(list_distinct(flatten(list({a[0]}))))")
+    sql = _rewrite_call(sql, "HLL_COUNT.EXTRACT", lambda a: f"len({a[0]})")
+    sql = _rewrite_call(sql, "CURRENT_DATE", lambda a: "current_date")
+    sql = _rewrite_call(sql, "DATE", lambda a: f"CAST({a[0]} AS DATE)")
+    sql = _rewrite_call(sql, "TIMESTAMP", lambda a: f"CAST({a[0]} AS TIMESTAMP)")
+    return sql
+
+
+def qualify_tables(sql, dataset):
+    """
+    Points the DATASET table references of a database/*.sql template, with or
+    without a project prefix, at another dataset. The project comes from the
+    client the query runs on.
+    """
+    if dataset == DATASET:
+        return sql
+    return re.sub(r"(?<![\w.-])(?:[a-z][a-z0-9-]*[a-z0-9]\.)?" + DATASET + r"\.", dataset + ".", sql)
+
+
+# --- Backend registry ---
+_backends = {}
+_backend_lock = threading.Lock()
+
+
+def get_backend(prop=None):
+    """
+    Returns the process-wide query backend selected by DASHBOARD_BACKEND, one
+    per GA4 property (database/properties.py). Without a property the SQL
+    files run unchanged against DATASET and PARQUET_DIR.
+    """
+    key = prop.key if prop else None
+    with _backend_lock:
+        backend = _backends.get(key)
+        if backend is None:
+            if BACKEND_NAME == "duckdb":
+                backend = DuckDBBackend(prop.parquet_dir) if prop else DuckDBBackend()
+            elif BACKEND_NAME == "bigquery":
+                backend = BigQueryBackend(prop)
+            else:
+                raise ValueError(f"Unknown DASHBOARD_BACKEND '{BACKEND_NAME}' (expected 'bigquery' or 'duckdb')")
+            _backends[key] = backend
+        return backend
+
+
+def run_sql(sql, params=None, backend=None, tracker=None, arrow=False):
+    """
+    Runs a query with its @parameters on the given backend and returns an
+    ArrowDtype DataFrame, or the pyarrow.Table itself when arrow=True. When a
+    tracker is passed (see database/scheduler.py) the running job is
+    registered with it so it can be cancelled on timeout or when the
+    dashboard filters change.
+    """
+    backend = backend or get_backend()
+    with span("submit", backend=backend.name):
+        job = backend.start(sql, params)
+    wait = backend.wait_arrow if arrow else backend.wait
+    if tracker is None:
+        return wait(job)
+    tracker.track(backend, job)
+    try:
+        return wait(job)
+    finally:
+        tracker.untrack(job)
+
+
+def stream_sql(sql, params=None, backend=None, tracker=None, batch_rows=100_000):
+    """
+    Like run_sql, but yields the result as pyarrow.RecordBatches so callers
+    can process it in bounded memory. With a tracker, the stream stops with
+    CancelledError between batches once the query is cancelled or times out.
+    """
+    backend = backend or get_backend()
+    with span("submit", backend=backend.name):
+        job = backend.start(sql, params)
+    if tracker is not None:
+        tracker.track(backend, job)
+    try:
+        for batch in backend.wait_batches(job, batch_rows):
+            if tracker is not None and (tracker.cancelled or tracker.timed_out):
+                raise CancelledError()
+            yield batch
+    finally:
+        if tracker is not None:
+            tracker.untrack(job)
+
+
+# --- Parquet snapshots for the local replica ---
+def snapshot_table(table, start_date, end_date, parquet_dir=PARQUET_DIR, date_column="event_datetime"):
+    """
+    Copies one day at a time of a BigQuery table into
+    <parquet_dir>/<table>/event_date=YYYY-MM-DD/part-0.parquet so the
+    DuckDB backend can serve it. Existing days are overwritten.
+    """
+    backend = BigQueryBackend()
+    day = start_date
+    written = 0
+    while day <= end_date:
+        day_str = day.strftime('%Y-%m-%d')
+        df = backend.query(
+            f"SELECT * FROM {DATASET}.{table} WHERE DATE({date_column}) = @day",
+            {"day": day},
+        )
+        if not df.empty:
+            out_dir = os.path.join(parquet_dir, table, f"event_date={day_str}")
+            os.makedirs(out_dir, exist_ok=True)
+            df.to_parquet(os.path.join(out_dir, "part-0.parquet"), index=False)
+            written += len(df)
+        day += datetime.timedelta(days=1)
+    return written
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Snapshot BigQuery tables to Parquet for the local DuckDB backend.")
+    parser.add_argument("--table", default="cleaned_events")
+    parser.add_argument("--start", required=True, type=datetime.date.fromisoformat)
+    parser.add_argument("--end", required=True, type=datetime.date.fromisoformat)
+    parser.add_argument("--out", default=PARQUET_DIR)
+    args = parser.parse_args()
+
+    rows = snapshot_table(args.table, args.start, args.end, args.out)
+    print(f"Wrote {rows} rows of {args.table} to {args.out}")
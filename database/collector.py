@@ -0,0 +1,394 @@
+import os
+import re
+import json
+import sys
+import time
+import asyncio
+import datetime
+import numpy as np
+import pandas as pd
+from urllib.parse import parse_qs, urlsplit
+
+from database.backend import PARQUET_DIR
+from database.sketches import hash_values
+
+# --- First-party event collector ---
+# Receives the events website/js/beacon.js sends from the site pages and
+# writes them as Parquet into the DuckDB replica, in the cleaned_events
+# layout, so they are queryable seconds after they happen instead of after
+# the GA4 export lands. Events are buffered in memory and flushed as one
+# file per micro-batch; when the buffer is full the collector answers 503
+# and the beacon keeps the events for its next send.
+COLLECTOR_HOST = os.environ.get("DASHBOARD_COLLECTOR_HOST", "0.0.0.0")
+COLLECTOR_PORT = int(os.environ.get("DASHBOARD_COLLECTOR_PORT", "8787"))
+COLLECTED_TABLE = "collected_events"
+FLUSH_ROWS = int(os.environ.get("DASHBOARD_COLLECTOR_FLUSH_ROWS", "5000"))
+FLUSH_SECONDS = float(os.environ.get("DASHBOARD_COLLECTOR_FLUSH_SECONDS", "2"))
+MAX_BUFFERED_EVENTS = int(os.environ.get("DASHBOARD_COLLECTOR_MAX_BUFFERED", "200000"))
+MAX_BODY_BYTES = 64 * 1024
+MAX_EVENTS_PER_REQUEST = 500
+# Client timestamps further than this from the server clock are replaced by the receive time
+MAX_CLOCK_SKEW_SECONDS = 600
+ACCEPTED_EVENTS = {"page_view", "scroll", "user_engagement"}
+PARQUET_COMPRESSION = "zstd"
+
+# Buffered per event; event_key and event_datetime are derived when a batch is written
+COLUMNS = ["event_timestamp", "event_name", "session_id", "user_pseudo_id",
+           "device_category", "browser", "page_url", "page_title", "source", "medium",
+           "engagement_time_msec"]
+
+
+# --- Event parsing ---
+def parse_user_agent(user_agent):
+    """(device_category, browser) from a User-Agent header, using GA4's category names."""
+    ua = user_agent or ""
+    if re.search(r"iPad|Tablet|Android(?!.*Mobile)", ua):
+        device = "tablet"
+    elif re.search(r"Mobi|iPhone|Android", ua):
+        device = "mobile"
+    else:
+        device = "desktop"
+    # Order matters: Edge and Opera also claim Chrome, Chrome also claims Safari
+    for pattern, browser in ((r"Edg/", "Edge"), (r"OPR/|Opera", "Opera"), (r"SamsungBrowser", "Samsung Internet"),
+                             (r"Firefox/|FxiOS", "Firefox"), (r"Chrome/|CriOS", "Chrome"), (r"Safari/", "Safari")):
+        if re.search(pattern, ua):
+            return device, browser
+    return device, "(other)"
+
+
+def traffic_source(page_url, referrer):
+    """
+    (source, medium) the way GA4 attributes a landing page: utm_source and
+    utm_medium when tagged, else the referring host, else direct.
+    """
+    query = parse_qs(urlsplit(page_url or "").query)
+    if "utm_source" in query:
+        return query["utm_source"][0], query.get("utm_medium", ["(not set)"])[0]
+    host = urlsplit(referrer or "").hostname
+    if host and host != urlsplit(page_url or "").hostname:
+        return host.removeprefix("www."), "referral"
+    return "(direct)", "(none)"
+
+
+def parse_events(body, user_agent, received_micros):
+    """
+    Validates one beacon request body and returns its events as column lists.
+    The body is {"sent": <client ms>, "events": [...]}; each event has name,
+    ts (client ms), cid (client id), sid (session id) and url, plus optional
+    title, ref and engagement_time_msec. Event times are shifted by the
+    client's clock offset (received - sent), so a wrong client clock does
+    not move events in time. Raises ValueError on malformed bodies.
+    """
+    payload = json.loads(body)
+    events = payload.get("events") if isinstance(payload, dict) else None
+    if not isinstance(events, list) or not events or len(events) > MAX_EVENTS_PER_REQUEST:
+        raise ValueError("expected 1 to %d events" % MAX_EVENTS_PER_REQUEST)
+    offset = received_micros - int(payload.get("sent") or 0) * 1000
+    if abs(offset) > MAX_CLOCK_SKEW_SECONDS * 1_000_000:
+        offset = None
+
+    device_category, browser = parse_user_agent(user_agent)
+    columns = {column: [] for column in COLUMNS}
+    for event in events:
+        if not isinstance(event, dict) or event.get("name") not in ACCEPTED_EVENTS:
+            continue
+        client_id, session, url = event.get("cid"), event.get("sid"), event.get("url")
+        if not (isinstance(client_id, str) and isinstance(url, str) and isinstance(session, (int, str))):
+            continue
+        timestamp = int(event.get("ts") or 0) * 1000 + offset if offset is not None else received_micros
+        source, medium = traffic_source(url, event.get("ref"))
+        engagement = event.get("engagement_time_msec")
+        columns["event_timestamp"].append(min(timestamp, received_micros))
+        columns["event_name"].append(event["name"])
+        columns["session_id"].append(f"{client_id}.{session}")
+        columns["user_pseudo_id"].append(client_id)
+        columns["device_category"].append(device_category)
+        columns["browser"].append(browser)
+        columns["page_url"].append(url)
+        columns["page_title"].append(event.get("title"))
+        columns["source"].append(source)
+        columns["medium"].append(medium)
+        columns["engagement_time_msec"].append(engagement if isinstance(engagement, int) else None)
+    return columns
+
+
+# --- Parquet output ---
+def batch_table(columns):
+    """Arrow table for a batch of buffered events, with cleaned_events types."""
+    import pyarrow as pa
+
+    timestamps = np.asarray(columns["event_timestamp"], dtype=np.int64)
+    # Retried sends repeat events; the key lets queries drop the copies like the GA4 load does
+    keys = hash_values(pd.Series(columns["user_pseudo_id"]) + "|" + pd.Series(timestamps).astype(str)
+                       + "|" + pd.Series(columns["event_name"]) + "|" + pd.Series(columns["page_url"]))
+    strings = {column: pa.array(columns[column], pa.string()).dictionary_encode()
+               for column in ("event_name", "device_category", "browser", "source", "medium")}
+    return pa.table({
+        "event_key": pa.array(keys.view(np.int64)),
+        "event_timestamp": pa.array(timestamps),
+        "event_datetime": pa.array(timestamps).cast(pa.timestamp("us", tz="UTC")),
+        "event_name": strings["event_name"],
+        "session_id": pa.array(columns["session_id"], pa.string()),
+        "user_pseudo_id": pa.array(columns["user_pseudo_id"], pa.string()),
+        "device_category": strings["device_category"],
+        "browser": strings["browser"],
+        "page_url": pa.array(columns["page_url"], pa.string()),
+        "page_title": pa.array(columns["page_title"], pa.string()),
+        "source": strings["source"],
+        "medium": strings["medium"],
+        "engagement_time_msec": pa.array(columns["engagement_time_msec"], pa.int64()),
+    })
+
+
+def _day_dir(parquet_dir, day):
+    return os.path.join(parquet_dir, COLLECTED_TABLE, f"event_date={day:%Y-%m-%d}")
+
+
+def write_batch(columns, parquet_dir=PARQUET_DIR):
+    """
+    Writes one micro-batch as a Parquet file per UTC day it covers, under
+    <parquet_dir>/collected_events/event_date=YYYY-MM-DD/. Files are written
+    under a temporary name and renamed, so readers never see partial files.
+    Returns the paths written.
+    """
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    table = batch_table(columns)
+    days = pc.floor_temporal(table.column("event_datetime"), unit="day").cast("date32")
+    paths = []
+    for day in pc.unique(days).to_pylist():
+        out_dir = _day_dir(parquet_dir, day)
+        os.makedirs(out_dir, exist_ok=True)
+        path = os.path.join(out_dir, f"part-{time.time_ns()}-{os.getpid()}.parquet")
+        pq.write_table(table.filter(pc.equal(days, day)), path + ".tmp", compression=PARQUET_COMPRESSION)
+        os.replace(path + ".tmp", path)
+        paths.append(path)
+    return paths
+
+
+def compact_day(day, parquet_dir=PARQUET_DIR):
+    """
+    Merges a finished day's micro-batch files into one sorted file, so the
+    replica does not open thousands of small files per query. Returns the
+    number of files merged.
+    """
+    import pyarrow.parquet as pq
+
+    out_dir = _day_dir(parquet_dir, day)
+    if not os.path.isdir(out_dir):
+        return 0
+    parts = sorted(f for f in os.listdir(out_dir) if f.startswith("part-") and f.endswith(".parquet"))
+    if not parts:
+        return 0
+    path = os.path.join(out_dir, "compacted.parquet")
+    # Late events can arrive after a compaction; they are merged into the existing file
+    inputs = [os.path.join(out_dir, f) for f in parts] + ([path] if os.path.exists(path) else [])
+    table = pq.read_table(inputs).sort_by("event_timestamp")
+    pq.write_table(table, path + ".tmp", compression=PARQUET_COMPRESSION)
+    os.replace(path + ".tmp", path)
+    for f in parts:
+        os.remove(os.path.join(out_dir, f))
+    return len(parts)
+
+
+# --- Collector ---
+class Collector:
+    """
+    In-memory event buffer with a background flusher.
+    - add() appends a request's events, or returns False when MAX_BUFFERED_EVENTS
+      are already waiting (the caller answers 503 so clients back off)
+    - the flusher writes a batch every FLUSH_SECONDS, or as soon as FLUSH_ROWS
+      are buffered, in a worker thread so the event loop keeps accepting
+    - at the first flush of a new UTC day, the previous day is compacted
+    """
+
+    def __init__(self, parquet_dir=PARQUET_DIR, flush_rows=FLUSH_ROWS, flush_seconds=FLUSH_SECONDS,
+                 max_buffered=MAX_BUFFERED_EVENTS):
+        self.parquet_dir = parquet_dir
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self.max_buffered = max_buffered
+        self.buffer = {column: [] for column in COLUMNS}
+        self.buffered = 0
+        self.received = 0
+        self.written = 0
+        self.rejected = 0
+        self.files = 0
+        self.failures = 0
+        self.day = datetime.datetime.now(datetime.timezone.utc).date()
+        self._full = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+
+    def add(self, columns):
+        count = len(columns["event_name"])
+        if self.buffered + count > self.max_buffered:
+            self.rejected += count
+            return False
+        for column, values in columns.items():
+            self.buffer[column].extend(values)
+        self.buffered += count
+        self.received += count
+        if self.buffered >= self.flush_rows:
+            self._full.set()
+        return True
+
+    async def flush(self):
+        """
+        Writes everything buffered so far. Returns the number of events written.
+        If the write fails (e.g. a full disk) the batch goes back to the front
+        of the buffer and the error is raised; nothing is dropped.
+        """
+        async with self._flush_lock:
+            if not self.buffered:
+                return 0
+            batch, count = self.buffer, self.buffered
+            self.buffer, self.buffered = {column: [] for column in COLUMNS}, 0
+            self._full.clear()
+            loop = asyncio.get_running_loop()
+            try:
+                paths = await loop.run_in_executor(None, write_batch, batch, self.parquet_dir)
+            except Exception:
+                # Events that arrived during the write stay after the returned batch
+                for column in COLUMNS:
+                    batch[column].extend(self.buffer[column])
+                self.buffer, self.buffered = batch, count + self.buffered
+                self.failures += 1
+                raise
+            self.written += count
+            self.files += len(paths)
+            today = datetime.datetime.now(datetime.timezone.utc).date()
+            if today != self.day:
+                day, self.day = self.day, today
+                try:
+                    await loop.run_in_executor(None, compact_day, day, self.parquet_dir)
+                except Exception as e:
+                    # The day's parts stay readable; compact later with --compact
+                    print(f"Compacting {day} failed: {e}", file=sys.stderr)
+            return count
+
+    async def run_flusher(self):
+        """Flushes until cancelled. A failed flush is logged and retried on the next round."""
+        while True:
+            try:
+                await asyncio.wait_for(self._full.wait(), timeout=self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Flush of {self.buffered} events failed, retrying: {e}", file=sys.stderr)
+                await asyncio.sleep(self.flush_seconds)
+
+    def stats(self):
+        return {"buffered": self.buffered, "received": self.received, "written": self.written,
+                "rejected": self.rejected, "files": self.files, "failures": self.failures}
+
+
+# --- HTTP ---
+# A minimal HTTP/1.1 server on asyncio streams: the beacon only needs
+# POST /collect, the CORS preflight and a health check, and keep-alive
+# connections avoid a TCP handshake per event batch.
+RESPONSES = {200: "OK", 204: "No Content", 400: "Bad Request", 404: "Not Found",
+             405: "Method Not Allowed", 413: "Payload Too Large", 503: "Service Unavailable"}
+CORS_HEADERS = {
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Methods": "POST, OPTIONS",
+    "Access-Control-Allow-Headers": "Content-Type",
+}
+
+
+def _response(status, body=b"", headers=None, keep_alive=True):
+    lines = [f"HTTP/1.1 {status} {RESPONSES[status]}", f"Content-Length: {len(body)}",
+             f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+    lines += [f"{name}: {value}" for name, value in {**CORS_HEADERS, **(headers or {})}.items()]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode() + body
+
+
+async def handle_connection(collector, reader, writer):
+    """Serves the requests of one keep-alive connection."""
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            method, path, version = request_line.decode("latin-1").split(" ", 2)
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            keep_alive = headers.get("connection", "").lower() != "close" and version.strip() == "HTTP/1.1"
+            length = int(headers.get("content-length") or 0)
+            if length > MAX_BODY_BYTES:
+                writer.write(_response(413, keep_alive=False))
+                break
+            body = await reader.readexactly(length) if length else b""
+
+            path = urlsplit(path).path
+            if method == "OPTIONS":
+                status, payload, extra = 204, b"", None
+            elif path == "/health" and method == "GET":
+                status, payload, extra = 200, json.dumps(collector.stats()).encode(), {"Content-Type": "application/json"}
+            elif path != "/collect":
+                status, payload, extra = 404, b"", None
+            elif method != "POST":
+                status, payload, extra = 405, b"", None
+            else:
+                try:
+                    columns = parse_events(body, headers.get("user-agent"), time.time_ns() // 1000)
+                except (ValueError, TypeError, AttributeError):
+                    status, payload, extra = 400, b"", None
+                else:
+                    if collector.add(columns):
+                        status, payload, extra = 204, b"", None
+                    else:
+                        status, payload, extra = 503, b"", {"Retry-After": "1"}
+            writer.write(_response(status, payload, extra, keep_alive))
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (ValueError, asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host=COLLECTOR_HOST, port=COLLECTOR_PORT, parquet_dir=PARQUET_DIR):
+    collector = Collector(parquet_dir)
+    server = await asyncio.start_server(
+        lambda reader, writer: handle_connection(collector, reader, writer), host, port, backlog=1024
+    )
+    flusher = asyncio.create_task(collector.run_flusher())
+    print(f"Collecting events on http://{host}:{port}/collect into {os.path.join(parquet_dir, COLLECTED_TABLE)}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        flusher.cancel()
+        await collector.flush()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Collect website events from beacon.js into the local Parquet replica.")
+    parser.add_argument("--host", default=COLLECTOR_HOST)
+    parser.add_argument("--port", type=int, default=COLLECTOR_PORT)
+    parser.add_argument("--property", help="GA4 property key from the registry (database/properties.py)")
+    parser.add_argument("--compact", type=datetime.date.fromisoformat, metavar="DAY",
+                        help="Merge one day's micro-batch files and exit")
+    args = parser.parse_args()
+
+    from database.properties import get_property
+
+    prop = get_property(args.property)
+    if args.compact:
+        print(f"Merged {compact_day(args.compact, prop.parquet_dir)} files for {args.compact}")
+    else:
+        try:
+            asyncio.run(serve(args.host, args.port, prop.parquet_dir))
+        except KeyboardInterrupt:
+            pass
@@ -1,34 +1,123 @@
 import os
+import threading
 import streamlit as st
 from google.cloud import bigquery
 from google.oauth2 import service_account
 import json
 
-def get_bq_client():
+# --- Client registry ---
+# Clients are built once per process and shared by every Streamlit session and
+# worker thread. Reusing the credentials object keeps the OAuth token until it
+# expires, and the pooled HTTP session keeps TLS connections alive between queries.
+HTTP_POOL_SIZE = int(os.environ.get("BQ_HTTP_POOL_SIZE", "16"))
+# Project for service-account.json; GA4 properties in other projects set their
+# own in the property registry (database/properties.py).
+DEFAULT_PROJECT = os.environ.get("DASHBOARD_BQ_PROJECT", "brilliant-dryad-439810-q6")
+
+_credentials = None
+_clients = {}
+_storage_clients = {}
+_registry_lock = threading.Lock()
+
+
+def _load_credentials():
+    """
+    Returns (credentials, project_id) or (None, None) when no credentials are configured.
+    - Locally: reads credentials from local JSON file (service-account.json)
+    - On Streamlit Cloud: reads credentials from st.secrets
+    """
+    # --- Local environment ---
+    if os.path.exists("service-account.json"):
+        credentials = service_account.Credentials.from_service_account_file(
+            "service-account.json",
+            scopes=["https://www.googleapis.com/auth/cloud-platform"],
+        )
+        project_id = DEFAULT_PROJECT
+        return credentials, project_id
+
+    # --- Streamlit Cloud ---
+    service_account_info = st.secrets.get("gcp_service_account")
+    if service_account_info:
+        credentials = service_account.Credentials.from_service_account_info(
+            dict(service_account_info),
+            scopes=["https://www.googleapis.com/auth/cloud-platform"],
+        )
+        project_id = service_account_info.get("project_id")
+        return credentials, project_id
+
+    return None, None
+
+
+def _pooled_session(credentials):
+    """An authorized HTTP session whose connection pool fits the query worker pool."""
+    from google.auth.transport.requests import AuthorizedSession
+    from requests.adapters import HTTPAdapter
+
+    session = AuthorizedSession(credentials)
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+    session.mount("https://", adapter)
+    return session
+
+
+def _get_credentials():
     """
-    Returns a BigQuery client.
+    The process-wide (credentials, default_project), loaded on first use.
+    Call with _registry_lock held. Raises RuntimeError when none are configured.
+    """
+    global _credentials
+    if _credentials is None:
+        credentials, default_project = _load_credentials()
+        if credentials is None:
+            raise RuntimeError(
+                "No BigQuery credentials found! Add 'service-account.json' locally "
+                "or 'gcp_service_account' secret in Streamlit."
+            )
+        _credentials = (credentials, default_project)
+    return _credentials
+
+
+def get_bq_client(project_id=None):
+    """
+    Returns a shared BigQuery client.
     - On Streamlit Cloud: reads credentials from st.secrets
     - Locally: reads credentials from local JSON file (service-account.json)
+    The client is created on first use and reused afterwards; failures are not cached.
+    Errors are raised rather than shown, since this runs on worker threads
+    and with the registry lock held; the script thread reports them.
+    """
+    with _registry_lock:
+        credentials, default_project = _get_credentials()
+        project_id = project_id or default_project
+        client = _clients.get(project_id)
+        if client is None:
+            try:
+                client = bigquery.Client(
+                    credentials=credentials,
+                    project=project_id,
+                    _http=_pooled_session(credentials),
+                )
+            except Exception as e:
+                raise RuntimeError(f"Failed to create BigQuery client: {e}") from e
+            _clients[project_id] = client
+        return client
+
+
+def get_bqstorage_client(project_id=None):
+    """
+    Returns a shared BigQuery Storage Read API client, used to download large
+    results as Arrow streams. Returns None if google-cloud-bigquery-storage is
+    not installed, in which case results fall back to REST pagination.
     """
     try:
-        # --- Local environment ---
-        if os.path.exists("service-account.json"):
-            credentials = service_account.Credentials.from_service_account_file("service-account.json")
-            project_id = "brilliant-dryad-439810-q6"  # Your GCP project ID
-            client = bigquery.Client(credentials=credentials, project=project_id)
-            return client
-
-        # --- Streamlit Cloud ---
-        service_account_info = st.secrets.get("gcp_service_account")
-        if service_account_info:
-            credentials = service_account.Credentials.from_service_account_info(service_account_info)
-            project_id = service_account_info.get("project_id")
-            client = bigquery.Client(credentials=credentials, project=project_id)
-            return client
-
-        st.error("No BigQuery credentials found! Add 'service-account.json' locally or 'gcp_service_account' secret in Streamlit.")
+        from google.cloud import bigquery_storage
+    except ImportError:
         return None
 
-    except Exception as e:
-        st.error(f"Failed to create BigQuery client: {e}")
-        return None
\ No newline at end of file
+    with _registry_lock:
+        credentials, default_project = _get_credentials()
+        project_id = project_id or default_project
+        storage_client = _storage_clients.get(project_id)
+        if storage_client is None:
+            storage_client = bigquery_storage.BigQueryReadClient(credentials=credentials)
+            _storage_clients[project_id] = storage_client
+        return storage_client
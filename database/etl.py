@@ -0,0 +1,230 @@
+import re
+import time
+import datetime
+
+from database.backend import DATASET, bq_query_parameter, qualify_tables
+from database.conn import get_bq_client
+from database.queries import get_template
+
+# --- Incremental cleaned_events ETL ---
+# Loads only the export shards that are new or changed since the last run.
+# Each shard's last_modified_time is recorded in etl_watermarks after its
+# MERGE succeeds; a rerun of the same shards produces the same table.
+MERGE_QUERY = "phase_3_1_cleaned_events_merge"
+CLEANED_TABLE = "cleaned_events"
+WATERMARK_TABLE = "etl_watermarks"
+BATCH_DAYS = 7
+
+SHARD_PATTERN = re.compile(r"^events_((?:intraday_)?(\d{8}))$")
+
+CLEANED_SCHEMA = """
+  event_key INT64 NOT NULL,
+  shard_date DATE NOT NULL,
+  event_datetime TIMESTAMP NOT NULL,
+  event_name STRING,
+  session_id STRING,
+  user_pseudo_id STRING,
+  device_category STRING,
+  browser STRING,
+  page_url STRING,
+  page_title STRING,
+  source STRING,
+  medium STRING
+"""
+
+WATERMARK_SCHEMA = """
+  shard_suffix STRING NOT NULL,
+  shard_date DATE NOT NULL,
+  source_last_modified TIMESTAMP NOT NULL,
+  processed_at TIMESTAMP NOT NULL
+"""
+
+
+def _run(client, sql, params=None):
+    from google.cloud import bigquery
+
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=[bq_query_parameter(name, value) for name, value in (params or {}).items()]
+    )
+    job = client.query(sql, job_config=job_config)
+    job.result()
+    return job
+
+
+def ensure_tables(client, dataset=DATASET, rebuild=False):
+    """
+    Creates cleaned_events (partitioned by day, clustered for the rollup and
+    dashboard scans) and etl_watermarks if they do not exist. rebuild
+    replaces both, which makes the next run reload every shard.
+    Raises RuntimeError when an existing cleaned_events lacks columns of
+    CLEANED_SCHEMA (e.g. a table built by phase-3-1-data_cleaning_query.sql
+    before event_key): its rows could not be merged, so it needs --rebuild.
+    """
+    if not rebuild:
+        check_cleaned_schema(client, dataset)
+    create = "CREATE OR REPLACE TABLE" if rebuild else "CREATE TABLE IF NOT EXISTS"
+    _run(client, (
+        f"{create} {dataset}.{CLEANED_TABLE} ({CLEANED_SCHEMA})\n"
+        "PARTITION BY DATE(event_datetime)\n"
+        "CLUSTER BY event_name, session_id"
+    ))
+    _run(client, f"{create} {dataset}.{WATERMARK_TABLE} ({WATERMARK_SCHEMA})")
+
+
+def check_cleaned_schema(client, dataset=DATASET):
+    """Raises RuntimeError if cleaned_events exists without every column the MERGE writes."""
+    from google.api_core.exceptions import NotFound
+
+    try:
+        table = client.get_table(f"{dataset}.{CLEANED_TABLE}")
+    except NotFound:
+        return
+    expected = [line.split()[0] for line in CLEANED_SCHEMA.strip().splitlines()]
+    missing = [name for name in expected if name not in {field.name for field in table.schema}]
+    if missing:
+        raise RuntimeError(
+            f"{dataset}.{CLEANED_TABLE} has no {', '.join(missing)} column(s); it predates the incremental "
+            "ETL. Run database/etl.py --rebuild to recreate it and reload every shard."
+        )
+
+
+def list_shards(client, dataset=DATASET):
+    """
+    Returns {date: (suffix, last_modified)} for every export shard. When a day
+    has both a daily and an intraday shard, the daily shard wins: GA4 writes
+    it once the day is complete.
+    """
+    rows = _run(client, (
+        f"SELECT table_id, TIMESTAMP_MILLIS(last_modified_time) AS last_modified "
+        f"FROM {dataset}.__TABLES__ WHERE STARTS_WITH(table_id, 'events_')"
+    )).result()
+    shards = {}
+    for row in rows:
+        match = SHARD_PATTERN.match(row.table_id)
+        if not match:
+            continue
+        suffix, day = match.group(1), datetime.datetime.strptime(match.group(2), '%Y%m%d').date()
+        if day in shards and not shards[day][0].startswith("intraday_"):
+            continue
+        shards[day] = (suffix, row.last_modified)
+    return shards
+
+
+def load_watermarks(client, dataset=DATASET):
+    """Returns {shard_suffix: source_last_modified} for every shard already loaded."""
+    rows = _run(client, (
+        f"SELECT shard_suffix, MAX(source_last_modified) AS source_last_modified "
+        f"FROM {dataset}.{WATERMARK_TABLE} GROUP BY shard_suffix"
+    )).result()
+    return {row.shard_suffix: row.source_last_modified for row in rows}
+
+
+def pending_shards(client, dataset=DATASET, start_date=None, end_date=None):
+    """
+    Shards to (re)load, as sorted (date, suffix, last_modified) tuples:
+    new shards, shards modified since they were loaded (intraday tables
+    keep growing, daily tables can be restated), and daily shards whose
+    day was last loaded from an intraday shard.
+    With start_date/end_date, every shard in the range is reloaded.
+    """
+    shards = list_shards(client, dataset)
+    if start_date is not None and end_date is not None:
+        return [(day, *shards[day]) for day in sorted(shards) if start_date <= day <= end_date]
+    watermarks = load_watermarks(client, dataset)
+    pending = []
+    for day in sorted(shards):
+        suffix, last_modified = shards[day]
+        loaded = watermarks.get(suffix)
+        if loaded is None or last_modified > loaded:
+            pending.append((day, suffix, last_modified))
+    return pending
+
+
+def merge_shards(shards, client, dataset=DATASET):
+    """MERGEs one batch of shards into cleaned_events and returns the number of rows changed."""
+    template = get_template(MERGE_QUERY)
+    days = [day for day, _, _ in shards]
+    params = template.bind(
+        shard_suffixes=[suffix for _, suffix, _ in shards],
+        shard_dates=days,
+        start_date=min(days),
+        end_date=max(days),
+    )
+    job = _run(client, qualify_tables(template.sql, dataset), params)
+    return job.num_dml_affected_rows or 0
+
+
+def record_watermarks(shards, client, dataset=DATASET):
+    """Upserts the last_modified time each shard had when it was loaded."""
+    _run(client, (
+        f"MERGE {dataset}.{WATERMARK_TABLE} AS target\n"
+        "USING (\n"
+        "  SELECT suffix AS shard_suffix, @shard_dates[OFFSET(i)] AS shard_date,\n"
+        "    @last_modified[OFFSET(i)] AS source_last_modified\n"
+        "  FROM UNNEST(@shard_suffixes) AS suffix WITH OFFSET AS i\n"
+        ") AS source\n"
+        "ON target.shard_suffix = source.shard_suffix\n"
+        "WHEN MATCHED THEN UPDATE SET source_last_modified = source.source_last_modified, "
+        "processed_at = CURRENT_TIMESTAMP()\n"
+        "WHEN NOT MATCHED THEN INSERT (shard_suffix, shard_date, source_last_modified, processed_at)\n"
+        "  VALUES (source.shard_suffix, source.shard_date, source.source_last_modified, CURRENT_TIMESTAMP())"
+    ), {
+        "shard_suffixes": [suffix for _, suffix, _ in shards],
+        "shard_dates": [day for day, _, _ in shards],
+        "last_modified": [last_modified for _, _, last_modified in shards],
+    })
+
+
+def run_incremental(client=None, dataset=DATASET, start_date=None, end_date=None, rebuild=False,
+                    batch_days=BATCH_DAYS, log=print):
+    """
+    Loads every pending shard in batches of batch_days. The watermark of a
+    batch is only written after its MERGE succeeds, so a failed run is
+    resumed by simply running again.
+    Returns the (first, last) date loaded, or None when nothing was pending.
+    """
+    client = client or get_bq_client()
+    ensure_tables(client, dataset, rebuild=rebuild)
+    shards = pending_shards(client, dataset, start_date, end_date)
+    for i in range(0, len(shards), batch_days):
+        batch = shards[i:i + batch_days]
+        changed = merge_shards(batch, client, dataset)
+        record_watermarks(batch, client, dataset)
+        log(f"Loaded {', '.join(suffix for _, suffix, _ in batch)}: {changed} rows changed")
+    if not shards:
+        return None
+    return shards[0][0], shards[-1][0]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from database.rollup import refresh_rollups
+
+    parser = argparse.ArgumentParser(description="Incrementally load GA4 export shards into cleaned_events.")
+    parser.add_argument("--start", type=datetime.date.fromisoformat, help="Reload every shard from this date")
+    parser.add_argument("--end", type=datetime.date.fromisoformat, help="Reload every shard up to this date")
+    parser.add_argument("--rebuild", action="store_true", help="Recreate cleaned_events and reload all shards")
+    parser.add_argument("--rollups", action="store_true", help="Rebuild the rollups for the loaded dates afterwards")
+    parser.add_argument("--every", type=float, default=0, help="Repeat every N seconds instead of running once")
+    parser.add_argument("--property", help="GA4 property key from the registry (database/properties.py)")
+    args = parser.parse_args()
+    if bool(args.start) != bool(args.end):
+        parser.error("--start and --end go together")
+
+    from database.properties import get_property
+
+    prop = get_property(args.property)
+    client = get_bq_client(prop.project)
+    rebuild = args.rebuild
+    while True:
+        loaded = run_incremental(client, prop.dataset, start_date=args.start, end_date=args.end, rebuild=rebuild)
+        rebuild = False
+        if loaded is None:
+            print("No new shards to load")
+        elif args.rollups:
+            refresh_rollups(*loaded, client=client, dataset=prop.dataset)
+            print(f"Rebuilt rollups for {loaded[0]} to {loaded[1]}")
+        if not args.every:
+            break
+        time.sleep(args.every)
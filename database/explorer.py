@@ -0,0 +1,192 @@
+import os
+import threading
+from collections import OrderedDict
+
+from database.backend import DATASET, arrow_to_pandas, get_backend
+from database.shards import shard_parameters
+from database.tracing import span
+
+# --- Raw event explorer ---
+# Browses the events_* export page by page. The query result stays in
+# BigQuery's temporary destination table (or the DuckDB replica); only a
+# bounded window of pages is held in memory, and Parquet exports are
+# written one Arrow batch at a time.
+PAGE_SIZE = 100
+WINDOW_PAGES = 5
+EXPORT_BATCH_ROWS = 100_000
+EXPORT_DIR = os.environ.get(
+    "DASHBOARD_EXPORT_DIR",
+    os.path.join(os.path.dirname(__file__), '..', 'data', 'exports')
+)
+
+# Column name -> SQL expression over the GA4 export schema.
+# Only these names can be selected, so the projection is never free-form SQL.
+# event_params columns need UNNEST and are BigQuery-only.
+COLUMNS = {
+    "event_date": "event_date",
+    "event_timestamp": "event_timestamp",
+    "event_name": "event_name",
+    "user_id": "user_id",
+    "user_pseudo_id": "user_pseudo_id",
+    "device_category": "device.category",
+    "browser": "device.web_info.browser",
+    "source": "traffic_source.source",
+    "medium": "traffic_source.medium",
+    "page_location": "(SELECT value.string_value FROM UNNEST(event_params) WHERE key = 'page_location')",
+    "ga_session_id": "(SELECT value.int_value FROM UNNEST(event_params) WHERE key = 'ga_session_id')",
+}
+DEFAULT_COLUMNS = ["event_date", "event_timestamp", "event_name", "user_id", "user_pseudo_id"]
+
+
+def build_explorer_query(columns, event_names=None, dataset=DATASET):
+    """
+    SELECT of the chosen columns over the events_* shards of a date range.
+    The event_name filter and the _TABLE_SUFFIX bounds are part of the SQL,
+    so BigQuery only scans the selected columns and shards.
+    """
+    unknown = [column for column in columns if column not in COLUMNS]
+    if unknown or not columns:
+        raise ValueError(f"Unknown explorer columns: {', '.join(unknown) or '(none selected)'}")
+    select = ",\n  ".join(f"{COLUMNS[column]} AS {column}" for column in columns)
+    sql = (
+        f"SELECT\n  {select}\nFROM `{dataset}.events_*`\n"
+        "WHERE _TABLE_SUFFIX BETWEEN @start_suffix AND @end_suffix"
+    )
+    if event_names:
+        sql += "\n  AND event_name IN UNNEST(@event_names)"
+    return sql
+
+
+class _PageWindow:
+    """The most recently viewed pages, evicting the oldest past max_pages."""
+
+    def __init__(self, max_pages=WINDOW_PAGES):
+        self.max_pages = max_pages
+        self._pages = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, page, fetch):
+        with self._lock:
+            if page in self._pages:
+                self._pages.move_to_end(page)
+                return self._pages[page]
+        df = fetch()
+        with self._lock:
+            self._pages[page] = df
+            while len(self._pages) > self.max_pages:
+                self._pages.popitem(last=False)
+        return df
+
+
+class BigQueryEventPager:
+    """
+    Pages through a finished query's destination table with tabledata.list,
+    which returns exactly one page per request; exports stream the same
+    table through the Storage Read API.
+    """
+
+    def __init__(self, backend, sql, params, page_size=PAGE_SIZE):
+        self.backend = backend
+        self.page_size = page_size
+        self._window = _PageWindow()
+        with span("explorer_query"):
+            self._job = backend.start(sql, params)
+            # Waiting through the backend settles the job's quota reservation
+            self.total_rows = backend.wait_rows(self._job).total_rows or 0
+
+    def page(self, page):
+        """Rows of one 1-based page as a DataFrame."""
+        def fetch():
+            with span("explorer_page", page=page):
+                rows = self._job.client.list_rows(
+                    self._job.destination,
+                    start_index=(page - 1) * self.page_size,
+                    max_results=self.page_size,
+                    page_size=self.page_size,
+                )
+                return arrow_to_pandas(rows.to_arrow())
+        return self._window.get(page, fetch)
+
+    def iter_batches(self, batch_rows=EXPORT_BATCH_ROWS):
+        """Every row of the result as a stream of pyarrow.RecordBatch."""
+        return self.backend.wait_batches(self._job, batch_rows)
+
+
+class DuckDBEventPager:
+    """
+    Same interface over the local replica, paging with LIMIT/OFFSET. Pages
+    are ordered by every selected column, since DuckDB does not keep row
+    order between runs of a query without ORDER BY.
+    """
+
+    def __init__(self, backend, sql, params, page_size=PAGE_SIZE):
+        self.backend = backend
+        self.sql = sql
+        self.params = params
+        self.page_size = page_size
+        self._window = _PageWindow()
+        with span("explorer_query"):
+            job = backend.start(f"SELECT COUNT(*) AS n FROM ({sql})", params)
+            self.total_rows = int(backend.wait_arrow(job).column(0)[0].as_py())
+
+    def page(self, page):
+        def fetch():
+            with span("explorer_page", page=page):
+                job = self.backend.start(
+                    f"SELECT * FROM ({self.sql}) ORDER BY ALL "
+                    f"LIMIT {self.page_size} OFFSET {(page - 1) * self.page_size}",
+                    self.params,
+                )
+                return self.backend.wait(job)
+        return self._window.get(page, fetch)
+
+    def iter_batches(self, batch_rows=EXPORT_BATCH_ROWS):
+        job = self.backend.start(self.sql, self.params)
+        try:
+            reader = job.cursor.execute(job.sql, job.params or None).fetch_record_batch(batch_rows)
+            for batch in reader:
+                yield batch
+        finally:
+            job.cursor.close()
+
+
+def open_explorer(start_date, end_date, columns=DEFAULT_COLUMNS, event_names=None, backend=None,
+                  page_size=PAGE_SIZE):
+    """Runs the explorer query and returns a pager over its result."""
+    backend = backend or get_backend()
+    sql = build_explorer_query(columns, event_names)
+    params = shard_parameters(start_date, end_date)
+    if event_names:
+        params["event_names"] = list(event_names)
+    pager_class = DuckDBEventPager if backend.name == "duckdb" else BigQueryEventPager
+    return pager_class(backend, sql, params, page_size=page_size)
+
+
+def page_count(pager):
+    return max(1, -(-pager.total_rows // pager.page_size))
+
+
+def export_parquet(pager, path, on_progress=None):
+    """
+    Writes the whole result to one Parquet file, a row group per batch, so
+    at most one batch is in memory. Returns the number of rows written;
+    an empty result writes no file and returns 0.
+    """
+    import pyarrow.parquet as pq
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    written = 0
+    writer = None
+    with span("explorer_export"):
+        try:
+            for batch in pager.iter_batches():
+                if writer is None:
+                    writer = pq.ParquetWriter(path, batch.schema)
+                writer.write_batch(batch)
+                written += batch.num_rows
+                if on_progress:
+                    on_progress(written)
+        finally:
+            if writer is not None:
+                writer.close()
+    return written
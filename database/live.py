@@ -0,0 +1,236 @@
+import os
+import datetime
+import threading
+import numpy as np
+import pandas as pd
+
+from database.backend import get_backend
+from database.collector import COLLECTED_TABLE
+from database.queries import run_query
+from database.sketches import HyperLogLog, hash_values
+
+# --- Live mode ---
+# Polls the events_intraday_* shards the GA4 tag streams into and folds
+# only the events newer than the last poll into in-memory counters, so each
+# refresh reads seconds' worth of events instead of re-running the dashboard.
+# With DASHBOARD_LIVE_SOURCE=collector (DuckDB backend), the events come from
+# the first-party collector (database/collector.py) instead, seconds after
+# they happen.
+LIVE_SOURCE = os.environ.get("DASHBOARD_LIVE_SOURCE", "intraday").lower()
+LIVE_QUERY = "phase_6_live_events"
+COLLECTED_QUERY = "phase_6_collected_events"
+# Intraday shards are not partitioned, so every poll bills a scan of the
+# whole day's shard so far, event_params included, however few events are
+# new: at 30 s that is about 2,880 scans a day. The intraday source
+# therefore polls every 5 minutes by default; the collector reads local
+# Parquet and can poll every 30 s for free.
+LIVE_POLL_SECONDS = float(os.environ.get(
+    "DASHBOARD_LIVE_POLL_SECONDS", "30" if LIVE_SOURCE == "collector" else "300"
+))
+LIVE_WINDOW_MINUTES = 180
+# Events can land a little after their client-side timestamp, so each poll
+# re-reads this many seconds before the watermark and drops the duplicates.
+LIVE_OVERLAP_SECONDS = 120
+LIVE_MAX_PAGES = 2000
+OTHER_PAGE = "(other)"
+NOT_SET = "(not set)"
+MINUTE_PRECISION = 10
+
+
+def extract_params(table, keys):
+    """
+    Pulls event_params values out of an Arrow table without a Python loop
+    per row: {key: object array with one value (or None) per event}.
+    """
+    import pyarrow.compute as pc
+
+    params = table.column("event_params").combine_chunks()
+    flat = params.flatten()
+    parents = pc.list_parent_indices(params).to_numpy()
+    names = flat.field("key")
+    values = flat.field("value")
+    result = {}
+    for key in keys:
+        mask = pc.equal(names, key).to_numpy(zero_copy_only=False)
+        column = np.full(table.num_rows, None, dtype=object)
+        strings = values.field("string_value").to_numpy(zero_copy_only=False)[mask]
+        ints = values.field("int_value").to_numpy(zero_copy_only=False)[mask]
+        # A parameter is either a string or an int; keep whichever is set
+        column[parents[mask]] = np.where(pd.isna(strings), ints, strings)
+        result[key] = column
+    return result
+
+
+class LiveCounters:
+    """
+    Running totals for one day of intraday events.
+    - page views, plus HLL sessions and users, per page
+    - per-minute events, page views and HLL users for the last LIVE_WINDOW_MINUTES
+    """
+
+    def __init__(self, day=None, source=LIVE_SOURCE):
+        self.source = source
+        self.day = day or datetime.datetime.now(datetime.timezone.utc).date()
+        day_start = datetime.datetime.combine(self.day, datetime.time(), tzinfo=datetime.timezone.utc)
+        self.since_micros = int(day_start.timestamp() * 1_000_000)
+        self.users = HyperLogLog()
+        self.sessions = HyperLogLog()
+        self.page_views = 0
+        self.events = 0
+        self.pages = {}
+        self.minutes = {}
+        self.last_poll = None
+        self.last_rows = 0
+        self.polling = False
+        self._recent_keys = np.empty(0, dtype=np.uint64)
+        self._recent_times = np.empty(0, dtype=np.int64)
+        self._lock = threading.Lock()
+
+    def apply(self, table):
+        """
+        Adds the events of one poll result, either GA4 export rows with
+        event_params or collector rows with session_id and page_url.
+        Returns how many were new.
+        """
+        if table.num_rows == 0:
+            return 0
+        df = pd.DataFrame({
+            "event_timestamp": table.column("event_timestamp").to_numpy(),
+            "event_name": table.column("event_name").to_numpy(zero_copy_only=False),
+            "user_pseudo_id": table.column("user_pseudo_id").to_numpy(zero_copy_only=False),
+        })
+        if "event_params" in table.column_names:
+            params = extract_params(table, ["page_location", "ga_session_id"])
+            df["page_url"] = params["page_location"]
+            df["session_id"] = df["user_pseudo_id"].astype(str) + "." + pd.Series(params["ga_session_id"]).astype(str)
+        else:
+            df["page_url"] = table.column("page_url").to_numpy(zero_copy_only=False)
+            df["session_id"] = table.column("session_id").to_numpy(zero_copy_only=False)
+        keys = hash_values(
+            df["user_pseudo_id"].astype(str) + "|" + df["event_timestamp"].astype(str) + "|" + df["event_name"].astype(str)
+        )
+        # Drop events already counted by the overlapping previous poll, and repeats within this one
+        fresh = ~np.isin(keys, self._recent_keys)
+        fresh &= ~pd.Series(keys).duplicated().to_numpy()
+        df, keys = df[fresh], keys[fresh]
+        if df.empty:
+            return 0
+
+        df["page_url"] = df["page_url"].fillna(NOT_SET)
+        df["is_page_view"] = df["event_name"] == "page_view"
+        df["minute"] = df["event_timestamp"] // 60_000_000 * 60_000_000
+
+        with self._lock:
+            self.events += len(df)
+            self.page_views += int(df["is_page_view"].sum())
+            self.users.add_many(df["user_pseudo_id"])
+            self.sessions.add_many(df["session_id"])
+
+            for page_url, group in df.groupby("page_url", sort=False):
+                if page_url not in self.pages and len(self.pages) >= LIVE_MAX_PAGES:
+                    page_url = OTHER_PAGE
+                page = self.pages.setdefault(page_url, {"views": 0, "sessions": HyperLogLog(), "users": HyperLogLog()})
+                page["views"] += int(group["is_page_view"].sum())
+                page["sessions"].add_many(group["session_id"])
+                page["users"].add_many(group["user_pseudo_id"])
+
+            for minute, group in df.groupby("minute", sort=False):
+                bucket = self.minutes.setdefault(
+                    int(minute), {"events": 0, "page_views": 0, "users": HyperLogLog(MINUTE_PRECISION)}
+                )
+                bucket["events"] += len(group)
+                bucket["page_views"] += int(group["is_page_view"].sum())
+                bucket["users"].add_many(group["user_pseudo_id"])
+
+            self.since_micros = max(self.since_micros, int(df["event_timestamp"].max()))
+            oldest_minute = self.since_micros - LIVE_WINDOW_MINUTES * 60_000_000
+            for minute in [m for m in self.minutes if m < oldest_minute]:
+                del self.minutes[minute]
+
+            horizon = self.since_micros - LIVE_OVERLAP_SECONDS * 1_000_000
+            keep = self._recent_times >= horizon
+            new = df["event_timestamp"].to_numpy() >= horizon
+            self._recent_keys = np.concatenate([self._recent_keys[keep], keys[new]])
+            self._recent_times = np.concatenate([self._recent_times[keep], df["event_timestamp"].to_numpy()[new]])
+        return len(df)
+
+    def poll(self, backend=None):
+        """Reads the intraday events after the watermark and applies them. Returns the number of new events."""
+        since = self.since_micros - LIVE_OVERLAP_SECONDS * 1_000_000
+        if self.source == "collector":
+            backend = backend or get_backend()
+            if backend.name != "duckdb":
+                raise ValueError("DASHBOARD_LIVE_SOURCE=collector needs DASHBOARD_BACKEND=duckdb")
+            # The collector may have written its first file after the backend started
+            if COLLECTED_TABLE not in backend.tables:
+                backend.register_tables()
+            if COLLECTED_TABLE not in backend.tables:
+                return 0
+            table = run_query(COLLECTED_QUERY, backend=backend, arrow=True, since_micros=since)
+        else:
+            since_day = datetime.datetime.fromtimestamp(since / 1_000_000, datetime.timezone.utc).date()
+            table = run_query(
+                LIVE_QUERY, backend=backend, arrow=True,
+                since_suffix=f"{since_day:%Y%m%d}", since_micros=since,
+            )
+        new_events = self.apply(table)
+        self.last_poll = datetime.datetime.now(datetime.timezone.utc)
+        self.last_rows = new_events
+        return new_events
+
+    # --- Views for the dashboard ---
+    def top_pages(self, n=20):
+        with self._lock:
+            rows = [
+                (url, page["views"], page["sessions"].count(), page["users"].count())
+                for url, page in self.pages.items()
+            ]
+        df = pd.DataFrame(rows, columns=["page_url", "page_views", "sessions", "unique_users"])
+        return df.sort_values("page_views", ascending=False).head(n).reset_index(drop=True)
+
+    def trend(self):
+        with self._lock:
+            rows = [
+                (minute, bucket["events"], bucket["page_views"], bucket["users"].count())
+                for minute, bucket in sorted(self.minutes.items())
+            ]
+        df = pd.DataFrame(rows, columns=["minute", "events", "page_views", "users"])
+        df["minute"] = pd.to_datetime(df["minute"], unit="us", utc=True)
+        return df
+
+
+_counters = {}
+_counters_lock = threading.Lock()
+
+
+def get_live_counters(key=None):
+    """Process-wide counters for one GA4 property, restarted when the UTC day changes."""
+    with _counters_lock:
+        today = datetime.datetime.now(datetime.timezone.utc).date()
+        counters = _counters.get(key)
+        if counters is None or counters.day != today:
+            counters = _counters[key] = LiveCounters(today)
+        return counters
+
+
+def poll_if_due(counters, interval=LIVE_POLL_SECONDS, backend=None):
+    """
+    Polls at most once per interval however many sessions are watching.
+    last_poll only moves when a poll succeeds, so a failed poll is retried
+    on the next run instead of after a whole interval. Returns True when a
+    poll ran.
+    """
+    with _counters_lock:
+        due = not counters.polling and (counters.last_poll is None or (
+            datetime.datetime.now(datetime.timezone.utc) - counters.last_poll
+        ).total_seconds() >= interval)
+        if not due:
+            return False
+        # Claim the poll so concurrent sessions do not poll too
+        counters.polling = True
+    try:
+        counters.poll(backend=backend)
+    finally:
+        with _counters_lock:
+            counters.polling = False
+    return True
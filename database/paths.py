@@ -0,0 +1,260 @@
+import os
+import datetime
+import numpy as np
+import pandas as pd
+
+from database.queries import stream_query
+from database.result_cache import get_result_cache, is_closed
+from database.sketches import TOPK_CAPACITY, SpaceSaving
+
+# --- Navigation paths and funnels ---
+# How readers move between pages, computed from phase_4_page_sequences.sql
+# streamed in Arrow batches (sorted by session and time) instead of
+# self-joining cleaned_events per request. Each batch is reduced with
+# neighbour comparisons and shifts, so memory is bounded by one batch plus
+# the running totals:
+# - transitions: page -> next page counts, with (entrance) and (exit)
+# - paths: the first PATH_STEPS pages of each session, top paths kept in a
+#   Space-Saving summary (database/sketches.py)
+# - funnel: sessions reaching each step of an ordered list of pages
+# Results are cached per date range in the property's ResultCache.
+PATHS_QUERY = "phase_4_page_sequences"
+PATHS_BATCH_ROWS = int(os.environ.get("DASHBOARD_PATHS_BATCH_ROWS", "200000"))
+PATH_STEPS = 4
+TOP_PATHS = 25
+# Default funnel for the Paths & Funnels tab: comma-separated page URLs
+FUNNEL_STEPS = [url.strip() for url in os.environ.get("DASHBOARD_FUNNEL_STEPS", "").split(",") if url.strip()]
+ENTRANCE = "(entrance)"
+EXIT = "(exit)"
+PATH_SEPARATOR = " → "
+
+
+class PathAccumulator:
+    """
+    Running path statistics over page views sorted by (session_id, event_datetime).
+    Pages get global integer codes (0 and 1 are ENTRANCE and EXIT); the
+    last session of each batch is held back until the next batch, so
+    sessions split across batches are counted once.
+    """
+
+    def __init__(self, funnel_steps=(), path_steps=PATH_STEPS, capacity=TOPK_CAPACITY):
+        self.pages = {ENTRANCE: 0, EXIT: 1}
+        self.path_steps = path_steps
+        self.funnel_steps = list(funnel_steps)
+        self.sessions = 0
+        self.page_views = 0
+        self._pair_keys = np.empty(0, dtype=np.int64)
+        self._pair_counts = np.empty(0, dtype=np.int64)
+        self._paths = SpaceSaving(capacity)
+        self._funnel = np.zeros(len(self.funnel_steps), dtype=np.int64)
+        self._carry = None
+
+    def _codes(self, urls):
+        """Global page codes for an Arrow array of URLs (new pages are added)."""
+        encoded = urls.dictionary_encode()
+        mapping = np.array(
+            [self.pages.setdefault(url, len(self.pages)) for url in encoded.dictionary.to_pylist()], dtype=np.int64,
+        )
+        return mapping[encoded.indices.to_numpy(zero_copy_only=False)] if len(mapping) else np.empty(0, np.int64)
+
+    def add_batch(self, batch):
+        """Adds a RecordBatch (or Table) of session_id, page_url rows; the last session waits for the next batch."""
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        table = pa.Table.from_batches([batch]) if isinstance(batch, pa.RecordBatch) else batch
+        table = table.select(["session_id", "page_url"])
+        if self._carry is not None:
+            table = pa.concat_tables([self._carry, table.cast(self._carry.schema)])
+        if table.num_rows == 0:
+            return self
+        session_ids = table.column("session_id").combine_chunks()
+        last = session_ids[len(session_ids) - 1]
+        # Rows are sorted by session, so the last session is a suffix of the batch
+        held = int(pc.sum(pc.equal(session_ids, last)).as_py())
+        self._carry = table.slice(table.num_rows - held)
+        self._add_sessions(table.slice(0, table.num_rows - held))
+        return self
+
+    def finish(self):
+        """Counts the session held back from the last batch."""
+        if self._carry is not None:
+            self._add_sessions(self._carry)
+            self._carry = None
+        return self
+
+    def _add_sessions(self, table):
+        """Adds complete sessions, every row of each one present and in order."""
+        import pyarrow.compute as pc
+
+        n = table.num_rows
+        if n == 0:
+            return
+        self.page_views += n
+        session_ids = table.column("session_id").combine_chunks()
+        new_session = np.r_[True, pc.not_equal(session_ids[1:], session_ids[:-1]).to_numpy(zero_copy_only=False)]
+        codes = self._codes(table.column("page_url").combine_chunks())
+
+        # Funnel first: repeated views of a page still count as reaching it
+        session_index = np.cumsum(new_session) - 1
+        self._add_funnel(codes, session_index, int(session_index[-1]) + 1)
+
+        # Run-length collapse: reloads of the same page are one step
+        keep = new_session | (codes != np.r_[-1, codes[:-1]])
+        codes, new_session, session_index = codes[keep], new_session[keep], session_index[keep]
+        n = len(codes)
+        starts = np.flatnonzero(new_session)
+        ends = np.r_[starts[1:], n] - 1
+        self.sessions += len(starts)
+
+        # Transitions: previous page (or ENTRANCE) -> page, and last page -> EXIT
+        previous = np.r_[0, codes[:-1]]
+        previous[starts] = self.pages[ENTRANCE]
+        sources = np.r_[previous, codes[ends]]
+        targets = np.r_[codes, np.full(len(starts), self.pages[EXIT])]
+        self._add_pairs((sources << 32) | targets)
+
+        # Paths: each session's first path_steps pages, then EXIT if it ended there
+        position = np.arange(n) - starts[session_index]
+        matrix = np.full((len(starts), self.path_steps + 1), -1, dtype=np.int64)
+        first = position < self.path_steps
+        matrix[session_index[first], position[first]] = codes[first]
+        lengths = ends - starts + 1
+        short = lengths <= self.path_steps
+        matrix[np.flatnonzero(short), lengths[short]] = self.pages[EXIT]
+        unique_paths, counts = np.unique(matrix, axis=0, return_counts=True)
+        names = self.page_names()
+        labels = [PATH_SEPARATOR.join(names[code] for code in row if code >= 0) for row in unique_paths]
+        self._paths.update(np.asarray(labels, dtype=object), counts)
+
+    def _add_pairs(self, keys):
+        keys = np.r_[self._pair_keys, keys]
+        weights = np.r_[self._pair_counts, np.ones(len(keys) - len(self._pair_keys), dtype=np.int64)]
+        self._pair_keys, inverse = np.unique(keys, return_inverse=True)
+        self._pair_counts = np.bincount(inverse, weights=weights).astype(np.int64)
+
+    def _add_funnel(self, codes, session_index, session_count):
+        """
+        Sessions reaching each funnel step after the previous one: for every
+        step, the first matching row past the session's previous step.
+        """
+        reached = np.full(session_count, -1, dtype=np.int64)
+        alive = np.ones(session_count, dtype=bool)
+        for step, url in enumerate(self.funnel_steps):
+            code = self.pages.get(url)
+            rows = np.flatnonzero(codes == code) if code is not None else np.empty(0, dtype=np.int64)
+            sessions = session_index[rows]
+            valid = alive[sessions] & (rows > reached[sessions])
+            matched, first = np.unique(sessions[valid], return_index=True)
+            self._funnel[step] += len(matched)
+            alive = np.zeros(session_count, dtype=bool)
+            alive[matched] = True
+            reached[matched] = rows[valid][first]
+
+    def page_names(self):
+        names = np.empty(len(self.pages), dtype=object)
+        names[list(self.pages.values())] = list(self.pages.keys())
+        return names
+
+    # --- Results ---
+    def transitions(self):
+        """from_page, to_page, transitions and each transition's share of from_page's exits."""
+        names = self.page_names()
+        df = pd.DataFrame({
+            "from_page": names[self._pair_keys >> 32],
+            "to_page": names[self._pair_keys & 0xFFFFFFFF],
+            "transitions": self._pair_counts,
+        })
+        df["share"] = df["transitions"] / df.groupby("from_page")["transitions"].transform("sum")
+        return df.sort_values("transitions", ascending=False, kind="stable").reset_index(drop=True)
+
+    def top_paths(self, n=TOP_PATHS):
+        """The n most common session starts: path, sessions, and the maximum overcount (error)."""
+        summary = self._paths
+        df = pd.DataFrame({"path": summary.items, "sessions": summary.counts, "error": summary.errors})
+        df["pct_sessions"] = df["sessions"] / max(self.sessions, 1) * 100
+        return df.head(n)
+
+    def funnel(self):
+        """step, page, sessions reaching it, percentage of step 1 and the drop-off from the previous step."""
+        if not self.funnel_steps:
+            return pd.DataFrame()
+        sessions = self._funnel
+        return pd.DataFrame({
+            "step": np.arange(1, len(sessions) + 1),
+            "page": self.funnel_steps,
+            "sessions": sessions,
+            "pct_of_first": sessions / max(int(sessions[0]), 1) * 100,
+            "drop_off": np.r_[0, sessions[:-1] - sessions[1:]],
+        })
+
+
+def analyze_paths(batches, funnel_steps=(), path_steps=PATH_STEPS):
+    """Runs a PathAccumulator over an iterable of Arrow batches and returns it finished."""
+    accumulator = PathAccumulator(funnel_steps, path_steps)
+    for batch in batches:
+        accumulator.add_batch(batch)
+    return accumulator.finish()
+
+
+def _cache_key(view, start_date, end_date, funnel_steps=()):
+    key = f"{PATHS_QUERY}/{view}/{start_date.isoformat()}/{end_date.isoformat()}"
+    if view == "funnel":
+        key += "/" + "|".join(funnel_steps)
+    return key
+
+
+def load_paths(start_date, end_date, funnel_steps=(), backend=None, cache=None, tracker=None,
+               batch_rows=PATHS_BATCH_ROWS):
+    """
+    {"transitions", "paths", "funnel"} DataFrames for sessions starting in the range.
+    Views already in the cache are reused; the rest come from one streamed
+    pass over phase_4_page_sequences.sql. The funnel is only computed (and
+    cached per list of steps) when funnel_steps is given.
+    """
+    cache = cache or get_result_cache()
+    funnel_steps = list(funnel_steps)
+    views = ["transitions", "paths"] + (["funnel"] if funnel_steps else [])
+    results = {view: cache.get(_cache_key(view, start_date, end_date, funnel_steps)) for view in views}
+    missing = [view for view, df in results.items() if df is None]
+    if missing:
+        batches = stream_query(PATHS_QUERY, start_date, end_date, backend=backend, tracker=tracker, batch_rows=batch_rows)
+        accumulator = analyze_paths(batches, funnel_steps if "funnel" in missing else ())
+        computed = {"transitions": accumulator.transitions, "paths": accumulator.top_paths, "funnel": accumulator.funnel}
+        for view in missing:
+            results[view] = computed[view]()
+            cache.put(_cache_key(view, start_date, end_date, funnel_steps), results[view], immutable=is_closed(end_date))
+    results.setdefault("funnel", pd.DataFrame())
+    return results
+
+
+def default_funnel(df_paths, min_steps=3):
+    """Funnel steps for the tab before any are chosen: FUNNEL_STEPS, else the pages of the most common long path."""
+    if FUNNEL_STEPS:
+        return FUNNEL_STEPS
+    for path in df_paths.get("path", []):
+        pages = [page for page in path.split(PATH_SEPARATOR) if page != EXIT]
+        if len(pages) >= min_steps:
+            return pages
+    return []
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Print page transitions, top paths and a funnel for a date range.")
+    parser.add_argument("--start", required=True, type=datetime.date.fromisoformat)
+    parser.add_argument("--end", required=True, type=datetime.date.fromisoformat)
+    parser.add_argument("--funnel", help="Comma-separated page URLs, in order")
+    parser.add_argument("--property", help="GA4 property key from the registry (database/properties.py)")
+    args = parser.parse_args()
+
+    from database.backend import get_backend
+    from database.properties import get_property
+
+    prop = get_property(args.property)
+    steps = [url.strip() for url in args.funnel.split(",")] if args.funnel else FUNNEL_STEPS
+    results = load_paths(args.start, args.end, steps, get_backend(prop), get_result_cache(prop.cache_dir))
+    for view, df in results.items():
+        if not df.empty:
+            print(f"\n{view}:\n{df.head(20).to_string()}")
@@ -21,8 +21,8 @@ WITH RawEvents AS (
   FROM
     `brilliant-dryad-439810-q6.analytics_453034732.events_*`
   WHERE
-    _TABLE_SUFFIX BETWEEN FORMAT_DATE('%Y%m%d', DATE_SUB(CURRENT_DATE(), INTERVAL 30 DAY))
-                     AND FORMAT_DATE('%Y%m%d', CURRENT_DATE())
+    -- Constant shard bounds (database/shards.py) so only the selected days are read
+    _TABLE_SUFFIX BETWEEN @start_suffix AND @end_suffix
     AND event_name NOT IN ('scroll', 'user_engagement', 'session_start', 'first_visit')
 )
 
@@ -0,0 +1,84 @@
+-- Incremental cleaned_events load
+-- Flattens the GA4 export shards listed in @shard_suffixes (YYYYMMDD for
+-- events_YYYYMMDD, intraday_YYYYMMDD for events_intraday_YYYYMMDD) and merges
+-- them into the partitioned, clustered cleaned_events table.
+-- Rows already loaded are updated when the export restated them, and rows of
+-- the processed shard dates that are no longer in the export are deleted, so
+-- rerunning a batch, or replacing an intraday shard with its daily shard,
+-- leaves cleaned_events matching the export exactly.
+-- Events without a user_pseudo_id (cookieless or consent-denied hits) are
+-- skipped: they have no session to belong to, and their event_key would be
+-- NULL, which the NOT NULL column rejects and which would fail the whole batch.
+-- Run by database/etl.py, which tracks processed shards in etl_watermarks.
+
+MERGE analytics_453034732.cleaned_events AS target
+USING (
+  SELECT
+    FARM_FINGERPRINT(CONCAT(
+      user_pseudo_id, '|', CAST(event_timestamp AS STRING), '|', event_name, '|',
+      CAST(IFNULL(event_bundle_sequence_id, 0) AS STRING)
+    )) AS event_key,
+    PARSE_DATE('%Y%m%d', event_date) AS shard_date,
+    TIMESTAMP_MICROS(event_timestamp) AS event_datetime,
+    event_name,
+    CONCAT(user_pseudo_id, '.', CAST(params.ga_session_id AS STRING)) AS session_id,
+    user_pseudo_id,
+    device.category AS device_category,
+    device.web_info.browser AS browser,
+    params.page_location AS page_url,
+    params.page_title AS page_title,
+    traffic_source.source AS source,
+    traffic_source.medium AS medium
+  FROM (
+    SELECT
+      *,
+      -- One pass over event_params per event for all three parameters
+      (
+        SELECT AS STRUCT
+          MAX(IF(key = 'page_location', value.string_value, NULL)) AS page_location,
+          MAX(IF(key = 'page_title', value.string_value, NULL)) AS page_title,
+          MAX(IF(key = 'ga_session_id', value.int_value, NULL)) AS ga_session_id
+        FROM UNNEST(event_params)
+      ) AS params
+    FROM `analytics_453034732.events_*`
+    WHERE _TABLE_SUFFIX IN UNNEST(@shard_suffixes)
+  )
+  WHERE event_timestamp IS NOT NULL
+    AND user_pseudo_id IS NOT NULL
+  -- The export can contain the same event twice; MERGE needs one source row per key
+  QUALIFY ROW_NUMBER() OVER (PARTITION BY event_key) = 1
+) AS source
+ON target.event_key = source.event_key
+  -- Limits the target scan to the partitions these shards can touch
+  AND DATE(target.event_datetime) BETWEEN DATE_SUB(@start_date, INTERVAL 1 DAY) AND DATE_ADD(@end_date, INTERVAL 1 DAY)
+-- Only rows whose values changed are rewritten (and counted as changed)
+WHEN MATCHED AND (
+    target.shard_date IS DISTINCT FROM source.shard_date
+    OR target.event_name IS DISTINCT FROM source.event_name
+    OR target.session_id IS DISTINCT FROM source.session_id
+    OR target.device_category IS DISTINCT FROM source.device_category
+    OR target.browser IS DISTINCT FROM source.browser
+    OR target.page_url IS DISTINCT FROM source.page_url
+    OR target.page_title IS DISTINCT FROM source.page_title
+    OR target.source IS DISTINCT FROM source.source
+    OR target.medium IS DISTINCT FROM source.medium
+  ) THEN
+  UPDATE SET
+    shard_date = source.shard_date,
+    event_name = source.event_name,
+    session_id = source.session_id,
+    device_category = source.device_category,
+    browser = source.browser,
+    page_url = source.page_url,
+    page_title = source.page_title,
+    source = source.source,
+    medium = source.medium
+WHEN NOT MATCHED THEN
+  INSERT (event_key, shard_date, event_datetime, event_name, session_id, user_pseudo_id,
+          device_category, browser, page_url, page_title, source, medium)
+  VALUES (event_key, shard_date, event_datetime, event_name, session_id, user_pseudo_id,
+          device_category, browser, page_url, page_title, source, medium)
+WHEN NOT MATCHED BY SOURCE
+  AND target.shard_date IN UNNEST(@shard_dates)
+  AND DATE(target.event_datetime) BETWEEN DATE_SUB(@start_date, INTERVAL 1 DAY) AND DATE_ADD(@end_date, INTERVAL 1 DAY)
+THEN DELETE;
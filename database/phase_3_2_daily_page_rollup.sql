@@ -0,0 +1,30 @@
+-- Daily page rollup
+-- One row per (event_date, page_url) with page views and HLL sketches of the
+-- sessions and users that viewed the page that day. Query strings and
+-- fragments are stripped, so ?utm_... and #section variants count as one page.
+-- Written to analytics_453034732.daily_page_rollup by database/rollup.py.
+
+WITH page_views AS (
+  SELECT
+    DATE(event_datetime) AS event_date,
+    REGEXP_REPLACE(page_url, '[?#].*$', '') AS page_url,
+    session_id,
+    user_pseudo_id
+  FROM
+    analytics_453034732.cleaned_events
+  WHERE
+    DATE(event_datetime) BETWEEN @start_date AND @end_date
+    AND event_name = 'page_view'
+    AND page_url IS NOT NULL
+)
+
+SELECT
+event_date,
+page_url,
+COUNT(*) AS page_views,
+HLL_COUNT.INIT(session_id) AS sessions_sketch,
+HLL_COUNT.INIT(user_pseudo_id) AS users_sketch
+FROM
+page_views
+GROUP BY
+event_date, page_url;
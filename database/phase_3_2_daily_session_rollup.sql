@@ -0,0 +1,23 @@
+-- Daily session rollup
+-- One row per (event_date, device_category, browser) for sessions that started
+-- in the date range. Session counts are additive across days; unique users are
+-- kept as HLL sketches so any date range can be served with HLL_COUNT.MERGE.
+-- Reads the sessions table (phase_3_3_sessions.sql), one row per session.
+-- Written to analytics_453034732.daily_session_rollup by database/rollup.py.
+
+SELECT
+session_date AS event_date,
+device_category,
+browser,
+COUNT(*) AS sessions,
+SUM(page_views) AS page_views,
+SUM(is_bounce) AS bounces,
+SUM(session_duration) AS total_session_duration,
+SUM(conversions) AS conversions,
+HLL_COUNT.INIT(user_pseudo_id) AS users_sketch
+FROM
+analytics_453034732.sessions
+WHERE
+session_date BETWEEN @start_date AND @end_date
+GROUP BY
+event_date, device_category, browser;
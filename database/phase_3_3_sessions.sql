@@ -0,0 +1,36 @@
+-- Sessions
+-- One row per session that started in the date range, derived from
+-- cleaned_events in a single GROUP BY: start/end, duration, page views,
+-- bounce flag, entry/exit page, device and source.
+-- Written to analytics_453034732.sessions (partitioned by session_date) by
+-- database/rollup.py. The daily session rollup, exact user counts, bounce
+-- features and user segments read this table instead of raw events.
+-- database/sessions.py builds the same rows with NumPy for the local replica.
+
+SELECT
+session_id,
+ANY_VALUE(user_pseudo_id) AS user_pseudo_id,
+DATE(MIN(event_datetime)) AS session_date,
+MIN(event_datetime) AS session_start,
+MAX(event_datetime) AS session_end,
+TIMESTAMP_DIFF(MAX(event_datetime), MIN(event_datetime), SECOND) AS session_duration,
+COUNTIF(event_name = 'page_view') AS page_views,
+COUNTIF(event_name = 'conversion') AS conversions,
+-- A bounce is a session with only one page view.
+CASE WHEN COUNTIF(event_name = 'page_view') = 1 THEN 1 ELSE 0 END AS is_bounce,
+-- Events other than page views have no ordering value and are ignored.
+MIN_BY(page_url, CASE WHEN event_name = 'page_view' THEN event_datetime END) AS entry_page,
+MAX_BY(page_url, CASE WHEN event_name = 'page_view' THEN event_datetime END) AS exit_page,
+ANY_VALUE(device_category) AS device_category,
+ANY_VALUE(browser) AS browser,
+ANY_VALUE(source) AS source,
+ANY_VALUE(medium) AS medium
+FROM
+analytics_453034732.cleaned_events
+WHERE
+-- One extra day so sessions that cross midnight are complete.
+DATE(event_datetime) BETWEEN @start_date AND DATE_ADD(@end_date, INTERVAL 1 DAY)
+GROUP BY
+session_id
+HAVING
+session_date BETWEEN @start_date AND @end_date;
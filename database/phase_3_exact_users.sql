@@ -0,0 +1,17 @@
+-- Exact unique users
+-- COUNT(DISTINCT) counterpart of the HLL_COUNT.MERGE(users_sketch) values in
+-- phase_3_unique_visitors.sql and phase_4_dashboard_cube.sql, over the same
+-- sessions table the daily session rollup is built from.
+-- GROUPING SETS return one row per day plus the whole range (event_date NULL)
+-- from a single scan.
+-- Run in the background to refine the approximate values (database/planner.py).
+
+SELECT
+session_date AS event_date,
+COUNT(DISTINCT user_pseudo_id) AS users
+FROM
+analytics_453034732.sessions
+WHERE
+session_date BETWEEN @start_date AND @end_date
+GROUP BY
+GROUPING SETS ((), (session_date));
@@ -0,0 +1,10 @@
+-- Unique visitors over the whole date range
+-- Distinct users do not add up across days, so this merges the daily
+-- HLL sketches separately from the per-day dashboard cube.
+
+SELECT
+HLL_COUNT.MERGE(users_sketch) AS unique_visitors
+FROM
+analytics_453034732.daily_session_rollup
+WHERE
+event_date BETWEEN @start_date AND @end_date;
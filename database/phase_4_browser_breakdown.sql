@@ -1,9 +1,9 @@
 -- Browser breakdown with date filter
 SELECT
     browser,
-    COUNT(DISTINCT session_id) AS sessions,
-    COUNTIF(event_name='page_view') AS page_views
-FROM analytics_453034732.cleaned_events
-WHERE event_datetime BETWEEN TIMESTAMP({start_date}) AND TIMESTAMP({end_date})
+    SUM(sessions) AS sessions,
+    SUM(page_views) AS page_views
+FROM analytics_453034732.daily_session_rollup
+WHERE event_date BETWEEN @start_date AND @end_date
 GROUP BY browser
-ORDER BY sessions DESC;
\ No newline at end of file
+ORDER BY sessions DESC;
@@ -0,0 +1,46 @@
+-- Per-day counts behind the top-K sketches (database/topk.py)
+-- One row per (event_date, dimension, item), read from the rollups rather
+-- than cleaned_events:
+-- - page_url: page views per page (daily_page_rollup)
+-- - source: sessions per traffic source (sessions)
+-- - browser: sessions per browser (daily_session_rollup)
+
+SELECT
+event_date,
+'page_url' AS dimension,
+page_url AS item,
+SUM(page_views) AS weight
+FROM
+analytics_453034732.daily_page_rollup
+WHERE
+event_date BETWEEN @start_date AND @end_date
+GROUP BY
+event_date, page_url
+
+UNION ALL
+
+SELECT
+session_date AS event_date,
+'source' AS dimension,
+IFNULL(source, '(not set)') AS item,
+COUNT(*) AS weight
+FROM
+analytics_453034732.sessions
+WHERE
+session_date BETWEEN @start_date AND @end_date
+GROUP BY
+session_date, source
+
+UNION ALL
+
+SELECT
+event_date,
+'browser' AS dimension,
+IFNULL(browser, '(not set)') AS item,
+SUM(sessions) AS weight
+FROM
+analytics_453034732.daily_session_rollup
+WHERE
+event_date BETWEEN @start_date AND @end_date
+GROUP BY
+event_date, browser;
@@ -0,0 +1,28 @@
+-- Dashboard cube
+-- A single scan of the daily session rollup that feeds the KPI, trends,
+-- device and browser tabs. GROUPING SETS produce per-day aggregates for
+-- every tab in one result; the grain column tells database/planner.py which
+-- tab each row belongs to. Every row belongs to exactly one event_date, so
+-- results can be cached and reused day by day (database/result_cache.py).
+
+SELECT
+CASE
+  WHEN GROUPING(device_category) = 0 THEN 'device'
+  WHEN GROUPING(browser) = 0 THEN 'browser'
+  ELSE 'trends'
+END AS grain,
+event_date,
+device_category,
+browser,
+SUM(sessions) AS sessions,
+HLL_COUNT.MERGE(users_sketch) AS users,
+SUM(page_views) AS page_views,
+SUM(bounces) AS bounces,
+SUM(total_session_duration) AS total_session_duration,
+SUM(conversions) AS conversions
+FROM
+analytics_453034732.daily_session_rollup
+WHERE
+event_date BETWEEN @start_date AND @end_date
+GROUP BY
+GROUPING SETS ((event_date), (event_date, device_category), (event_date, browser));
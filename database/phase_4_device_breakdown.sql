@@ -1,9 +1,9 @@
--- Device and browser breakdown
+-- Device breakdown
 SELECT
     device_category,
-        COUNT(DISTINCT session_id) AS sessions,
-    COUNTIF(event_name='page_view') AS page_views
-FROM analytics_453034732.cleaned_events
-WHERE DATE(event_datetime) BETWEEN {start_date} AND {end_date}
+    SUM(sessions) AS sessions,
+    SUM(page_views) AS page_views
+FROM analytics_453034732.daily_session_rollup
+WHERE event_date BETWEEN @start_date AND @end_date
 GROUP BY device_category
-ORDER BY sessions DESC;
\ No newline at end of file
+ORDER BY sessions DESC;
@@ -0,0 +1,17 @@
+-- Hourly traffic trends
+-- Used by the Traffic Trends tab for ranges of a few days (dashboard/rendering.py).
+-- The daily rollups cannot be split by hour, so this reads cleaned_events directly.
+
+SELECT
+TIMESTAMP_TRUNC(event_datetime, HOUR) AS event_hour,
+COUNT(DISTINCT session_id) AS sessions,
+COUNT(DISTINCT user_pseudo_id) AS users,
+COUNTIF(event_name = 'page_view') AS page_views
+FROM
+analytics_453034732.cleaned_events
+WHERE
+DATE(event_datetime) BETWEEN @start_date AND @end_date
+GROUP BY
+event_hour
+ORDER BY
+event_hour;
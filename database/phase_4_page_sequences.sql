@@ -0,0 +1,23 @@
+-- Page sequences
+-- Every page view of the sessions that started in the date range, ordered
+-- by session and time, for the path and funnel engine (database/paths.py),
+-- which streams the result in Arrow batches instead of self-joining events.
+-- Sessions that cross midnight after @end_date keep their last pages.
+SELECT
+session_id,
+event_datetime,
+REGEXP_REPLACE(page_url, '[?#].*$', '') AS page_url
+FROM
+analytics_453034732.cleaned_events
+WHERE
+DATE(event_datetime) BETWEEN @start_date AND DATE_ADD(@end_date, INTERVAL 1 DAY)
+AND event_name = 'page_view'
+AND page_url IS NOT NULL
+AND session_id IN (
+  SELECT session_id
+  FROM analytics_453034732.sessions
+  WHERE session_date BETWEEN @start_date AND @end_date
+)
+ORDER BY
+session_id,
+event_datetime;
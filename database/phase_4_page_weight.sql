@@ -0,0 +1,36 @@
+-- Page weight vs bounce rate
+-- Entrances and bounce rate per landing page over the date range, from the
+-- sessions table, joined to page_weight (written by sitebuild/weight.py) on
+-- the normalized page URL. Pages nobody landed on are left out.
+WITH landings AS (
+  SELECT
+    REGEXP_REPLACE(entry_page, '[?#].*$', '') AS page_url,
+    COUNT(*) AS entrances,
+    AVG(is_bounce) AS bounce_rate
+  FROM
+    analytics_453034732.sessions
+  WHERE
+    session_date BETWEEN @start_date AND @end_date
+    AND entry_page IS NOT NULL
+  GROUP BY
+    page_url
+)
+SELECT
+  w.page_url,
+  w.page_path,
+  l.entrances,
+  l.bounce_rate,
+  w.requests,
+  w.transfer_bytes,
+  w.critical_path_bytes,
+  w.image_bytes,
+  w.transfer_bytes_before
+FROM
+  analytics_453034732.page_weight AS w
+JOIN
+  landings AS l
+ON
+  l.page_url = w.page_url
+ORDER BY
+  l.entrances DESC
+LIMIT 500;
@@ -1,16 +1,19 @@
 -- Top performing pages
+-- Sessions and users for the candidate pages the top-K sketches picked
+-- (@pages, database/topk.py); the page_url filter prunes the rollup's
+-- page_url clustering, so only those pages' sketches are merged.
 SELECT 
   page_url,
-  COUNT(*) AS page_views,
-  COUNT(DISTINCT session_id) AS sessions,
-  COUNT(DISTINCT user_pseudo_id) AS unique_users
+  SUM(page_views) AS page_views,
+  HLL_COUNT.MERGE(sessions_sketch) AS sessions,
+  HLL_COUNT.MERGE(users_sketch) AS unique_users
 FROM
-  `brilliant-dryad-439810-q6.analytics_453034732.cleaned_events`
+  `brilliant-dryad-439810-q6.analytics_453034732.daily_page_rollup`
 WHERE
-  event_name = 'page_view'
-  AND page_url IS NOT NULL
+  event_date BETWEEN @start_date AND @end_date
+  AND page_url IN UNNEST(@pages)
 GROUP BY
   page_url
 ORDER BY
   page_views DESC
-LIMIT 20;
\ No newline at end of file
+LIMIT 20;
@@ -0,0 +1,31 @@
+-- Top performing pages, exact distinct counts
+-- Same result as phase_4_top_pages.sql with COUNT(DISTINCT) in place of the
+-- rollup's HLL sketches. Reads cleaned_events, so it is only run in the
+-- background to refine the approximate table (database/planner.py).
+-- Page URLs are normalized like daily_page_rollup.
+
+WITH page_views AS (
+  SELECT
+    REGEXP_REPLACE(page_url, '[?#].*$', '') AS page_url,
+    session_id,
+    user_pseudo_id
+  FROM
+    analytics_453034732.cleaned_events
+  WHERE
+    DATE(event_datetime) BETWEEN @start_date AND @end_date
+    AND event_name = 'page_view'
+    AND page_url IS NOT NULL
+)
+
+SELECT
+  page_url,
+  COUNT(*) AS page_views,
+  COUNT(DISTINCT session_id) AS sessions,
+  COUNT(DISTINCT user_pseudo_id) AS unique_users
+FROM
+  page_views
+GROUP BY
+  page_url
+ORDER BY
+  page_views DESC
+LIMIT 20;
@@ -3,17 +3,16 @@
 -- show how website traffic changes over time.
 
 SELECT
--- We extract the date from the event_datetime column.
-DATE(event_datetime) AS event_date,
-COUNT(DISTINCT session_id) AS daily_sessions,
-COUNT(DISTINCT user_pseudo_id) AS daily_users,
-COUNTIF(event_name = 'page_view') AS daily_page_views
+event_date,
+SUM(sessions) AS daily_sessions,
+HLL_COUNT.MERGE(users_sketch) AS daily_users,
+SUM(page_views) AS daily_page_views
 FROM
-analytics_453034732.cleaned_events
+analytics_453034732.daily_session_rollup
 WHERE
--- The date filter ensures we only query a specific range.
-DATE(event_datetime) BETWEEN {start_date} AND {end_date}
+-- The date filter prunes the rollup to the selected partitions.
+event_date BETWEEN @start_date AND @end_date
 GROUP BY
 event_date
 ORDER BY
-event_date;
\ No newline at end of file
+event_date;
@@ -1,7 +1,10 @@
+-- Bounce predictions
+-- Reads the scores written by the batch scoring job (database/scoring.py),
+-- so opening the tab no longer runs ML.PREDICT.
 SELECT
     session_id,
-    predicted_is_bounce AS bounce_prediction,
-    predicted_is_bounce_probs[OFFSET(1)].prob AS bounce_probability,
+    bounce_prediction,
+    bounce_probability,
     device_category,
     browser,
     source,
@@ -9,9 +12,6 @@ SELECT
     pages_per_session,
     session_duration,
     is_bounce
-FROM ML.PREDICT(
-    MODEL `analytics_453034732.bounce_prediction_model`,
-    TABLE `analytics_453034732.session_features`
-)
+FROM `analytics_453034732.scored_sessions`
 ORDER BY bounce_probability DESC
-LIMIT 1000;
\ No newline at end of file
+LIMIT 1000;
@@ -0,0 +1,16 @@
+-- Bounce model features
+-- One row per session in the session_features layout the bounce model was
+-- trained on, read from the sessions table instead of raw events.
+-- Scored in batch by database/scoring.py.
+
+SELECT
+session_id,
+device_category,
+browser,
+source,
+medium,
+page_views AS pages_per_session,
+session_duration,
+is_bounce
+FROM
+analytics_453034732.sessions;
@@ -1,19 +1,18 @@
-WITH features_with_date AS (
-  SELECT f.*, e.event_date
-  FROM `analytics_453034732.user_features` AS f
-  JOIN `analytics_453034732.events_*` AS e
-  USING(user_pseudo_id)
-  WHERE PARSE_DATE('%Y%m%d', e.event_date) BETWEEN {start_date} AND {end_date}
+WITH active_users AS (
+  SELECT DISTINCT user_pseudo_id
+  -- One row per session, partitioned by session_date, instead of the raw events_* shards
+  FROM `analytics_453034732.sessions`
+  WHERE session_date BETWEEN @start_date AND @end_date
 ),
 
+-- Segments are precomputed by the batch scoring job (database/scoring.py)
 preds AS (
-  SELECT 
-    user_pseudo_id, 
-    centroid_id
-  FROM ML.PREDICT(
-    MODEL `analytics_453034732.user_segmentation_model`,
-    TABLE features_with_date  -- ✅ Use TABLE keyword here
-  )
+  SELECT
+    s.user_pseudo_id,
+    s.centroid_id
+  FROM `analytics_453034732.scored_users` AS s
+  JOIN active_users
+  USING(user_pseudo_id)
 ),
 
 agg AS (
@@ -34,4 +33,4 @@ SELECT
   users,
   ROUND(users * 100.0 / SUM(users) OVER(), 2) AS pct_users
 FROM agg
-ORDER BY users DESC;
\ No newline at end of file
+ORDER BY users DESC;
@@ -0,0 +1,14 @@
+-- Live mode from the first-party collector (database/collector.py)
+-- Events newer than the last poll from the collected_events Parquet files,
+-- with the session id and page already flattened. Local DuckDB backend only.
+
+SELECT
+event_timestamp,
+event_name,
+user_pseudo_id,
+session_id,
+page_url
+FROM
+analytics_453034732.collected_events
+WHERE
+event_timestamp > @since_micros;
@@ -0,0 +1,18 @@
+-- Live mode: intraday events newer than the last poll
+-- Reads only the events_intraday shards from @since_suffix on (today's, and
+-- yesterday's around midnight) and only the columns the live counters use.
+-- event_params is flattened in Arrow by database/live.py.
+-- Cost: intraday shards are not partitioned, so the event_timestamp filter
+-- does not prune and each poll bills the day's shard so far for these four
+-- columns. Hence the 5-minute default poll (LIVE_POLL_SECONDS).
+
+SELECT
+event_timestamp,
+event_name,
+user_pseudo_id,
+event_params
+FROM
+`analytics_453034732.events_intraday_*`
+WHERE
+_TABLE_SUFFIX >= @since_suffix
+AND event_timestamp > @since_micros;
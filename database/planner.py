@@ -0,0 +1,129 @@
+import math
+import pandas as pd
+
+from database.queries import run_query
+from database.result_cache import is_closed
+
+# --- Consolidated dashboard queries ---
+CUBE_QUERY = "phase_4_dashboard_cube"
+UNIQUE_VISITORS_QUERY = "phase_3_unique_visitors"
+
+# --- Exact distinct counts ---
+# Distinct users and sessions in the rollups are HLL sketches. These queries
+# compute the same values with COUNT(DISTINCT) over cleaned_events; the
+# dashboard shows the estimates first and swaps in the exact values when
+# they arrive.
+EXACT_USERS_QUERY = "phase_3_exact_users"
+EXACT_TOP_PAGES_QUERY = "phase_4_top_pages_exact"
+
+# Standard error of HLL_COUNT.INIT at its default precision of 15
+HLL_RELATIVE_ERROR = 1.04 / math.sqrt(2 ** 15)
+
+# Tabs served by the cube, in the column layout of the per-tab SQL files they replace
+CUBE_TABS = ("kpis", "trends", "device", "browser")
+
+
+def split_cube(df_cube, unique_visitors=None):
+    """
+    Fans the per-day rows of phase_4_dashboard_cube.sql out into one DataFrame per tab.
+    Column names match phase_3_kpis.sql, phase_4_trends.sql,
+    phase_4_device_breakdown.sql and phase_4_browser_breakdown.sql.
+    Additive metrics are summed over the range here; unique visitors come
+    from phase_3_unique_visitors.sql because they cannot be summed.
+    """
+    if df_cube.empty:
+        return {tab: pd.DataFrame() for tab in CUBE_TABS}
+
+    grain = df_cube['grain']
+    daily = df_cube[grain == 'trends']
+
+    sessions = daily['sessions'].sum()
+    bounce_rate = daily['bounces'].sum() / sessions if sessions else 0.0
+    df_kpis = pd.DataFrame({
+        'total_sessions': [sessions],
+        'total_page_views': [daily['page_views'].sum()],
+        'avg_session_duration': [daily['total_session_duration'].sum() / sessions if sessions else 0.0],
+        'avg_engagement_rate': [1 - bounce_rate],
+        'avg_bounce_rate': [bounce_rate],
+        'unique_visitors': [unique_visitors],
+        'total_conversions': [daily['conversions'].sum()],
+    })
+
+    df_trends = (
+        daily
+        .rename(columns={'sessions': 'daily_sessions', 'users': 'daily_users', 'page_views': 'daily_page_views'})
+        [['event_date', 'daily_sessions', 'daily_users', 'daily_page_views']]
+        .sort_values('event_date')
+        .reset_index(drop=True)
+    )
+
+    def breakdown(name, column):
+        return (
+            df_cube[grain == name]
+            .groupby(column, as_index=False, dropna=False)[['sessions', 'page_views']]
+            .sum()
+            .sort_values('sessions', ascending=False)
+            .reset_index(drop=True)
+        )
+
+    return {
+        'kpis': df_kpis,
+        'trends': df_trends,
+        'device': breakdown('device', 'device_category'),
+        'browser': breakdown('browser', 'browser'),
+    }
+
+
+def load_dashboard_cube(start_date, end_date, backend=None, tracker=None, cache=None):
+    """
+    Returns {tab: DataFrame} for every tab in CUBE_TABS.
+    With a ResultCache, cube rows are cached per day and only missing days
+    are queried; unique visitors are cached per exact range.
+    """
+    def fetch_cube(range_start, range_end):
+        return run_query(CUBE_QUERY, range_start, range_end, backend=backend, tracker=tracker)
+
+    def fetch_unique_visitors():
+        return run_query(UNIQUE_VISITORS_QUERY, start_date, end_date, backend=backend, tracker=tracker)
+
+    if cache is None:
+        df_cube = fetch_cube(start_date, end_date)
+        df_visitors = fetch_unique_visitors()
+    else:
+        df_cube = cache.get_range("dashboard_cube", start_date, end_date, fetch_cube)
+        df_visitors = cache.get_or_fetch(
+            f"unique_visitors/{start_date.isoformat()}/{end_date.isoformat()}",
+            fetch_unique_visitors,
+            immutable=is_closed(end_date),
+        )
+
+    unique_visitors = df_visitors['unique_visitors'].iloc[0] if not df_visitors.empty else None
+    return split_cube(df_cube, unique_visitors)
+
+
+def apply_exact_counts(tab, df, df_exact):
+    """
+    Replaces the HLL estimates in one tab's DataFrame with exact counts.
+    - kpis/trends: df_exact from phase_3_exact_users.sql
+    - top_pages: df_exact from phase_4_top_pages_exact.sql, which has the same columns
+    Returns df unchanged when df_exact is None.
+    """
+    if df_exact is None or df.empty:
+        return df
+    if tab == 'top_pages':
+        return df_exact
+    total = df_exact['event_date'].isna()
+    if tab == 'kpis':
+        if not total.any():
+            return df  # no exact total (e.g. sessions not built for the range yet): keep the estimate
+        df = df.copy()
+        df['unique_visitors'] = df_exact.loc[total, 'users'].sum()
+        return df
+    if tab == 'trends':
+        daily_users = df_exact[~total].set_index(pd.to_datetime(df_exact.loc[~total, 'event_date']))['users']
+        df = df.copy()
+        # Days the exact query has no row for keep their estimate instead of dropping to 0
+        exact = pd.to_datetime(df['event_date']).map(daily_users)
+        df['daily_users'] = exact.fillna(df['daily_users']).astype('int64')
+        return df
+    return df
@@ -0,0 +1,182 @@
+import os
+import json
+import datetime
+import threading
+
+from database.backend import DATASET, PARQUET_DIR
+from database.result_cache import CACHE_DIR
+from database.shards import format_bytes
+
+# --- GA4 property registry ---
+# One dashboard deployment serves every property listed in DASHBOARD_PROPERTIES,
+# a JSON list such as:
+#   [{"key": "main", "name": "Main site", "project": "my-project",
+#     "dataset": "analytics_453034732", "max_concurrent": 3,
+#     "daily_bytes_quota": 107374182400}]
+# Without the file, the dashboard serves the single DATASET property.
+PROPERTIES_FILE = os.environ.get(
+    "DASHBOARD_PROPERTIES",
+    os.path.join(os.path.dirname(__file__), '..', 'properties.json')
+)
+DEFAULT_MAX_CONCURRENT = int(os.environ.get("DASHBOARD_PROPERTY_MAX_CONCURRENT", "3"))
+# Rollup tables the cross-property views union (see create_union_views)
+UNION_TABLES = ("daily_session_rollup", "daily_page_rollup")
+
+
+class QuotaExceeded(Exception):
+    """Raised when a property has used up its daily byte quota."""
+
+    def __init__(self, prop):
+        self.prop = prop
+        super().__init__(
+            f"Property '{prop.name}' has used its daily quota of {format_bytes(prop.daily_bytes_quota)}. "
+            "Try again tomorrow or raise daily_bytes_quota."
+        )
+
+
+class Property:
+    """
+    One GA4 property served by the dashboard.
+    - project/dataset: where its export and the tables built from it live
+    - parquet_dir: its replica for the DuckDB backend
+    - cache_dir: its on-disk result cache, so properties never share entries
+    - max_concurrent: queries it may run at once on the shared worker pool
+    - daily_bytes_quota: bytes it may bill per UTC day, None for no limit
+    Quota usage is counted in this process and resets at midnight UTC.
+    """
+
+    def __init__(self, key, name=None, project=None, dataset=DATASET, parquet_dir=None, cache_dir=None,
+                 max_concurrent=DEFAULT_MAX_CONCURRENT, daily_bytes_quota=None):
+        self.key = key
+        self.name = name or key
+        self.project = project
+        self.dataset = dataset
+        self.parquet_dir = parquet_dir or os.path.join(PARQUET_DIR, '..', 'properties', key)
+        self.cache_dir = cache_dir or os.path.join(CACHE_DIR, key)
+        self.max_concurrent = max_concurrent
+        self.daily_bytes_quota = daily_bytes_quota
+        self._day = None
+        self._bytes_billed = 0
+        self._reserved = 0
+        self._lock = threading.Lock()
+
+    def _today(self):
+        today = datetime.datetime.now(datetime.timezone.utc).date()
+        if today != self._day:
+            # Reservations of jobs still running carry over to the new day
+            self._day, self._bytes_billed = today, 0
+
+    @property
+    def bytes_billed_today(self):
+        """Bytes billed today, plus the caps reserved by jobs still running."""
+        with self._lock:
+            self._today()
+            return self._bytes_billed + self._reserved
+
+    def reserve(self, budget):
+        """
+        The maximum_bytes_billed for this property's next job: the query
+        budget, capped by what is left of its quota after the bytes billed
+        and the caps of the jobs still running. The cap is held until
+        settle(), so concurrent jobs together cannot bill past the quota.
+        Raises QuotaExceeded when nothing is left.
+        """
+        with self._lock:
+            self._today()
+            if self.daily_bytes_quota is None:
+                cap = budget
+            else:
+                remaining = self.daily_bytes_quota - self._bytes_billed - self._reserved
+                if remaining <= 0:
+                    raise QuotaExceeded(self)
+                cap = min(budget, remaining) if budget else remaining
+            self._reserved += cap or 0
+            return cap
+
+    def settle(self, reserved, num_bytes):
+        """Releases a job's reservation and adds the bytes it actually billed to today's usage."""
+        with self._lock:
+            self._today()
+            self._reserved = max(self._reserved - (reserved or 0), 0)
+            self._bytes_billed += num_bytes
+
+
+def load_properties(path=PROPERTIES_FILE):
+    """Reads the registry file. Returns {key: Property} in file order."""
+    if not os.path.exists(path):
+        return {"default": Property("default", parquet_dir=PARQUET_DIR, cache_dir=CACHE_DIR)}
+    with open(path, 'r') as f:
+        entries = json.load(f)
+    properties = {}
+    for entry in entries:
+        prop = Property(**entry)
+        if prop.key in properties:
+            raise ValueError(f"{path}: duplicate property key '{prop.key}'")
+        properties[prop.key] = prop
+    if not properties:
+        raise ValueError(f"{path}: no properties defined")
+    return properties
+
+
+_properties = None
+_properties_lock = threading.Lock()
+
+
+def list_properties():
+    """Returns every registered Property, loading the registry on first use."""
+    global _properties
+    with _properties_lock:
+        if _properties is None:
+            _properties = load_properties()
+        return list(_properties.values())
+
+
+def get_property(key=None):
+    """Looks up a property by key; the first registered property when key is None."""
+    properties = list_properties()
+    if key is None:
+        return properties[0]
+    for prop in properties:
+        if prop.key == key:
+            return prop
+    raise KeyError(f"Unknown property '{key}'. Available: {', '.join(p.key for p in properties)}")
+
+
+def union_view_sql(table, properties, project, dataset):
+    """CREATE VIEW statement for all_<table>: every property's rows with a property column."""
+    selects = [
+        f"SELECT '{prop.key}' AS property, * FROM `{prop.project or project}.{prop.dataset}.{table}`"
+        for prop in properties
+    ]
+    return f"CREATE OR REPLACE VIEW `{project}.{dataset}.all_{table}` AS\n" + "\nUNION ALL\n".join(selects)
+
+
+def create_union_views(dataset, properties=None, client=None):
+    """
+    Creates all_daily_session_rollup and all_daily_page_rollup in dataset,
+    unioning the rollups of every property so they can be compared in one
+    query. Views store no data; each query scans only the rollups it reads.
+    """
+    from database.conn import get_bq_client
+
+    client = client or get_bq_client()
+    properties = properties or list_properties()
+    for table in UNION_TABLES:
+        client.query(union_view_sql(table, properties, client.project, dataset)).result()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="List GA4 properties or create cross-property rollup views.")
+    parser.add_argument("--views", metavar="DATASET", help="Create the all_* union views in this dataset")
+    args = parser.parse_args()
+
+    if args.views:
+        create_union_views(args.views)
+        print(f"Created {', '.join('all_' + table for table in UNION_TABLES)} in {args.views}")
+    else:
+        for prop in list_properties():
+            quota = format_bytes(prop.daily_bytes_quota) if prop.daily_bytes_quota else "no quota"
+            print(f"{prop.key}: {prop.name} ({prop.project or 'default project'}.{prop.dataset}), "
+                  f"{prop.max_concurrent} concurrent, {quota}")
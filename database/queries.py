@@ -0,0 +1,117 @@
+import os
+import re
+import glob
+
+from database.backend import get_backend, run_sql, stream_sql
+from database.shards import DRY_RUN, MAX_BYTES_BILLED, check_budget, shard_parameters
+from database.tracing import span
+
+# --- Query template registry ---
+# Every database/*.sql file is read and validated once, at import time.
+# Dates are bound as @start_date/@end_date query parameters instead of being
+# formatted into the text, so the SQL sent to BigQuery is identical for every
+# user and date range and BigQuery's result cache can serve repeated loads.
+SQL_DIR = os.path.dirname(__file__)
+
+PARAMETER_PATTERN = re.compile(r"@(\w+)")
+LEGACY_PLACEHOLDER_PATTERN = re.compile(r"\{(\w+)\}")
+COMMENT_PATTERN = re.compile(r"--[^\n]*|/\*.*?\*/", re.DOTALL)
+STRING_PATTERN = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+
+
+class QueryTemplate:
+    """
+    A parsed .sql file.
+    - name: file name without .sql (e.g. "phase_4_trends")
+    - parameters: the @parameters the statement expects
+    """
+
+    def __init__(self, name, path, sql):
+        self.name = name
+        self.path = path
+        self.sql = sql
+        code = STRING_PATTERN.sub("''", COMMENT_PATTERN.sub("", sql))
+        legacy = LEGACY_PLACEHOLDER_PATTERN.findall(code)
+        if legacy:
+            raise ValueError(f"{path}: replace {{{legacy[0]}}} with the @{legacy[0]} query parameter")
+        self.parameters = sorted(set(PARAMETER_PATTERN.findall(code)))
+
+    def bind(self, **params):
+        """Returns the parameters for this template, failing on missing values."""
+        missing = [name for name in self.parameters if params.get(name) is None]
+        if missing:
+            raise ValueError(f"Query '{self.name}' is missing parameters: {', '.join(missing)}")
+        return {name: params[name] for name in self.parameters}
+
+
+def load_templates(sql_dir=SQL_DIR):
+    """Reads and validates every .sql file in sql_dir."""
+    templates = {}
+    for path in sorted(glob.glob(os.path.join(sql_dir, "*.sql"))):
+        name = os.path.splitext(os.path.basename(path))[0]
+        with open(path, 'r') as f:
+            templates[name] = QueryTemplate(name, path, f.read())
+    return templates
+
+
+TEMPLATES = load_templates()
+
+
+def get_template(name):
+    """Looks up a template by name, or by the path of its .sql file."""
+    name = os.path.splitext(os.path.basename(name))[0]
+    try:
+        return TEMPLATES[name]
+    except KeyError:
+        raise KeyError(f"Unknown query '{name}'. Available: {', '.join(TEMPLATES)}") from None
+
+
+def bind_query(name, start_date=None, end_date=None, **params):
+    """
+    Returns (sql, parameters) for a registered query.
+    start_date and end_date fill @start_date and @end_date, and also the
+    @start_suffix/@end_suffix shard bounds used to prune events_* wildcards.
+    """
+    template = get_template(name)
+    if start_date is not None and end_date is not None and "start_suffix" in template.parameters:
+        params = {**shard_parameters(start_date, end_date), **params}
+    return template.sql, template.bind(start_date=start_date, end_date=end_date, **params)
+
+
+def estimate_query(name, start_date=None, end_date=None, backend=None, **params):
+    """Dry-run estimate of the bytes a query would scan, or None on backends without billing."""
+    sql, bound = bind_query(name, start_date, end_date, **params)
+    return (backend or get_backend()).estimate_bytes(sql, bound)
+
+
+def run_query(name, start_date=None, end_date=None, backend=None, tracker=None, arrow=False,
+              budget=MAX_BYTES_BILLED, **params):
+    """
+    Runs a registered query with its parameters bound.
+    When dry runs are enabled, queries estimated above budget bytes are
+    refused with QueryBudgetExceeded before they start.
+    Timed as a "query" span (database/tracing.py).
+    """
+    backend = backend or get_backend()
+    with span("query", query=name):
+        sql, bound = bind_query(name, start_date, end_date, **params)
+        if DRY_RUN and budget:
+            with span("dry_run"):
+                check_budget(name, backend.estimate_bytes(sql, bound), budget)
+        return run_sql(sql, bound, backend=backend, tracker=tracker, arrow=arrow)
+
+
+def stream_query(name, start_date=None, end_date=None, backend=None, tracker=None, batch_rows=100_000,
+                 budget=MAX_BYTES_BILLED, **params):
+    """
+    Runs a registered query like run_query and yields its result as
+    pyarrow.RecordBatches (database.backend.stream_sql). The budget is
+    checked before the first batch.
+    """
+    backend = backend or get_backend()
+    with span("query", query=name):
+        sql, bound = bind_query(name, start_date, end_date, **params)
+        if DRY_RUN and budget:
+            with span("dry_run"):
+                check_budget(name, backend.estimate_bytes(sql, bound), budget)
+        yield from stream_sql(sql, bound, backend=backend, tracker=tracker, batch_rows=batch_rows)
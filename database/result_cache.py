@@ -0,0 +1,214 @@
+import os
+import json
+import time
+import hashlib
+import datetime
+import threading
+import pandas as pd
+
+from database.tracing import span
+
+# --- Cache configuration ---
+CACHE_DIR = os.environ.get(
+    "DASHBOARD_CACHE_DIR",
+    os.path.join(os.path.dirname(__file__), '..', 'data', 'cache')
+)
+CACHE_TTL = float(os.environ.get("DASHBOARD_CACHE_TTL", "3600"))
+CACHE_MAX_BYTES = int(os.environ.get("DASHBOARD_CACHE_MAX_BYTES", str(1024 ** 3)))
+# Access times from cache hits are written to index.json at most this often
+# (and with every put), instead of rewriting the index on every hit.
+INDEX_SAVE_SECONDS = 30
+# GA4 can still rewrite the last few days of export; older days never change.
+CLOSED_AFTER_DAYS = int(os.environ.get("DASHBOARD_CLOSED_AFTER_DAYS", "3"))
+
+
+def is_closed(day):
+    """True when a day is old enough that its data can no longer change."""
+    return day < datetime.date.today() - datetime.timedelta(days=CLOSED_AFTER_DAYS)
+
+
+def _day_runs(days):
+    """Groups sorted dates into contiguous (start, end) runs."""
+    runs = []
+    for day in days:
+        if runs and day == runs[-1][1] + datetime.timedelta(days=1):
+            runs[-1][1] = day
+        else:
+            runs.append([day, day])
+    return [tuple(run) for run in runs]
+
+
+class ResultCache:
+    """
+    On-disk query result cache: one Parquet file per entry plus an index.json.
+    - Entries expire after ttl seconds unless they are immutable (closed days)
+    - When the cache grows past max_bytes, least recently used entries are evicted
+    - get_range() stores one entry per day so overlapping ranges share work
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, ttl=CACHE_TTL, max_bytes=CACHE_MAX_BYTES):
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._index_path = os.path.join(self.cache_dir, "index.json")
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._index = self._load_index()
+        self._dirty = False
+        self._saved_at = time.time()
+
+    # --- Index ---
+    def _load_index(self):
+        try:
+            with open(self._index_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_index(self):
+        tmp_path = f"{self._index_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self._index, f)
+        os.replace(tmp_path, self._index_path)
+        self._dirty = False
+        self._saved_at = time.time()
+
+    def _touch(self, entry):
+        """Records a hit; the index is saved only every INDEX_SAVE_SECONDS."""
+        entry["last_access"] = time.time()
+        self._dirty = True
+        if time.time() - self._saved_at > INDEX_SAVE_SECONDS:
+            self._save_index()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, hashlib.sha1(key.encode()).hexdigest() + ".parquet")
+
+    def _drop(self, key):
+        entry = self._index.pop(key, None)
+        if entry:
+            try:
+                os.remove(os.path.join(self.cache_dir, entry["file"]))
+            except OSError:
+                pass
+
+    def _evict(self):
+        total = sum(entry["bytes"] for entry in self._index.values())
+        for key in sorted(self._index, key=lambda k: self._index[k]["last_access"]):
+            if total <= self.max_bytes:
+                break
+            total -= self._index[key]["bytes"]
+            self._drop(key)
+
+    # --- Single entries ---
+    def get(self, key):
+        """Returns the cached DataFrame for key, or None if it is missing or expired."""
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None:
+                return None
+            if not entry["immutable"] and time.time() - entry["created"] > self.ttl:
+                self._drop(key)
+                self._save_index()
+                return None
+            file_name = entry["file"]
+        # Files are only ever replaced whole (put), so they can be read without the lock
+        try:
+            df = pd.read_parquet(os.path.join(self.cache_dir, file_name), dtype_backend="pyarrow")
+        except OSError:
+            with self._lock:
+                if self._index.get(key, {}).get("file") == file_name:
+                    self._drop(key)
+                    self._save_index()
+            return None
+        with self._lock:
+            if key in self._index:
+                self._touch(self._index[key])
+        return df
+
+    def put(self, key, df, immutable=False, save_index=True):
+        # Written beside the final path and renamed, so readers never see a partial file
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+        now = time.time()
+        with self._lock:
+            self._index[key] = {
+                "file": os.path.basename(path),
+                "created": now,
+                "last_access": now,
+                "bytes": os.path.getsize(path),
+                "immutable": immutable,
+            }
+            self._evict()
+            if save_index:
+                self._save_index()
+            else:
+                self._dirty = True
+
+    def flush(self):
+        """Writes access times recorded since the last save."""
+        with self._lock:
+            if self._dirty:
+                self._save_index()
+
+    def get_or_fetch(self, key, fetch, immutable=False):
+        """Returns the cached entry for key, calling fetch() and storing its result on a miss."""
+        with span("result_cache", query=key.split("/")[0], key=key) as cache_span:
+            df = self.get(key)
+            cache_span.set(hit=df is not None)
+            if df is None:
+                df = fetch()
+                self.put(key, df, immutable=immutable)
+            return df
+
+    # --- Day-partitioned ranges ---
+    def get_range(self, name, start_date, end_date, fetch, date_column="event_date"):
+        """
+        Serves a query whose rows are independent per day (one or more rows per date_column).
+        Cached days are read from disk; only the missing days are fetched, one
+        fetch(run_start, run_end) call per contiguous run, then split into
+        per-day entries. Closed days are stored as immutable.
+        """
+        with span("result_cache", query=name) as cache_span:
+            days = [start_date + datetime.timedelta(days=i) for i in range((end_date - start_date).days + 1)]
+            frames, missing = [], []
+            for day in days:
+                df_day = self.get(f"{name}/{day.isoformat()}")
+                if df_day is None:
+                    missing.append(day)
+                else:
+                    frames.append(df_day)
+            cache_span.set(hit=not missing, cached_days=len(days) - len(missing), missing_days=len(missing))
+
+            for run_start, run_end in _day_runs(missing):
+                df_run = fetch(run_start, run_end)
+                run_dates = pd.to_datetime(df_run[date_column]).dt.date if not df_run.empty else pd.Series([], dtype=object)
+                day = run_start
+                while day <= run_end:
+                    # Days without rows are cached too, so they are not fetched again
+                    df_day = df_run[(run_dates == day).to_numpy()].reset_index(drop=True)
+                    self.put(f"{name}/{day.isoformat()}", df_day, immutable=is_closed(day), save_index=False)
+                    frames.append(df_day)
+                    day += datetime.timedelta(days=1)
+            # One index write for the whole range instead of one per day
+            self.flush()
+
+            frames = [df for df in frames if not df.empty]
+            if not frames:
+                return pd.DataFrame()
+            return pd.concat(frames, ignore_index=True).sort_values(date_column).reset_index(drop=True)
+
+
+_caches = {}
+_cache_lock = threading.Lock()
+
+
+def get_result_cache(cache_dir=CACHE_DIR):
+    """Returns the process-wide ResultCache for cache_dir (one per GA4 property)."""
+    key = os.path.abspath(cache_dir)
+    with _cache_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = _caches[key] = ResultCache(cache_dir)
+        return cache
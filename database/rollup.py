@@ -0,0 +1,166 @@
+import os
+import re
+import datetime
+
+from database.backend import DATASET, PARQUET_DIR, DuckDBBackend, bq_query_parameter, qualify_tables
+from database.queries import get_template, run_query
+from database.conn import get_bq_client
+from database.sessions import build_local_sessions
+
+# --- Rollup tables ---
+# table name -> (SELECT query, partition column, cluster columns)
+# Built in order: the sessions table feeds daily_session_rollup.
+ROLLUPS = {
+    "sessions": ("phase_3_3_sessions", "session_date", ["user_pseudo_id", "session_id"]),
+    "daily_session_rollup": ("phase_3_2_daily_session_rollup", "event_date", ["device_category", "browser"]),
+    "daily_page_rollup": ("phase_3_2_daily_page_rollup", "event_date", ["page_url"]),
+}
+
+SHARD_PATTERN = re.compile(r"^events_(\d{8})$")
+
+
+def list_shard_dates(client, dataset=DATASET):
+    """
+    Returns the dates of every daily events_YYYYMMDD export shard in the dataset.
+    Intraday shards are skipped because they are still being written.
+    """
+    dates = []
+    for table in client.list_tables(dataset):
+        match = SHARD_PATTERN.match(table.table_id)
+        if match:
+            dates.append(datetime.datetime.strptime(match.group(1), '%Y%m%d').date())
+    return sorted(dates)
+
+
+def rollup_watermark(client, table="daily_session_rollup", dataset=DATASET):
+    """
+    Returns the latest partition date already materialized in a rollup
+    (its ROLLUPS partition column), or None if the table does not exist.
+    """
+    from google.api_core.exceptions import NotFound
+
+    try:
+        client.get_table(f"{dataset}.{table}")
+    except NotFound:
+        return None
+    partition = ROLLUPS[table][1]
+    rows = list(client.query(f"SELECT MAX({partition}) AS watermark FROM {dataset}.{table}").result())
+    return rows[0].watermark if rows else None
+
+
+def pending_dates(client, table="daily_session_rollup", dataset=DATASET, shard_dates=None):
+    """
+    Days one rollup table needs (re)built: every shard newer than its own
+    watermark, plus the watermark day itself so sessions that crossed
+    midnight into a newly landed shard are completed. A table that does not
+    exist yet (e.g. sessions on an existing deployment) gets every shard.
+    """
+    watermark = rollup_watermark(client, table, dataset)
+    shard_dates = list_shard_dates(client, dataset) if shard_dates is None else shard_dates
+    if watermark is None:
+        return shard_dates
+    return [day for day in shard_dates if day >= watermark]
+
+
+def refresh_rollups(start_date, end_date, client=None, dataset=DATASET, tables=None):
+    """
+    Rebuilds the rollup partitions between start_date and end_date in BigQuery,
+    for every table in ROLLUPS or only the given ones (kept in ROLLUPS order).
+    Each run replaces only those partitions, so reruns are idempotent.
+    """
+    from google.api_core.exceptions import NotFound
+    from google.cloud import bigquery
+
+    client = client or get_bq_client()
+    for table, (query_name, partition, cluster) in ROLLUPS.items():
+        if tables is not None and table not in tables:
+            continue
+        template = get_template(query_name)
+        select = qualify_tables(template.sql, dataset).rstrip().rstrip(";")
+        params = template.bind(start_date=start_date, end_date=end_date)
+        target = f"{dataset}.{table}"
+        try:
+            client.get_table(target)
+        except NotFound:
+            script = (
+                f"CREATE TABLE {target}\n"
+                f"PARTITION BY {partition}\n"
+                f"CLUSTER BY {', '.join(cluster)}\n"
+                f"AS\n{select}"
+            )
+        else:
+            script = (
+                f"DELETE FROM {target} WHERE {partition} BETWEEN @start_date AND @end_date;\n"
+                f"INSERT INTO {target}\n{select};"
+            )
+        job_config = bigquery.QueryJobConfig(
+            query_parameters=[bq_query_parameter(name, value) for name, value in params.items()]
+        )
+        client.query(script, job_config=job_config).result()
+
+
+def refresh_new_shards(client=None, dataset=DATASET):
+    """
+    Append-only refresh: builds each rollup's rows for the shards that landed
+    since that table's own watermark, so a table added later (sessions) is
+    backfilled over the whole history while the others only take the new days.
+    Returns {table: (start, end)} for the tables that had something to do.
+    """
+    client = client or get_bq_client()
+    shard_dates = list_shard_dates(client, dataset)
+    processed = {}
+    for table in ROLLUPS:
+        dates = pending_dates(client, table, dataset, shard_dates)
+        if dates:
+            refresh_rollups(dates[0], dates[-1], client=client, dataset=dataset, tables=[table])
+            processed[table] = (dates[0], dates[-1])
+    return processed
+
+
+def materialize_local(start_date, end_date, parquet_dir=PARQUET_DIR):
+    """
+    Builds the rollups for the local DuckDB replica from its cleaned_events
+    Parquet snapshot, writing one Parquet file per day and table.
+    The sessions table is computed with NumPy (database/sessions.py).
+    """
+    backend = DuckDBBackend(parquet_dir)
+    for table, (query_name, partition, _) in ROLLUPS.items():
+        if table == "sessions":
+            df = build_local_sessions(start_date, end_date, backend).to_pandas()
+        else:
+            df = run_query(query_name, start_date, end_date, backend=backend)
+        for day, df_day in df.groupby(partition):
+            out_dir = os.path.join(parquet_dir, table, f"event_date={day:%Y-%m-%d}")
+            os.makedirs(out_dir, exist_ok=True)
+            df_day.to_parquet(os.path.join(out_dir, "part-0.parquet"), index=False)
+        # Later rollups read the tables built before them
+        backend.register_tables()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Refresh the daily rollup tables.")
+    parser.add_argument("--local", action="store_true", help="Build rollups for the DuckDB replica instead of BigQuery")
+    parser.add_argument("--start", type=datetime.date.fromisoformat)
+    parser.add_argument("--end", type=datetime.date.fromisoformat)
+    parser.add_argument("--property", help="GA4 property key from the registry (database/properties.py)")
+    args = parser.parse_args()
+
+    from database.properties import get_property
+
+    prop = get_property(args.property)
+    if args.local:
+        if not (args.start and args.end):
+            parser.error("--local needs --start and --end")
+        materialize_local(args.start, args.end, prop.parquet_dir)
+        print(f"Built local rollups for {args.start} to {args.end}")
+    elif args.start and args.end:
+        refresh_rollups(args.start, args.end, client=get_bq_client(prop.project), dataset=prop.dataset)
+        print(f"Rebuilt rollups for {args.start} to {args.end}")
+    else:
+        processed = refresh_new_shards(client=get_bq_client(prop.project), dataset=prop.dataset)
+        for table, (start, end) in processed.items():
+            print(f"Rolled up {table}: {start} to {end}")
+        if not processed:
+            print("No new shards to roll up")
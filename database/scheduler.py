@@ -0,0 +1,205 @@
+import os
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, CancelledError
+
+# --- Scheduler configuration ---
+MAX_WORKERS = int(os.environ.get("DASHBOARD_QUERY_WORKERS", "8"))
+QUERY_TIMEOUT = float(os.environ.get("DASHBOARD_QUERY_TIMEOUT", "120"))
+
+# One bounded pool for the whole process, shared by every Streamlit session
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="query")
+
+
+class JobTracker:
+    """
+    Holds the backend jobs started for one scheduled query so they can be
+    cancelled, either when the timeout fires or when the scheduler is reset.
+    """
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self.cancelled = False
+        self.timed_out = False
+        self._jobs = {}
+        self._timers = {}
+        self._lock = threading.Lock()
+
+    def track(self, backend, job):
+        with self._lock:
+            if self.cancelled:
+                backend.cancel(job)
+                raise CancelledError()
+            self._jobs[id(job)] = (backend, job)
+            if self.timeout:
+                timer = threading.Timer(self.timeout, self._on_timeout, args=(id(job),))
+                timer.daemon = True
+                self._timers[id(job)] = timer
+                timer.start()
+
+    def untrack(self, job):
+        with self._lock:
+            self._jobs.pop(id(job), None)
+            timer = self._timers.pop(id(job), None)
+        if timer is not None:
+            timer.cancel()
+
+    def _on_timeout(self, job_id):
+        with self._lock:
+            entry = self._jobs.get(job_id)
+            self.timed_out = entry is not None
+        if entry is not None:
+            backend, job = entry
+            backend.cancel(job)
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            jobs = list(self._jobs.values())
+            timers = list(self._timers.values())
+        for timer in timers:
+            timer.cancel()
+        for backend, job in jobs:
+            try:
+                backend.cancel(job)
+            except Exception:
+                pass
+
+
+class ConcurrencyGate:
+    """
+    Caps how many queries of one GA4 property occupy the shared pool at once.
+    Queries over the limit wait in a FIFO here rather than in a worker
+    thread, so a property with a long backlog never holds the threads
+    other properties need.
+    """
+
+    def __init__(self, limit, executor=None):
+        self.limit = limit
+        self._executor = executor or _executor
+        self._running = 0
+        self._pending = deque()
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args):
+        """Queues fn(*args) and returns a Future that can be cancelled until it starts."""
+        future = Future()
+        with self._lock:
+            self._pending.append((future, fn, args))
+        self._dispatch()
+        return future
+
+    def _dispatch(self):
+        while True:
+            with self._lock:
+                if not self._pending or self._running >= self.limit:
+                    return
+                future, fn, args = self._pending.popleft()
+                if not future.set_running_or_notify_cancel():
+                    continue  # cancelled while queued
+                self._running += 1
+            inner = self._executor.submit(fn, *args)
+            inner.add_done_callback(lambda done, future=future: self._finished(future, done))
+
+    def _finished(self, future, inner):
+        with self._lock:
+            self._running -= 1
+        if inner.cancelled():
+            future.set_exception(CancelledError())
+        elif inner.exception() is not None:
+            future.set_exception(inner.exception())
+        else:
+            future.set_result(inner.result())
+        self._dispatch()
+
+
+_gates = {}
+_gates_lock = threading.Lock()
+
+
+def get_gate(key, limit):
+    """The process-wide ConcurrencyGate for one property, shared by all its sessions."""
+    with _gates_lock:
+        gate = _gates.get(key)
+        if gate is None:
+            gate = _gates[key] = ConcurrencyGate(limit)
+        return gate
+
+
+class QueryScheduler:
+    """
+    Dispatches dashboard queries concurrently on the shared thread pool.
+    - submit() starts a query at most once per key and returns its Future
+    - reset() cancels everything in flight when the date filter changes
+    - Every query is cancelled if it runs longer than its timeout
+    - With a gate, queries are admitted to the pool through it (per-property limit)
+    """
+
+    def __init__(self, timeout=QUERY_TIMEOUT, executor=None, gate=None):
+        self.timeout = timeout
+        self.generation = None
+        self._executor = executor or _executor
+        self._gate = gate
+        self._futures = {}
+        self._trackers = {}
+        self._lock = threading.Lock()
+
+    def reset(self, generation):
+        """
+        Starts a new generation (e.g. a new date range). Queries from the
+        previous generation are cancelled and their futures dropped.
+        """
+        with self._lock:
+            if generation == self.generation:
+                return
+            self.generation = generation
+            futures, trackers = self._futures, self._trackers
+            self._futures, self._trackers = {}, {}
+        for key, future in futures.items():
+            future.cancel()
+            trackers[key].cancel()
+
+    def submit(self, key, fn, *args):
+        """
+        Schedules fn(*args, _tracker=tracker) unless key is already scheduled
+        in this generation. Failed queries are resubmitted on the next call.
+        fn must pass the tracker on to database.backend.run_sql.
+        """
+        with self._lock:
+            future = self._futures.get(key)
+            if future is not None and not (future.done() and not future.cancelled() and future.exception()):
+                return future
+            tracker = JobTracker(self.timeout)
+            submit = self._gate.submit if self._gate else self._executor.submit
+            future = submit(self._run, key, tracker, fn, args)
+            self._futures[key] = future
+            self._trackers[key] = tracker
+            return future
+
+    def _run(self, key, tracker, fn, args):
+        try:
+            return fn(*args, _tracker=tracker)
+        except Exception:
+            if tracker.timed_out:
+                raise TimeoutError(f"Query '{key}' was cancelled after {self.timeout:.0f}s") from None
+            if tracker.cancelled:
+                raise CancelledError() from None
+            raise
+
+    def status(self):
+        """Returns {key: 'running' | 'done' | 'failed' | 'cancelled'} for the current generation."""
+        with self._lock:
+            futures = dict(self._futures)
+        status = {}
+        for key, future in futures.items():
+            if future.cancelled():
+                status[key] = "cancelled"
+            elif not future.done():
+                status[key] = "running"
+            elif isinstance(future.exception(), CancelledError):
+                status[key] = "cancelled"
+            elif future.exception() is not None:
+                status[key] = "failed"
+            else:
+                status[key] = "done"
+        return status
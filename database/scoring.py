@@ -0,0 +1,212 @@
+import os
+import json
+import time
+import datetime
+import numpy as np
+import pandas as pd
+
+from database.backend import DATASET, PARQUET_DIR, BigQueryBackend, get_backend, qualify_tables, run_sql
+from database.conn import get_bq_client
+from database.queries import get_template
+
+# --- Offline scoring ---
+# The BigQuery ML models are exported once (weights and centroids) and then
+# applied to session_features/user_features in NumPy on a schedule. The
+# dashboard reads the scored tables instead of calling ML.PREDICT per load.
+MODEL_DIR = os.environ.get(
+    "DASHBOARD_MODEL_DIR",
+    os.path.join(os.path.dirname(__file__), '..', 'data', 'models')
+)
+BOUNCE_MODEL = "bounce_prediction_model"
+SEGMENT_MODEL = "user_segmentation_model"
+# Bounce model inputs, one row per session from the sessions table
+SESSION_FEATURES_QUERY = "phase_5_session_features"
+
+# Columns carried from session_features into scored_sessions for the Bounce tab
+SESSION_COLUMNS = ["session_id", "device_category", "browser", "source", "medium",
+                   "pages_per_session", "session_duration", "is_bounce"]
+
+
+# --- Model export ---
+def _present(value):
+    """False for SQL NULLs, which arrive as None, pd.NA or NaN."""
+    return value is not None and value is not pd.NA and not (isinstance(value, float) and np.isnan(value))
+
+
+def export_bounce_model(backend=None, dataset=DATASET):
+    """
+    Reads the logistic regression weights with ML.WEIGHTS. Weights are on the
+    original feature scale, so they apply directly to session_features.
+    Returns {"intercept", "numeric": {feature: weight}, "categorical": {feature: {category: weight}}}.
+    """
+    backend = backend or BigQueryBackend()
+    df = run_sql(f"SELECT * FROM ML.WEIGHTS(MODEL `{dataset}.{BOUNCE_MODEL}`)", backend=backend)
+    model = {"intercept": 0.0, "numeric": {}, "categorical": {}}
+    for row in df.itertuples(index=False):
+        if row.processed_input == "__INTERCEPT__":
+            model["intercept"] = float(row.weight)
+        elif _present(row.category_weights) and len(row.category_weights):
+            model["categorical"][row.processed_input] = {
+                str(item["category"]): float(item["weight"]) for item in row.category_weights
+            }
+        else:
+            model["numeric"][row.processed_input] = float(row.weight)
+    return model
+
+
+def export_segment_model(backend=None, dataset=DATASET):
+    """
+    Reads the k-means centroids with ML.CENTROIDS and the feature means and
+    standard deviations with ML.FEATURE_INFO, which k-means used to
+    standardize numeric features before measuring distances.
+    """
+    backend = backend or BigQueryBackend()
+    centroids = run_sql(f"SELECT * FROM ML.CENTROIDS(MODEL `{dataset}.{SEGMENT_MODEL}`)", backend=backend)
+    info = run_sql(f"SELECT * FROM ML.FEATURE_INFO(MODEL `{dataset}.{SEGMENT_MODEL}`)", backend=backend)
+
+    model = {"centroids": {}, "scaling": {}}
+    for row in info.itertuples(index=False):
+        if _present(row.mean):
+            model["scaling"][row.input] = [float(row.mean), float(row.stddev) or 1.0]
+    for row in centroids.itertuples(index=False):
+        centroid = model["centroids"].setdefault(str(int(row.centroid_id)), {"numeric": {}, "categorical": {}})
+        if _present(row.numerical_value):
+            centroid["numeric"][row.feature] = float(row.numerical_value)
+        elif _present(row.categorical_value):
+            centroid["categorical"][row.feature] = {
+                str(item["category"]): float(item["value"]) for item in row.categorical_value
+            }
+    return model
+
+
+def save_model(name, model, model_dir=MODEL_DIR):
+    os.makedirs(model_dir, exist_ok=True)
+    with open(os.path.join(model_dir, f"{name}.json"), 'w') as f:
+        json.dump(model, f, indent=2)
+
+
+def load_model(name, model_dir=MODEL_DIR):
+    with open(os.path.join(model_dir, f"{name}.json"), 'r') as f:
+        return json.load(f)
+
+
+# --- Vectorized scoring ---
+def _numeric(df, column):
+    return pd.to_numeric(df[column], errors="coerce").fillna(0).to_numpy(dtype=np.float64)
+
+
+def _categories(df, column):
+    # Unseen categories and NULLs map to no weight, as in ML.PREDICT
+    return df[column].astype(str).to_numpy()
+
+
+def score_sessions(df_features, model):
+    """
+    Logistic regression in NumPy: one dot product per session, no Python loop over rows.
+    Returns the SESSION_COLUMNS plus bounce_probability and bounce_prediction (0/1).
+    """
+    z = np.full(len(df_features), model["intercept"], dtype=np.float64)
+    for feature, weight in model["numeric"].items():
+        z += weight * _numeric(df_features, feature)
+    for feature, weights in model["categorical"].items():
+        z += pd.Series(_categories(df_features, feature)).map(weights).fillna(0).to_numpy(dtype=np.float64)
+
+    probability = 1.0 / (1.0 + np.exp(-z))
+    columns = [column for column in SESSION_COLUMNS if column in df_features.columns]
+    df_scored = df_features[columns].copy()
+    df_scored["bounce_probability"] = probability
+    df_scored["bounce_prediction"] = (probability >= 0.5).astype(np.int64)
+    return df_scored
+
+
+def assign_segments(df_features, model):
+    """
+    Nearest-centroid assignment in NumPy. Numeric features are standardized
+    with the training mean/stddev; categorical features contribute the
+    one-hot distance to each centroid's category weights.
+    """
+    centroid_ids = sorted(model["centroids"], key=int)
+    numeric_features = sorted({f for c in model["centroids"].values() for f in c["numeric"]})
+    categorical_features = sorted({f for c in model["centroids"].values() for f in c["categorical"]})
+
+    def scale(feature, values):
+        mean, stddev = model["scaling"].get(feature, [0.0, 1.0])
+        return (values - mean) / (stddev or 1.0)
+
+    # (rows, features) matrix of standardized inputs and (centroids, features) matrix of centroids
+    x = np.column_stack([scale(f, _numeric(df_features, f)) for f in numeric_features]) if numeric_features \
+        else np.zeros((len(df_features), 0))
+    c = np.array([
+        [scale(f, np.float64(model["centroids"][cid]["numeric"].get(f, 0.0))) for f in numeric_features]
+        for cid in centroid_ids
+    ]).reshape(len(centroid_ids), len(numeric_features))
+    distances = ((x[:, None, :] - c[None, :, :]) ** 2).sum(axis=2)
+
+    for feature in categorical_features:
+        values = pd.Series(_categories(df_features, feature))
+        for j, cid in enumerate(centroid_ids):
+            weights = model["centroids"][cid]["categorical"].get(feature, {})
+            own = values.map(weights).fillna(0).to_numpy(dtype=np.float64)
+            # |onehot - w|^2 summed over categories = sum(w^2) - 2*w[own] + 1
+            distances[:, j] += sum(w * w for w in weights.values()) - 2 * own + 1
+
+    df_scored = pd.DataFrame({"user_pseudo_id": df_features["user_pseudo_id"].to_numpy()})
+    df_scored["centroid_id"] = np.array(centroid_ids, dtype=np.int64)[distances.argmin(axis=1)]
+    return df_scored
+
+
+# --- Pipeline ---
+def write_table(df, table, local=False, dataset=DATASET, parquet_dir=PARQUET_DIR):
+    """Replaces a scored table in BigQuery, or its Parquet copy for the DuckDB backend."""
+    if local:
+        out_dir = os.path.join(parquet_dir, table)
+        os.makedirs(out_dir, exist_ok=True)
+        df.to_parquet(os.path.join(out_dir, "part-0.parquet"), index=False)
+        return
+    from google.cloud import bigquery
+
+    client = get_bq_client()
+    job_config = bigquery.LoadJobConfig(write_disposition="WRITE_TRUNCATE")
+    client.load_table_from_dataframe(df, f"{dataset}.{table}", job_config=job_config).result()
+
+
+def run_scoring(local=False, export_models=False, backend=None, dataset=DATASET):
+    """
+    Scores every session (phase_5_session_features.sql) and every row of
+    user_features, and writes scored_sessions and scored_users. Returns the number of rows scored per table.
+    """
+    if export_models:
+        save_model(BOUNCE_MODEL, export_bounce_model(dataset=dataset))
+        save_model(SEGMENT_MODEL, export_segment_model(dataset=dataset))
+
+    backend = backend or get_backend()
+    scored_at = pd.Timestamp(datetime.datetime.now(datetime.timezone.utc))
+
+    df_sessions = run_sql(qualify_tables(get_template(SESSION_FEATURES_QUERY).sql, dataset), backend=backend)
+    df_scored_sessions = score_sessions(df_sessions, load_model(BOUNCE_MODEL))
+    df_scored_sessions["scored_at"] = scored_at
+    write_table(df_scored_sessions, "scored_sessions", local=local, dataset=dataset)
+
+    df_users = run_sql(f"SELECT * FROM {dataset}.user_features", backend=backend)
+    df_scored_users = assign_segments(df_users, load_model(SEGMENT_MODEL))
+    df_scored_users["scored_at"] = scored_at
+    write_table(df_scored_users, "scored_users", local=local, dataset=dataset)
+
+    return {"scored_sessions": len(df_scored_sessions), "scored_users": len(df_scored_users)}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Batch-score sessions and users with the exported BigQuery ML models.")
+    parser.add_argument("--export-models", action="store_true", help="Re-export weights and centroids from BigQuery ML first")
+    parser.add_argument("--local", action="store_true", help="Write scored tables as Parquet for the DuckDB backend")
+    parser.add_argument("--every", type=float, default=0, help="Repeat every N seconds instead of running once")
+    args = parser.parse_args()
+
+    while True:
+        counts = run_scoring(local=args.local, export_models=args.export_models)
+        print(f"Scored {counts['scored_sessions']} sessions and {counts['scored_users']} users")
+        if not args.every:
+            break
+        time.sleep(args.every)
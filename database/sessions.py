@@ -0,0 +1,124 @@
+import datetime
+import numpy as np
+
+from database.backend import DATASET, run_sql
+
+# --- Sessionization ---
+# The sessions table (one row per session) for the local DuckDB replica,
+# computed from cleaned_events with NumPy instead of a GROUP BY. BigQuery
+# builds the same table from phase_3_3_sessions.sql (database/rollup.py).
+SESSIONS_QUERY = "phase_3_3_sessions"
+EVENT_COLUMNS = ["session_id", "user_pseudo_id", "event_datetime", "event_name", "page_url",
+                 "device_category", "browser", "source", "medium"]
+# Per-session attributes taken from the session's first event
+SESSION_ATTRIBUTES = ["user_pseudo_id", "device_category", "browser", "source", "medium"]
+
+
+def sessionize(events, start_date=None, end_date=None):
+    """
+    Builds the phase_3_3_sessions.sql rows from an Arrow table of cleaned_events rows.
+    - One sort by (session_id, event_datetime) makes every session a contiguous run
+    - Run boundaries come from comparing neighbouring session ids
+    - Counts are np.add.reduceat over the runs; start/end are the first/last rows
+    - Entry/exit pages are the first/last page_view row of each run
+    With start_date/end_date, only sessions that started in the range are kept.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    events = events.select(EVENT_COLUMNS)
+    events = events.take(pc.sort_indices(events, sort_keys=[("session_id", "ascending"), ("event_datetime", "ascending")]))
+    n = events.num_rows
+    if n == 0:
+        return _empty_sessions(events.schema)
+
+    session_ids = events.column("session_id").combine_chunks()
+    codes = session_ids.dictionary_encode().indices.to_numpy(zero_copy_only=False)
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    ends = np.r_[starts[1:], n] - 1
+
+    timestamp_type = events.schema.field("event_datetime").type
+    micros = events.column("event_datetime").cast(pa.int64()).to_numpy()
+    session_start, session_end = micros[starts], micros[ends]
+
+    names = events.column("event_name").combine_chunks()
+    is_page_view = pc.fill_null(pc.equal(names, "page_view"), False).to_numpy(zero_copy_only=False)
+    is_conversion = pc.fill_null(pc.equal(names, "conversion"), False).to_numpy(zero_copy_only=False)
+    page_views = np.add.reduceat(is_page_view.astype(np.int64), starts)
+    conversions = np.add.reduceat(is_conversion.astype(np.int64), starts)
+
+    # Entry/exit: the first and last page_view position inside each run
+    page_rows = np.flatnonzero(is_page_view)
+    page_session = np.searchsorted(starts, page_rows, side="right") - 1
+    entry_rows = np.full(len(starts), -1, dtype=np.int64)
+    exit_rows = np.full(len(starts), -1, dtype=np.int64)
+    if len(page_rows):
+        first = np.r_[True, page_session[1:] != page_session[:-1]]
+        last = np.r_[page_session[1:] != page_session[:-1], True]
+        entry_rows[page_session[first]] = page_rows[first]
+        exit_rows[page_session[last]] = page_rows[last]
+    page_url = events.column("page_url").combine_chunks()
+
+    def pages(rows):
+        # Sessions without a page view get NULL, as MIN_BY/MAX_BY return in SQL
+        return pc.if_else(pa.array(rows >= 0), page_url.take(pa.array(np.maximum(rows, 0))), None)
+
+    session_date = (session_start // 86_400_000_000).astype("datetime64[D]")
+    columns = {
+        "session_id": session_ids.take(pa.array(starts)),
+        "user_pseudo_id": None,
+        "session_date": pa.array(session_date, type=pa.date32()),
+        "session_start": pa.array(session_start).cast(timestamp_type),
+        "session_end": pa.array(session_end).cast(timestamp_type),
+        "session_duration": pa.array((session_end - session_start) // 1_000_000),
+        "page_views": pa.array(page_views),
+        "conversions": pa.array(conversions),
+        "is_bounce": pa.array((page_views == 1).astype(np.int64)),
+        "entry_page": pages(entry_rows),
+        "exit_page": pages(exit_rows),
+    }
+    for column in SESSION_ATTRIBUTES:
+        columns[column] = events.column(column).combine_chunks().take(pa.array(starts))
+    sessions = pa.table(columns)
+
+    if start_date is not None and end_date is not None:
+        dates = sessions.column("session_date")
+        sessions = sessions.filter(pc.and_(pc.greater_equal(dates, start_date), pc.less_equal(dates, end_date)))
+    return sessions
+
+
+def _empty_sessions(schema):
+    import pyarrow as pa
+
+    return pa.table({
+        "session_id": pa.array([], pa.string()),
+        "user_pseudo_id": pa.array([], pa.string()),
+        "session_date": pa.array([], pa.date32()),
+        "session_start": pa.array([], schema.field("event_datetime").type),
+        "session_end": pa.array([], schema.field("event_datetime").type),
+        "session_duration": pa.array([], pa.int64()),
+        "page_views": pa.array([], pa.int64()),
+        "conversions": pa.array([], pa.int64()),
+        "is_bounce": pa.array([], pa.int64()),
+        "entry_page": pa.array([], pa.string()),
+        "exit_page": pa.array([], pa.string()),
+        "device_category": pa.array([], pa.string()),
+        "browser": pa.array([], pa.string()),
+        "source": pa.array([], pa.string()),
+        "medium": pa.array([], pa.string()),
+    })
+
+
+def build_local_sessions(start_date, end_date, backend):
+    """
+    Reads the cleaned_events rows the sessions starting in the range need
+    (one extra day for sessions that cross midnight) from the DuckDB replica
+    and sessionizes them. Returns an Arrow table.
+    """
+    events = run_sql(
+        f"SELECT {', '.join(EVENT_COLUMNS)} FROM {DATASET}.cleaned_events "
+        "WHERE DATE(event_datetime) BETWEEN @start_date AND @end_date",
+        {"start_date": start_date, "end_date": end_date + datetime.timedelta(days=1)},
+        backend=backend, arrow=True,
+    )
+    return sessionize(events, start_date, end_date)
@@ -0,0 +1,55 @@
+import os
+
+# --- Scan budget ---
+# Every query runs with this many bytes as maximum_bytes_billed, so BigQuery
+# fails a job that would scan more instead of billing it. DASHBOARD_DRY_RUN=1
+# additionally dry-runs each query first and refuses it before it starts
+# (one extra round trip per query, so it is off by default).
+MAX_BYTES_BILLED = int(os.environ.get("DASHBOARD_MAX_BYTES_BILLED", str(10 * 1024 ** 3)))
+DRY_RUN = os.environ.get("DASHBOARD_DRY_RUN", "0") != "0"
+
+
+class QueryBudgetExceeded(Exception):
+    """Raised when a query would scan more than the configured byte budget."""
+
+    def __init__(self, query_name, estimated_bytes, budget):
+        self.query_name = query_name
+        self.estimated_bytes = estimated_bytes
+        self.budget = budget
+        super().__init__(
+            f"Query '{query_name}' would scan {format_bytes(estimated_bytes)}, "
+            f"over the {format_bytes(budget)} budget. Narrow the date range."
+        )
+
+
+def format_bytes(num_bytes):
+    """Human readable size, e.g. 1.2 GB."""
+    size = float(num_bytes)
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+def table_suffix_range(start_date, end_date):
+    """
+    Turns a date range into the _TABLE_SUFFIX bounds of the daily events_YYYYMMDD
+    shards it covers. Filtering events_* on these constants lets BigQuery
+    prune every other shard before reading; filtering on event_date does not.
+    """
+    if start_date > end_date:
+        raise ValueError("start_date must not be after end_date")
+    return start_date.strftime('%Y%m%d'), end_date.strftime('%Y%m%d')
+
+
+def shard_parameters(start_date, end_date):
+    """The @start_suffix/@end_suffix query parameters for a date range."""
+    start_suffix, end_suffix = table_suffix_range(start_date, end_date)
+    return {"start_suffix": start_suffix, "end_suffix": end_suffix}
+
+
+def check_budget(query_name, estimated_bytes, budget=MAX_BYTES_BILLED):
+    """Raises QueryBudgetExceeded when a dry-run estimate is over budget."""
+    if estimated_bytes is not None and budget and estimated_bytes > budget:
+        raise QueryBudgetExceeded(query_name, estimated_bytes, budget)
@@ -0,0 +1,167 @@
+import numpy as np
+import pandas as pd
+
+# --- Probabilistic counters ---
+# HyperLogLog for distinct counts that have to be updated incrementally in
+# memory (live mode), where keeping every id would grow without bound.
+# Space-Saving and Count-Min for top-K counts that merge across days
+# (database/topk.py).
+HLL_PRECISION = 14
+TOPK_CAPACITY = 1000
+CM_WIDTH = 4096
+CM_DEPTH = 4
+
+
+def hash_values(values):
+    """64-bit hashes of any array-like of strings or numbers, vectorized."""
+    return pd.util.hash_array(np.asarray(values, dtype=object), categorize=False)
+
+
+def _bit_length(x):
+    """Exact bit length of each uint64 (0 for 0), without float rounding."""
+    x = x.copy()
+    length = np.zeros(x.shape, dtype=np.uint8)
+    for shift in (32, 16, 8, 4, 2, 1):
+        high = x >= (np.uint64(1) << np.uint64(shift))
+        length[high] += shift
+        x[high] >>= np.uint64(shift)
+    length[x > 0] += 1
+    return length
+
+
+class HyperLogLog:
+    """
+    HyperLogLog distinct counter (Flajolet et al.) with 2**precision
+    one-byte registers. Standard error is about 1.04 / sqrt(2**precision),
+    0.8% at the default precision of 14 (16 KB per counter).
+    """
+
+    def __init__(self, precision=HLL_PRECISION):
+        if not 4 <= precision <= 18:
+            raise ValueError("precision must be between 4 and 18")
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    @property
+    def relative_error(self):
+        return 1.04 / np.sqrt(len(self.registers))
+
+    def add_hashes(self, hashes):
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        if not len(hashes):
+            return
+        p = np.uint64(self.precision)
+        index = (hashes >> (np.uint64(64) - p)).astype(np.int64)
+        remainder = hashes & ((np.uint64(1) << (np.uint64(64) - p)) - np.uint64(1))
+        # Rank: position of the first 1 bit in the remaining 64 - p bits
+        rank = (64 - self.precision) - _bit_length(remainder).astype(np.int64) + 1
+        np.maximum.at(self.registers, index, rank.astype(np.uint8))
+
+    def add_many(self, values):
+        self.add_hashes(hash_values(values))
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLogs of different precision")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def count(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.power(2.0, -self.registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        # Small ranges: linear counting on the empty registers is more accurate
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * np.log(m / zeros)
+        return int(round(estimate))
+
+
+class SpaceSaving:
+    """
+    Space-Saving heavy hitters (Metwally et al.) over weighted items, kept
+    in arrays so two summaries merge with one vectorized join (Agarwal et
+    al.'s mergeable summaries).
+    - items/counts: the monitored items and an upper bound on each count
+    - errors: how much of each count may belong to other items, so
+      counts - errors is a lower bound
+    - floor: upper bound on the count of any item not monitored
+    While fewer than capacity distinct items have been seen, counts are exact.
+    """
+
+    def __init__(self, capacity=TOPK_CAPACITY):
+        self.capacity = capacity
+        self.items = np.empty(0, dtype=object)
+        self.counts = np.empty(0, dtype=np.int64)
+        self.errors = np.empty(0, dtype=np.int64)
+        self.floor = 0
+
+    def update(self, items, weights):
+        """Adds a batch of items with their weights; items may repeat."""
+        codes, uniques = pd.factorize(np.asarray(items, dtype=object))
+        batch = SpaceSaving(self.capacity)
+        batch.items = np.asarray(uniques, dtype=object)
+        batch.counts = np.bincount(codes, weights=weights, minlength=len(uniques)).astype(np.int64)
+        batch.errors = np.zeros(len(uniques), dtype=np.int64)
+        batch._truncate(0)
+        return self.merge(batch)
+
+    def merge(self, other):
+        # An item missing from one summary may still have up to that summary's floor there
+        left = pd.DataFrame({"count": self.counts, "error": self.errors}, index=self.items)
+        right = pd.DataFrame({"count": other.counts, "error": other.errors}, index=other.items)
+        joined = left.join(right, how="outer", lsuffix="_a", rsuffix="_b")
+        counts = joined["count_a"].fillna(self.floor) + joined["count_b"].fillna(other.floor)
+        errors = joined["error_a"].fillna(self.floor) + joined["error_b"].fillna(other.floor)
+        self.items = joined.index.to_numpy(dtype=object)
+        self.counts = counts.to_numpy(dtype=np.int64)
+        self.errors = errors.to_numpy(dtype=np.int64)
+        self._truncate(self.floor + other.floor)
+        return self
+
+    def _truncate(self, floor):
+        order = np.argsort(-self.counts, kind="stable")
+        self.items, self.counts, self.errors = self.items[order], self.counts[order], self.errors[order]
+        if len(self.items) > self.capacity:
+            floor = max(floor, int(self.counts[self.capacity]))
+            self.items = self.items[:self.capacity]
+            self.counts = self.counts[:self.capacity]
+            self.errors = self.errors[:self.capacity]
+        self.floor = floor
+
+
+class CountMin:
+    """
+    Count-Min sketch (Cormode and Muthukrishnan): depth rows of width
+    counters. Estimates never undercount and overcount by at most
+    e / width of the total weight with probability 1 - exp(-depth).
+    Sketches of the same shape merge by adding their tables.
+    """
+
+    def __init__(self, width=CM_WIDTH, depth=CM_DEPTH):
+        self.table = np.zeros((depth, width), dtype=np.int64)
+
+    def _cells(self, items):
+        # depth hashes from one 64-bit hash: h1 + i * h2 (Kirsch and Mitzenmacher)
+        hashes = hash_values(items)
+        h1, h2 = hashes & np.uint64(0xFFFFFFFF), (hashes >> np.uint64(32)) | np.uint64(1)
+        rows = np.arange(self.table.shape[0])[:, None]
+        columns = (h1 + rows.astype(np.uint64) * h2) % np.uint64(self.table.shape[1])
+        return rows, columns.astype(np.int64)
+
+    def update(self, items, weights):
+        rows, columns = self._cells(items)
+        np.add.at(self.table, (rows, columns), np.asarray(weights, dtype=np.int64)[None, :])
+        return self
+
+    def estimate(self, items):
+        if not len(items):
+            return np.empty(0, dtype=np.int64)
+        rows, columns = self._cells(items)
+        return self.table[rows, columns].min(axis=0)
+
+    def merge(self, other):
+        if other.table.shape != self.table.shape:
+            raise ValueError("Cannot merge Count-Min sketches of different shapes")
+        self.table += other.table
+        return self
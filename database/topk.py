@@ -0,0 +1,234 @@
+import os
+import datetime
+import numpy as np
+import pandas as pd
+
+from database.queries import run_query
+from database.result_cache import CACHE_DIR, _day_runs, is_closed
+from database.sketches import CM_DEPTH, CM_WIDTH, TOPK_CAPACITY, CountMin, SpaceSaving
+
+# --- Top-K sketches ---
+# One Space-Saving summary plus one Count-Min sketch per day and dimension,
+# built from phase_4_daily_topk_counts.sql and kept on disk, so the top
+# pages, sources or browsers of any range come from merging a few KB per
+# day instead of re-aggregating the range. Closed days (result_cache.is_closed)
+# are built once; the last few days are rebuilt on each request.
+# Sketch files record TOPK_VERSION and the sketch sizes; files written by
+# another version are rebuilt, so bump it when the query or the
+# normalization changes.
+TOPK_QUERY = "phase_4_daily_topk_counts"
+TOP_PAGES_QUERY = "phase_4_top_pages"
+DIMENSIONS = ("page_url", "source", "browser")
+# Pages taken from the sketches before exact page views rank them
+TOP_PAGES_CANDIDATES = 50
+TRAFFIC_SOURCES_ROWS = 100
+URL_SUFFIX_PATTERN = r"[?#].*$"
+TOPK_VERSION = 2
+SKETCH_VERSION = f"{TOPK_VERSION}/{TOPK_CAPACITY}/{CM_WIDTH}x{CM_DEPTH}"
+
+
+def topk_dir(cache_dir=CACHE_DIR):
+    """Sketch files live next to a property's result cache."""
+    return os.path.join(cache_dir, "topk")
+
+
+def normalize_urls(urls):
+    """Strips query strings and fragments from an Arrow array of page URLs."""
+    import pyarrow.compute as pc
+
+    return pc.replace_substring_regex(urls, URL_SUFFIX_PATTERN, "")
+
+
+class TopK:
+    """
+    Heavy hitters of one dimension: Space-Saving picks the candidates and
+    bounds their counts, Count-Min tightens the bound for candidates that
+    fell out of some day's summary.
+    """
+
+    def __init__(self, capacity=TOPK_CAPACITY, width=CM_WIDTH, depth=CM_DEPTH):
+        self.summary = SpaceSaving(capacity)
+        self.sketch = CountMin(width, depth)
+
+    def update(self, items, weights):
+        self.summary.update(items, weights)
+        self.sketch.update(items, weights)
+        return self
+
+    def merge(self, other):
+        self.summary.merge(other.summary)
+        self.sketch.merge(other.sketch)
+        return self
+
+    def top(self, n):
+        """DataFrame of the n heaviest items: item, estimate and its maximum overcount (error)."""
+        summary = self.summary
+        estimate = np.minimum(summary.counts, self.sketch.estimate(summary.items))
+        df = pd.DataFrame({
+            "item": summary.items,
+            "estimate": estimate,
+            "error": np.maximum(estimate - (summary.counts - summary.errors), 0),
+        })
+        return df.sort_values("estimate", ascending=False, kind="stable").head(n).reset_index(drop=True)
+
+
+def build_day_sketches(table):
+    """
+    {day: {dimension: TopK}} from an Arrow table of phase_4_daily_topk_counts.sql rows.
+    Items are dictionary-encoded once per day and dimension, and their
+    weights summed per code with np.bincount before they reach the sketches.
+    """
+    import pyarrow.compute as pc
+
+    sketches = {}
+    for day in pc.unique(table.column("event_date")).to_pylist():
+        day_rows = table.filter(pc.equal(table.column("event_date"), day))
+        sketches[day] = {}
+        for dimension in DIMENSIONS:
+            rows = day_rows.filter(pc.equal(day_rows.column("dimension"), dimension))
+            items = rows.column("item").combine_chunks()
+            if dimension == "page_url":
+                items = normalize_urls(items)
+            encoded = items.dictionary_encode()
+            weights = np.bincount(
+                encoded.indices.to_numpy(zero_copy_only=False),
+                weights=rows.column("weight").to_numpy().astype(np.float64),
+                minlength=len(encoded.dictionary),
+            )
+            sketches[day][dimension] = TopK().update(
+                encoded.dictionary.to_numpy(zero_copy_only=False), weights.astype(np.int64)
+            )
+    return sketches
+
+
+# --- Storage ---
+def _day_path(sketch_dir, day):
+    return os.path.join(sketch_dir, f"{day:%Y-%m-%d}.npz")
+
+
+def save_day(sketch_dir, day, sketches):
+    """Writes one day's sketches (every dimension) to <sketch_dir>/YYYY-MM-DD.npz."""
+    arrays = {"version": np.asarray(SKETCH_VERSION)}
+    for dimension, topk in sketches.items():
+        summary = topk.summary
+        arrays[f"{dimension}.items"] = np.asarray(summary.items, dtype=str)
+        arrays[f"{dimension}.counts"] = summary.counts
+        arrays[f"{dimension}.errors"] = summary.errors
+        arrays[f"{dimension}.floor"] = np.int64(summary.floor)
+        arrays[f"{dimension}.table"] = topk.sketch.table
+    os.makedirs(sketch_dir, exist_ok=True)
+    path = _day_path(sketch_dir, day)
+    with open(path + ".tmp", 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(path + ".tmp", path)
+
+
+def load_day(sketch_dir, day):
+    """One day's sketches, or None when they have not been built or were built by another version."""
+    try:
+        data = np.load(_day_path(sketch_dir, day), allow_pickle=False)
+    except OSError:
+        return None
+    sketches = {}
+    with data:
+        if "version" not in data.files or str(data["version"]) != SKETCH_VERSION:
+            return None
+        for dimension in DIMENSIONS:
+            topk = TopK()
+            topk.summary.items = data[f"{dimension}.items"].astype(object)
+            topk.summary.counts = data[f"{dimension}.counts"]
+            topk.summary.errors = data[f"{dimension}.errors"]
+            topk.summary.floor = int(data[f"{dimension}.floor"])
+            topk.sketch.table = data[f"{dimension}.table"]
+            sketches[dimension] = topk
+    return sketches
+
+
+def _complete(day_sketches):
+    """True when every dimension had rows, i.e. every rollup the query reads covered the day."""
+    return all(len(day_sketches[dimension].summary.items) for dimension in DIMENSIONS)
+
+
+def get_day_sketches(start_date, end_date, backend=None, sketch_dir=None, tracker=None, rebuild=False):
+    """
+    Sketches for every day of the range: closed days from disk, the rest
+    built with one phase_4_daily_topk_counts.sql query per contiguous run
+    of missing days. Days without traffic get empty sketches.
+    Only closed days the rollups already cover are saved: days with rows in
+    every dimension, and empty days before the latest such day. A day the
+    rollups have not reached yet is queried again next time.
+    rebuild ignores the stored sketches and rewrites them.
+    """
+    sketch_dir = sketch_dir or topk_dir()
+    days = [start_date + datetime.timedelta(days=i) for i in range((end_date - start_date).days + 1)]
+    sketches, missing = {}, []
+    for day in days:
+        stored = load_day(sketch_dir, day) if is_closed(day) and not rebuild else None
+        if stored is None:
+            missing.append(day)
+        else:
+            sketches[day] = stored
+
+    for run_start, run_end in _day_runs(missing):
+        built = build_day_sketches(run_query(TOPK_QUERY, run_start, run_end, backend=backend, tracker=tracker, arrow=True))
+        covered = max((built_day for built_day, day_sketches in built.items() if _complete(day_sketches)), default=None)
+        day = run_start
+        while day <= run_end:
+            sketches[day] = built.get(day) or {dimension: TopK() for dimension in DIMENSIONS}
+            covered_day = _complete(built[day]) if day in built else covered is not None and day < covered
+            if is_closed(day) and covered_day:
+                save_day(sketch_dir, day, sketches[day])
+            day += datetime.timedelta(days=1)
+    return sketches
+
+
+def top_k(dimension, start_date, end_date, n=20, backend=None, sketch_dir=None, tracker=None):
+    """The n heaviest items of a dimension over the range: item, estimate, error."""
+    merged = TopK()
+    for day_sketches in get_day_sketches(start_date, end_date, backend, sketch_dir, tracker).values():
+        merged.merge(day_sketches[dimension])
+    return merged.top(n)
+
+
+# --- Dashboard tabs ---
+def load_top_pages(start_date, end_date, backend=None, sketch_dir=None, tracker=None):
+    """
+    The Top Pages tab: candidates from the page_url sketches, then page views,
+    sessions and users for just those pages from phase_4_top_pages.sql.
+    """
+    candidates = top_k("page_url", start_date, end_date, TOP_PAGES_CANDIDATES, backend, sketch_dir, tracker)
+    if candidates.empty:
+        return pd.DataFrame()
+    return run_query(
+        TOP_PAGES_QUERY, start_date, end_date, backend=backend, tracker=tracker,
+        pages=candidates["item"].tolist(),
+    )
+
+
+def load_traffic_sources(start_date, end_date, backend=None, sketch_dir=None, tracker=None):
+    """The Traffic Sources tab: sessions per source from the source sketches."""
+    df = top_k("source", start_date, end_date, TRAFFIC_SOURCES_ROWS, backend, sketch_dir, tracker)
+    return df.rename(columns={"item": "source", "estimate": "session_count"})[["source", "session_count"]]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build the per-day top-K sketches, or print a range's top items.")
+    parser.add_argument("--start", required=True, type=datetime.date.fromisoformat)
+    parser.add_argument("--end", required=True, type=datetime.date.fromisoformat)
+    parser.add_argument("--dimension", choices=DIMENSIONS, help="Print this dimension's top items")
+    parser.add_argument("-n", type=int, default=20)
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild the stored sketches (e.g. after rebuilding the rollups)")
+    parser.add_argument("--property", help="GA4 property key from the registry (database/properties.py)")
+    args = parser.parse_args()
+
+    from database.backend import get_backend
+    from database.properties import get_property
+
+    prop = get_property(args.property)
+    if args.dimension:
+        print(top_k(args.dimension, args.start, args.end, args.n, get_backend(prop), topk_dir(prop.cache_dir)).to_string())
+    else:
+        built = get_day_sketches(args.start, args.end, get_backend(prop), topk_dir(prop.cache_dir), rebuild=args.rebuild)
+        print(f"Top-K sketches ready for {len(built)} days in {topk_dir(prop.cache_dir)}")
@@ -0,0 +1,238 @@
+import os
+import sys
+import time
+import itertools
+import threading
+from collections import deque
+
+# --- Tracing configuration ---
+# Finished spans are kept in memory for the dashboard's Performance tab.
+# DASHBOARD_METRICS_TEXTFILE: path of a Prometheus textfile (node_exporter textfile collector)
+# DASHBOARD_OTEL=1: also emit spans through the OpenTelemetry SDK configured by the host
+MAX_SPANS = int(os.environ.get("DASHBOARD_TRACE_SPANS", "5000"))
+METRICS_TEXTFILE = os.environ.get("DASHBOARD_METRICS_TEXTFILE")
+OTEL_ENABLED = os.environ.get("DASHBOARD_OTEL", "0") == "1"
+
+# Latency histogram buckets in seconds
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+# Attributes copied from a parent span to the spans opened inside it
+INHERITED = ("query", "tab")
+
+
+class Span:
+    """
+    One timed stage of a query or page render.
+    - name: the stage ("query", "submit", "wait", "download", "to_pandas", "render", ...)
+    - attributes: query name, tab, and job statistics such as bytes_processed
+    """
+
+    _ids = itertools.count(1)
+
+    def __init__(self, name, parent=None, **attributes):
+        self.span_id = next(self._ids)
+        self.name = name
+        self.parent_id = parent.span_id if parent else None
+        self.trace_id = parent.trace_id if parent else self.span_id
+        self.attributes = {key: parent.attributes[key] for key in INHERITED if parent and key in parent.attributes}
+        self.attributes.update(attributes)
+        self.start_time = time.time()
+        self.duration = None
+        self.status = "ok"
+        self.error = None
+        self._started = time.perf_counter()
+        self._otel_span = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_time": self.start_time,
+            "duration": self.duration,
+            "status": self.status,
+            "error": self.error,
+            **{key: None for key in INHERITED},
+            **self.attributes,
+        }
+
+
+_local = threading.local()
+_finished = deque(maxlen=MAX_SPANS)
+_lock = threading.Lock()
+
+
+def _stack():
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+    return _local.stack
+
+
+def current_span():
+    """The innermost open span on this thread, or None."""
+    stack = _stack()
+    return stack[-1] if stack else None
+
+
+class span:
+    """
+    Context manager timing one stage. Spans opened inside it on the same
+    thread become its children and inherit its query/tab attributes.
+    Exceptions are recorded on the span and re-raised.
+    """
+
+    def __init__(self, name, **attributes):
+        self.name = name
+        self.attributes = attributes
+
+    def __enter__(self):
+        stack = _stack()
+        self.span = Span(self.name, stack[-1] if stack else None, **self.attributes)
+        if OTEL_ENABLED:
+            _otel_start(self.span, stack[-1] if stack else None)
+        stack.append(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        _stack().pop()
+        finished = self.span
+        finished.duration = time.perf_counter() - finished._started
+        if exc_type is not None:
+            finished.status = "error"
+            finished.error = f"{exc_type.__name__}: {exc}"
+        _finish(finished)
+        return False
+
+
+def record_job(job):
+    """
+    Copies BigQuery job statistics onto the enclosing "query" span (or the
+    current span when there is none). Jobs without these attributes, such
+    as local DuckDB statements, are ignored.
+    """
+    target = next((s for s in reversed(_stack()) if s.name == "query"), current_span())
+    if target is None or not hasattr(job, "total_bytes_processed"):
+        return
+    target.set(
+        job_id=getattr(job, "job_id", None),
+        bytes_processed=job.total_bytes_processed or 0,
+        bytes_billed=job.total_bytes_billed or 0,
+        cache_hit=bool(job.cache_hit),
+        slot_millis=job.slot_millis or 0,
+    )
+
+
+def _finish(finished):
+    with _lock:
+        _finished.append(finished)
+        _metrics.observe(finished)
+    if finished._otel_span is not None:
+        _otel_end(finished)
+    if METRICS_TEXTFILE and finished.parent_id is None:
+        # Metrics export must never fail the query the span belongs to
+        try:
+            write_textfile(METRICS_TEXTFILE)
+        except OSError as e:
+            print(f"Could not write metrics to {METRICS_TEXTFILE}: {e}", file=sys.stderr)
+
+
+def recent_spans():
+    """Finished spans, oldest first, as plain dicts."""
+    with _lock:
+        return [finished.to_dict() for finished in _finished]
+
+
+def clear():
+    with _lock:
+        _finished.clear()
+
+
+# --- Prometheus textfile exporter ---
+class _Metrics:
+    """Cumulative per (query, stage) counters in the Prometheus text format."""
+
+    def __init__(self):
+        self.durations = {}
+        self.totals = {}
+
+    def observe(self, finished):
+        labels = (finished.attributes.get("query") or finished.attributes.get("tab") or "", finished.name)
+        buckets, count, total = self.durations.get(labels, ([0] * len(BUCKETS), 0, 0.0))
+        buckets = [n + (finished.duration <= bound) for n, bound in zip(buckets, BUCKETS)]
+        self.durations[labels] = (buckets, count + 1, total + finished.duration)
+
+        counters = {"errors": finished.status == "error"}
+        if finished.name == "query":
+            counters.update({
+                "bytes_processed": finished.attributes.get("bytes_processed", 0),
+                "bytes_billed": finished.attributes.get("bytes_billed", 0),
+                "slot_millis": finished.attributes.get("slot_millis", 0),
+                "cache_hits": bool(finished.attributes.get("cache_hit")),
+            })
+        for counter, value in counters.items():
+            self.totals[labels + (counter,)] = self.totals.get(labels + (counter,), 0) + value
+
+    def render(self):
+        lines = [
+            "# HELP dashboard_stage_seconds Time spent per query and stage.",
+            "# TYPE dashboard_stage_seconds histogram",
+        ]
+        for (query, stage), (buckets, count, total) in sorted(self.durations.items()):
+            labels = f'query="{query}",stage="{stage}"'
+            for bound, n in zip(BUCKETS, buckets):
+                lines.append(f'dashboard_stage_seconds_bucket{{{labels},le="{bound}"}} {n}')
+            lines.append(f'dashboard_stage_seconds_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f"dashboard_stage_seconds_sum{{{labels}}} {total:.6f}")
+            lines.append(f"dashboard_stage_seconds_count{{{labels}}} {count}")
+        for counter in ("bytes_processed", "bytes_billed", "slot_millis", "cache_hits", "errors"):
+            rows = [(key, value) for key, value in sorted(self.totals.items()) if key[2] == counter]
+            if not rows:
+                continue
+            lines.append(f"# TYPE dashboard_{counter}_total counter")
+            for (query, stage, _), value in rows:
+                lines.append(f'dashboard_{counter}_total{{query="{query}",stage="{stage}"}} {int(value)}')
+        return "\n".join(lines) + "\n"
+
+
+_metrics = _Metrics()
+# Root spans finishing on several worker threads write one at a time, newest totals last
+_write_lock = threading.Lock()
+
+
+def write_textfile(path=METRICS_TEXTFILE):
+    """Writes the metrics atomically so the collector never reads a partial file."""
+    with _write_lock:
+        with _lock:
+            text = _metrics.render()
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+
+# --- OpenTelemetry exporter ---
+def _otel_start(new_span, parent):
+    try:
+        from opentelemetry import trace
+    except ImportError:
+        return
+    context = trace.set_span_in_context(parent._otel_span) if parent and parent._otel_span else None
+    new_span._otel_span = trace.get_tracer("website-analytics-dashboard").start_span(
+        f"dashboard.{new_span.name}", context=context, start_time=int(new_span.start_time * 1e9)
+    )
+
+
+def _otel_end(finished):
+    from opentelemetry.trace import Status, StatusCode
+
+    otel_span = finished._otel_span
+    for key, value in finished.attributes.items():
+        if value is not None:
+            otel_span.set_attribute(f"dashboard.{key}", value)
+    if finished.status == "error":
+        otel_span.set_status(Status(StatusCode.ERROR, finished.error))
+    otel_span.end(end_time=int((finished.start_time + finished.duration) * 1e9))
@@ -0,0 +1,302 @@
+import os
+import re
+import json
+import shutil
+import hashlib
+import posixpath
+from urllib.parse import unquote, urlsplit
+
+from sitebuild.images import OPTIMIZED_SUFFIXES, image_support, optimize_image
+
+# --- Static site build ---
+# Copies website/ into a deployable tree where every asset a page or
+# stylesheet references is published once under static/ with its content
+# hash in the name. The four copies of the theme and Font Awesome collapse
+# into one, the files can be cached forever, and raster images are offered
+# as responsive WebP/AVIF through <picture>.
+SITE_DIR = os.path.join(os.path.dirname(__file__), '..', 'website')
+OUT_DIR = os.environ.get(
+    "DASHBOARD_SITE_OUT",
+    os.path.join(os.path.dirname(__file__), '..', 'data', 'site')
+)
+# Where the site is served; same-site absolute URLs are treated as local files
+SITE_URL = os.environ.get("DASHBOARD_SITE_URL", "https://www.sankalandtech.com")
+STATIC_DIR = "static"
+HASH_LENGTH = 10
+MANIFEST_FILE = "asset-manifest.json"
+# Build inputs that are not served
+SOURCE_SUFFIXES = (".scss", ".map")
+
+ATTRIBUTE_PATTERN = re.compile(r"""(\b(?:src|href|poster|data-src)\s*=\s*)(["'])(.*?)\2""", re.IGNORECASE | re.DOTALL)
+SRCSET_PATTERN = re.compile(r"""(\bsrcset\s*=\s*)(["'])(.*?)\2""", re.IGNORECASE | re.DOTALL)
+CSS_URL_PATTERN = re.compile(r"""url\(\s*(["']?)(.*?)\1\s*\)""", re.IGNORECASE | re.DOTALL)
+CSS_IMPORT_PATTERN = re.compile(r"""(@import\s+)(["'])(.*?)\2""", re.IGNORECASE)
+IMG_PATTERN = re.compile(r"<img\b[^>]*>", re.IGNORECASE)
+PICTURE_PATTERN = re.compile(r"<picture\b.*?</picture>", re.IGNORECASE | re.DOTALL)
+
+
+def read_text(path):
+    # surrogateescape round-trips pages that are not valid UTF-8 byte for byte
+    with open(path, 'r', encoding="utf-8", errors="surrogateescape") as f:
+        return f.read()
+
+
+def write_text(path, text):
+    with open(path, 'w', encoding="utf-8", errors="surrogateescape") as f:
+        f.write(text)
+
+
+def resolve(ref, base_dir, root):
+    """
+    (site path, suffix) of the local file a reference points at, or None for
+    external, in-page and missing targets. base_dir is the referencing file's
+    directory relative to root; suffix is the ?query/#fragment to keep.
+    """
+    ref = ref.strip()
+    if not ref or ref.startswith(("#", "data:", "mailto:", "tel:", "javascript:")):
+        return None
+    cut = min([i for i in (ref.find("?"), ref.find("#")) if i >= 0], default=len(ref))
+    parts = urlsplit(ref[:cut])
+    site = urlsplit(SITE_URL)
+    if parts.scheme or parts.netloc:
+        if parts.netloc.removeprefix("www.") != site.netloc.removeprefix("www."):
+            return None
+        path = parts.path.lstrip("/")
+    elif parts.path.startswith("/"):
+        path = parts.path.lstrip("/")
+    else:
+        path = posixpath.join(base_dir, parts.path)
+    path = posixpath.normpath(unquote(path))
+    if path.startswith("..") or not os.path.isfile(os.path.join(root, path)):
+        return None
+    return path, ref[cut:]
+
+
+def html_pages(root):
+    """Site paths of every .html file under root, sorted."""
+    pages = []
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            if filename.lower().endswith(".html"):
+                pages.append(os.path.relpath(os.path.join(dirpath, filename), root).replace(os.sep, "/"))
+    return sorted(pages)
+
+
+class SiteBuild:
+    """
+    One build of site_dir into out_dir.
+    - published: site path -> static file name, so each file is processed once
+    - by_hash: content hash -> static file name; identical files share one
+    - images: site path -> (fallback name, width, {format: [(width, name)]})
+    """
+
+    def __init__(self, site_dir=SITE_DIR, out_dir=OUT_DIR, formats=None):
+        self.site_dir = os.path.abspath(site_dir)
+        self.out_dir = os.path.abspath(out_dir)
+        self.formats = image_support() if formats is None else formats
+        self.published = {}
+        self.by_hash = {}
+        self.images = {}
+        self._publishing = set()
+
+    # --- Assets ---
+    def _store(self, content, stem, suffix):
+        digest = hashlib.sha256(content).hexdigest()[:HASH_LENGTH]
+        name = self.by_hash.get(digest)
+        if name is None:
+            name = self.by_hash[digest] = f"{stem}.{digest}{suffix}"
+            with open(os.path.join(self.out_dir, STATIC_DIR, name), 'wb') as f:
+                f.write(content)
+        return name
+
+    def publish(self, path):
+        """Static file name for one site file, publishing it (and what it references) first."""
+        if path in self.published:
+            return self.published[path]
+        stem, suffix = posixpath.splitext(posixpath.basename(path))
+        suffix = suffix.lower()
+        source = os.path.join(self.site_dir, path)
+        if suffix in OPTIMIZED_SUFFIXES and self.formats:
+            image = self.publish_image(path)
+            if image is not None:
+                return image[0]
+        if suffix == ".css" and path not in self._publishing:
+            self._publishing.add(path)
+            text = self.rewrite_css(read_text(source), posixpath.dirname(path))
+            self._publishing.discard(path)
+            content = text.encode("utf-8", "surrogateescape")
+        else:
+            with open(source, 'rb') as f:
+                content = f.read()
+        name = self.published[path] = self._store(content, stem, suffix)
+        return name
+
+    def publish_image(self, path):
+        """Fallback plus responsive variants of one raster image, or None if it cannot be decoded."""
+        if path in self.images:
+            return self.images[path]
+        stem, suffix = posixpath.splitext(posixpath.basename(path))
+        with open(os.path.join(self.site_dir, path), 'rb') as f:
+            data = f.read()
+        optimized = optimize_image(data, suffix.lower(), self.formats)
+        if optimized is None:
+            self.images[path] = None
+            return None
+        fallback, width, variants = optimized
+        image = (
+            self._store(fallback, stem, suffix.lower()),
+            width,
+            {fmt: [(w, self._store(content, f"{stem}-{w}w", f".{fmt}")) for w, content in sized]
+             for fmt, sized in variants.items()},
+        )
+        self.images[path] = image
+        self.published[path] = image[0]
+        return image
+
+    def rewrite_css(self, text, base_dir):
+        """Points url() and @import references at published files; everything lands in static/."""
+        def url(match):
+            target = resolve(match.group(2), base_dir, self.site_dir)
+            if target is None:
+                return match.group(0)
+            return f"url({match.group(1)}{self.publish(target[0])}{target[1]}{match.group(1)})"
+
+        def imports(match):
+            target = resolve(match.group(3), base_dir, self.site_dir)
+            if target is None:
+                return match.group(0)
+            return f"{match.group(1)}{match.group(2)}{self.publish(target[0])}{target[1]}{match.group(2)}"
+
+        return CSS_IMPORT_PATTERN.sub(imports, CSS_URL_PATTERN.sub(url, text))
+
+    # --- Pages ---
+    def rewrite_html(self, page, text):
+        """
+        Rewrites one page's asset references to static/ (relative to the page).
+        <img> tags outside a <picture> become a <picture> with AVIF/WebP
+        srcsets; every image after the first is lazy-loaded.
+        Links to other pages are left alone.
+        """
+        base_dir = posixpath.dirname(page)
+
+        def relative(name):
+            return posixpath.relpath(f"{STATIC_DIR}/{name}", base_dir or ".")
+
+        def asset(ref):
+            target = resolve(ref, base_dir, self.site_dir)
+            if target is None or target[0].lower().endswith(".html"):
+                return None
+            return relative(self.publish(target[0])) + target[1]
+
+        pictures = [m.span() for m in PICTURE_PATTERN.finditer(text)]
+        first_image = [True]
+
+        def picture(match):
+            tag = match.group(0)
+            lazy = not first_image[0]
+            first_image[0] = False
+            if any(start <= match.start() < end for start, end in pictures) or re.search(r"\bsrcset\s*=", tag, re.I):
+                return tag
+            src = re.search(r"""\bsrc\s*=\s*(["'])(.*?)\1""", tag, re.IGNORECASE | re.DOTALL)
+            target = resolve(src.group(2), base_dir, self.site_dir) if src else None
+            suffix = posixpath.splitext(target[0])[1].lower() if target else ""
+            image = self.publish_image(target[0]) if suffix in OPTIMIZED_SUFFIXES and self.formats else None
+            if image is None:
+                return tag
+            fallback, width, variants = image
+            tag = tag[:src.start(2)] + relative(fallback) + tag[src.end(2):]
+            if lazy and not re.search(r"\bloading\s*=", tag, re.I):
+                tag = re.sub(r"^<img\b", '<img loading="lazy" decoding="async"', tag, flags=re.I)
+            sizes = f"(max-width: {width}px) 100vw, {width}px"
+            sources = "".join(
+                f'<source type="image/{fmt}" srcset="{", ".join(f"{relative(name)} {w}w" for w, name in variants[fmt])}" '
+                f'sizes="{sizes}">'
+                for fmt in self.formats
+            )
+            return f"<picture>{sources}{tag}</picture>"
+
+        def attribute(match):
+            rewritten = asset(match.group(3))
+            return match.group(0) if rewritten is None else f"{match.group(1)}{match.group(2)}{rewritten}{match.group(2)}"
+
+        def srcset(match):
+            candidates = []
+            for candidate in match.group(3).split(","):
+                fields = candidate.split()
+                if fields:
+                    fields[0] = asset(fields[0]) or fields[0]
+                candidates.append(" ".join(fields))
+            return f"{match.group(1)}{match.group(2)}{', '.join(candidates)}{match.group(2)}"
+
+        def css_url(match):
+            rewritten = asset(match.group(2))
+            return match.group(0) if rewritten is None else f"url({match.group(1)}{rewritten}{match.group(1)})"
+
+        text = IMG_PATTERN.sub(picture, text)
+        text = ATTRIBUTE_PATTERN.sub(attribute, text)
+        text = SRCSET_PATTERN.sub(srcset, text)
+        return CSS_URL_PATTERN.sub(css_url, text)
+
+    def run(self):
+        """
+        Builds the whole site. Files no page or stylesheet references (e.g.
+        loaded from scripts) are copied to their original paths. Returns a
+        summary of the build.
+        """
+        shutil.rmtree(self.out_dir, ignore_errors=True)
+        os.makedirs(os.path.join(self.out_dir, STATIC_DIR))
+        pages = html_pages(self.site_dir)
+        for page in pages:
+            out_path = os.path.join(self.out_dir, page)
+            os.makedirs(os.path.dirname(out_path), exist_ok=True)
+            write_text(out_path, self.rewrite_html(page, read_text(os.path.join(self.site_dir, page))))
+
+        copied = 0
+        for dirpath, _, filenames in os.walk(self.site_dir):
+            for filename in filenames:
+                path = os.path.relpath(os.path.join(dirpath, filename), self.site_dir).replace(os.sep, "/")
+                if path in self.published or path in pages or filename.lower().endswith(SOURCE_SUFFIXES):
+                    continue
+                os.makedirs(os.path.join(self.out_dir, os.path.dirname(path)), exist_ok=True)
+                shutil.copy2(os.path.join(dirpath, filename), os.path.join(self.out_dir, path))
+                copied += 1
+
+        with open(os.path.join(self.out_dir, MANIFEST_FILE), 'w') as f:
+            json.dump(self.published, f, indent=2, sort_keys=True)
+        static_dir = os.path.join(self.out_dir, STATIC_DIR)
+        return {
+            "pages": len(pages),
+            "assets": len(self.published),
+            "static_files": len(os.listdir(static_dir)),
+            "input_bytes": sum(os.path.getsize(os.path.join(self.site_dir, path)) for path in self.published),
+            "static_bytes": sum(os.path.getsize(os.path.join(static_dir, name)) for name in os.listdir(static_dir)),
+            "copied_unreferenced": copied,
+            "image_formats": self.formats,
+        }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build website/ with content-hashed, deduplicated and recompressed assets.")
+    parser.add_argument("--site", default=SITE_DIR)
+    parser.add_argument("--out", default=OUT_DIR)
+    parser.add_argument("--no-images", action="store_true", help="Copy images unchanged instead of recompressing them")
+    parser.add_argument("--report", action="store_true", help="Publish the page_weight table (sitebuild/weight.py) after building")
+    parser.add_argument("--local", action="store_true", help="Write page_weight as Parquet for the DuckDB backend")
+    parser.add_argument("--property", help="GA4 property key from the registry (database/properties.py)")
+    args = parser.parse_args()
+
+    build = SiteBuild(args.site, args.out, formats=[] if args.no_images else None)
+    summary = build.run()
+    print(f"Built {summary['pages']} pages: {summary['assets']} referenced assets "
+          f"({summary['input_bytes']:,} bytes) -> {summary['static_files']} static files "
+          f"({summary['static_bytes']:,} bytes), image formats: {', '.join(summary['image_formats']) or 'none'}")
+
+    if args.report:
+        from database.properties import get_property
+        from sitebuild.weight import publish_report
+
+        prop = get_property(args.property)
+        df = publish_report(args.site, args.out, local=args.local, dataset=prop.dataset, parquet_dir=prop.parquet_dir)
+        print(f"Published page_weight for {len(df)} pages")
@@ -0,0 +1,70 @@
+import io
+
+# --- Image recompression ---
+# Raster images are re-encoded as WebP (and AVIF when Pillow was built with
+# it) at a few responsive widths, plus a recompressed fallback in the
+# original format for browsers without either. Pillow is only needed here;
+# without it images are copied unchanged.
+RESPONSIVE_WIDTHS = (480, 960, 1600)
+OPTIMIZED_SUFFIXES = (".jpg", ".jpeg", ".png")
+WEBP_QUALITY = 80
+AVIF_QUALITY = 55
+JPEG_QUALITY = 82
+
+
+def image_support():
+    """Formats this Pillow can write, in the order <picture> should offer them; empty without Pillow."""
+    try:
+        from PIL import features
+    except ImportError:
+        return []
+    return [fmt for fmt in ("avif", "webp") if features.check(fmt)]
+
+
+def _encode(image, fmt):
+    out = io.BytesIO()
+    if fmt == "avif":
+        image.save(out, "AVIF", quality=AVIF_QUALITY)
+    elif fmt == "webp":
+        image.save(out, "WEBP", quality=WEBP_QUALITY, method=6)
+    elif fmt == "jpeg":
+        image.save(out, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+    else:
+        image.save(out, "PNG", optimize=True)
+    return out.getvalue()
+
+
+def optimize_image(data, suffix, formats):
+    """
+    Re-encodes one image. Returns (fallback bytes, width, {format: [(width, bytes)]})
+    with one variant per RESPONSIVE_WIDTHS entry narrower than the image,
+    plus the full width. The fallback keeps the original format and bytes
+    unless re-encoding makes it smaller. Returns None for images Pillow
+    cannot read.
+    """
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    try:
+        image = Image.open(io.BytesIO(data))
+        image.load()
+    except (UnidentifiedImageError, OSError):
+        return None
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "transparency" in image.info or image.mode in ("LA", "PA") else "RGB")
+
+    fallback_format = "png" if suffix == ".png" else "jpeg"
+    fallback_image = image.convert("RGB") if fallback_format == "jpeg" else image
+    fallback = _encode(fallback_image, fallback_format)
+    if len(fallback) >= len(data):
+        fallback = data
+
+    widths = [w for w in RESPONSIVE_WIDTHS if w < image.width] + [image.width]
+    variants = {fmt: [] for fmt in formats}
+    for width in widths:
+        resized = image if width == image.width else image.resize(
+            (width, max(1, round(image.height * width / image.width))), Image.LANCZOS
+        )
+        for fmt in formats:
+            variants[fmt].append((width, _encode(resized, fmt)))
+    return fallback, image.width, variants
@@ -0,0 +1,203 @@
+import os
+import re
+import gzip
+import datetime
+import posixpath
+import pandas as pd
+
+from sitebuild.build import (
+    CSS_IMPORT_PATTERN, CSS_URL_PATTERN, PICTURE_PATTERN, SITE_URL, SRCSET_PATTERN, html_pages, read_text, resolve,
+)
+from database.backend import DATASET, PARQUET_DIR
+
+# --- Page weight report ---
+# Bytes each page transfers and how much of that blocks first render. Computed
+# for the source tree and the built tree and published as page_weight, keyed
+# by page_url like daily_page_rollup, so the dashboard can show it next to
+# each landing page's bounce rate (phase_4_page_weight.sql).
+PAGE_WEIGHT_TABLE = "page_weight"
+# Text types are served compressed; count their gzip size
+COMPRESSIBLE_SUFFIXES = (".html", ".htm", ".css", ".js", ".svg", ".json", ".txt", ".xml", ".ttf", ".eot")
+# The one font file a browser fetches from an @font-face src list
+FONT_PREFERENCE = (".woff2", ".woff", ".ttf", ".otf", ".svg", ".eot")
+TAG_PATTERN = re.compile(r"<(link|script|img|video|audio)\b([^>]*)>", re.IGNORECASE)
+FONT_FACE_PATTERN = re.compile(r"@font-face\s*\{(.*?)\}", re.IGNORECASE | re.DOTALL)
+CANONICAL_PATTERN = re.compile(r"""<link\b[^>]*\brel\s*=\s*["']canonical["'][^>]*>""", re.IGNORECASE)
+URL_SUFFIX_PATTERN = re.compile(r"[?#].*$")
+
+
+def _attribute(attributes, name):
+    match = re.search(rf"""\b{name}\s*=\s*(["'])(.*?)\1""", attributes, re.IGNORECASE | re.DOTALL)
+    return match.group(2) if match else None
+
+
+class TreeWeights:
+    """Transfer sizes of the files under one site tree, each measured once."""
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self._sizes = {}
+        self._css = {}
+
+    def size(self, path):
+        if path not in self._sizes:
+            full = os.path.join(self.root, path)
+            if path.lower().endswith(COMPRESSIBLE_SUFFIXES):
+                with open(full, 'rb') as f:
+                    self._sizes[path] = len(gzip.compress(f.read(), compresslevel=6))
+            else:
+                self._sizes[path] = os.path.getsize(full)
+        return self._sizes[path]
+
+    def stylesheet(self, path, seen=None):
+        """(imported stylesheets, fonts, other url() files) one stylesheet pulls in, recursively."""
+        seen = seen if seen is not None else set()
+        if path in self._css:
+            return self._css[path]
+        seen.add(path)
+        text = read_text(os.path.join(self.root, path))
+        base_dir = posixpath.dirname(path)
+        imports, fonts, others = set(), set(), set()
+        for match in CSS_IMPORT_PATTERN.finditer(text):
+            target = resolve(match.group(3), base_dir, self.root)
+            if target and target[0] not in seen:
+                imports.add(target[0])
+        font_urls = set()
+        for block in FONT_FACE_PATTERN.finditer(text):
+            candidates = [resolve(m.group(2), base_dir, self.root) for m in CSS_URL_PATTERN.finditer(block.group(1))]
+            candidates = [c[0] for c in candidates if c]
+            font_urls.update(candidates)
+            for suffix in FONT_PREFERENCE:
+                preferred = [c for c in candidates if c.lower().endswith(suffix)]
+                if preferred:
+                    fonts.add(preferred[0])
+                    break
+        for match in CSS_URL_PATTERN.finditer(text):
+            target = resolve(match.group(2), base_dir, self.root)
+            if target and target[0] not in font_urls:
+                (imports if target[0].lower().endswith(".css") else others).add(target[0])
+        for imported in list(imports):
+            if imported not in seen:
+                more = self.stylesheet(imported, seen)
+                imports |= more[0]
+                fonts |= more[1]
+                others |= more[2]
+        self._css[path] = (imports, fonts, others)
+        return self._css[path]
+
+    def page(self, page):
+        """
+        Weight of one page:
+        - critical_path_bytes: the HTML plus render-blocking stylesheets (and
+          their imports) and head scripts without async/defer
+        - transfer_bytes: everything the page loads; for a <picture>, the
+          widest candidate of its first source; media only when preloaded
+        """
+        text = read_text(os.path.join(self.root, page))
+        base_dir = posixpath.dirname(page)
+        head_end = text.lower().find("</head>")
+        head_end = len(text) if head_end < 0 else head_end
+
+        def local(ref):
+            target = resolve(ref, base_dir, self.root) if ref else None
+            return target[0] if target else None
+
+        critical, resources, images = set(), set(), set()
+        in_picture = set()
+        for match in PICTURE_PATTERN.finditer(text):
+            source = SRCSET_PATTERN.search(match.group(0))
+            in_picture.add(match.span())
+            if source:
+                widest = max(
+                    (c.split() for c in source.group(3).split(",") if c.split()),
+                    key=lambda fields: int(fields[1].rstrip("w")) if len(fields) > 1 and fields[1].endswith("w") else 0,
+                )
+                path = local(widest[0])
+                if path:
+                    images.add(path)
+
+        for match in TAG_PATTERN.finditer(text):
+            tag, attributes = match.group(1).lower(), match.group(2)
+            in_head = match.start() < head_end
+            if tag == "link":
+                rel = (_attribute(attributes, "rel") or "").lower()
+                path = local(_attribute(attributes, "href"))
+                if not path or not ({"stylesheet", "icon", "preload"} & set(rel.split())):
+                    continue
+                resources.add(path)
+                if "stylesheet" in rel and (_attribute(attributes, "media") or "all").lower() != "print":
+                    imports, fonts, others = self.stylesheet(path)
+                    critical |= {path} | imports
+                    resources |= imports | fonts | others
+            elif tag == "script":
+                path = local(_attribute(attributes, "src"))
+                if not path:
+                    continue
+                resources.add(path)
+                blocking = not re.search(r"\b(async|defer)\b", attributes, re.I) \
+                    and (_attribute(attributes, "type") or "").lower() != "module"
+                if in_head and blocking:
+                    critical.add(path)
+            elif tag == "img":
+                if any(start <= match.start() < end for start, end in in_picture):
+                    continue
+                path = local(_attribute(attributes, "src"))
+                if path:
+                    images.add(path)
+            elif tag in ("video", "audio"):
+                path = local(_attribute(attributes, "src"))
+                if path and ((_attribute(attributes, "preload") or "").lower() == "auto" or re.search(r"\bautoplay\b", attributes, re.I)):
+                    resources.add(path)
+
+        resources |= images
+        html_bytes = self.size(page)
+        return {
+            "requests": 1 + len(resources),
+            "html_bytes": html_bytes,
+            "critical_path_bytes": html_bytes + sum(self.size(path) for path in critical),
+            "transfer_bytes": html_bytes + sum(self.size(path) for path in resources),
+            "image_bytes": sum(self.size(path) for path in images),
+        }
+
+
+def page_url(page, text):
+    """The URL GA4 records for a page: its canonical link, else its path on SITE_URL."""
+    match = CANONICAL_PATTERN.search(text)
+    href = _attribute(match.group(0), "href") if match else None
+    if not href:
+        path = page[:-len("index.html")] if posixpath.basename(page) == "index.html" else page
+        href = f"{SITE_URL.rstrip('/')}/{path}"
+    return URL_SUFFIX_PATTERN.sub("", href.strip())
+
+
+def page_weight_report(site_dir, out_dir):
+    """
+    One row per page with its weight in the built tree (out_dir) and, as
+    *_before, in the source tree (site_dir).
+    """
+    before, after = TreeWeights(site_dir), TreeWeights(out_dir)
+    rows = []
+    for page in html_pages(out_dir):
+        row = {"page_url": page_url(page, read_text(os.path.join(site_dir, page))), "page_path": page}
+        row.update(after.page(page))
+        if os.path.exists(os.path.join(site_dir, page)):
+            weights = before.page(page)
+            row.update({
+                "transfer_bytes_before": weights["transfer_bytes"],
+                "critical_path_bytes_before": weights["critical_path_bytes"],
+            })
+        rows.append(row)
+    df = pd.DataFrame(rows)
+    # Several files can claim the same canonical URL; keep the heaviest so none is understated
+    df = df.sort_values("transfer_bytes", ascending=False).drop_duplicates("page_url").reset_index(drop=True)
+    df["built_at"] = pd.Timestamp(datetime.datetime.now(datetime.timezone.utc))
+    return df
+
+
+def publish_report(site_dir, out_dir, local=False, dataset=DATASET, parquet_dir=PARQUET_DIR):
+    """Computes the report and replaces the page_weight table (BigQuery, or Parquet with local=True)."""
+    from database.scoring import write_table
+
+    df = page_weight_report(site_dir, out_dir)
+    write_table(df, PAGE_WEIGHT_TABLE, local=local, dataset=dataset, parquet_dir=parquet_dir)
+    return df
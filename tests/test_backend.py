@@ -0,0 +1,74 @@
+import datetime
+
+import pandas as pd
+
+from database.backend import DATASET, DuckDBBackend, translate_to_duckdb
+
+
+def test_table_references_and_parameters():
+    sql = translate_to_duckdb(
+        f"SELECT * FROM `my-project.{DATASET}.events_*` "
+        "WHERE _TABLE_SUFFIX BETWEEN @start_suffix AND @end_suffix AND event_name IN UNNEST(@event_names)"
+    )
+    assert sql == (
+        f'SELECT * FROM {DATASET}."events_*" '
+        "WHERE _TABLE_SUFFIX BETWEEN $start_suffix AND $end_suffix AND list_contains($event_names, event_name)"
+    )
+
+
+def test_nested_function_calls():
+    assert translate_to_duckdb("SAFE_DIVIDE(COUNTIF(is_bounce = 1), COUNT(*))") \
+        == "(count_if(is_bounce = 1) / NULLIF(COUNT(*), 0))"
+    assert translate_to_duckdb("TIMESTAMP_DIFF(MAX(event_datetime), MIN(event_datetime), SECOND)") \
+        == "date_diff('second', MIN(event_datetime), MAX(event_datetime))"
+
+
+def test_dates():
+    assert translate_to_duckdb("DATE(event_datetime) BETWEEN DATE_SUB(@start_date, INTERVAL 1 DAY) AND CURRENT_DATE()") \
+        == "CAST(event_datetime AS DATE) BETWEEN ($start_date - INTERVAL 1 DAY) AND current_date"
+    assert translate_to_duckdb("PARSE_DATE('%Y%m%d', event_date)") == "CAST(strptime(event_date, '%Y%m%d') AS DATE)"
+    assert translate_to_duckdb("FORMAT_DATE('%Y%m%d', @start_date)") == "strftime($start_date, '%Y%m%d')"
+
+
+def test_duckdb_backend_runs_bigquery_sql_on_parquet(tmp_path):
+    table_dir = tmp_path / "cleaned_events"
+    table_dir.mkdir()
+    pd.DataFrame({
+        "event_datetime": pd.to_datetime(["2024-01-01 10:00", "2024-01-02 11:00", "2024-01-03 12:00"], utc=True),
+        "event_name": ["page_view", "scroll", "page_view"],
+    }).to_parquet(table_dir / "part-0.parquet")
+    backend = DuckDBBackend(str(tmp_path))
+    assert "cleaned_events" in backend.tables
+    df = backend.query(
+        f"SELECT COUNTIF(event_name = 'page_view') AS page_views FROM `{DATASET}.cleaned_events` "
+        "WHERE DATE(event_datetime) BETWEEN @start_date AND @end_date",
+        {"start_date": datetime.date(2024, 1, 1), "end_date": datetime.date(2024, 1, 2)},
+    )
+    assert int(df["page_views"].iloc[0]) == 1
+
+
+def test_hll_emulation_merges_like_bigquery():
+    # Per-day rollup sketches merged over the range count each user once
+    import duckdb
+
+    sql = translate_to_duckdb(
+        "SELECT HLL_COUNT.MERGE(users) AS users FROM ("
+        "  SELECT day, HLL_COUNT.INIT(user_id) AS users"
+        "  FROM (VALUES (1, 'a'), (1, 'b'), (2, 'b'), (2, 'c'), (2, 'c')) AS t(day, user_id)"
+        "  GROUP BY day"
+        ")"
+    )
+    assert duckdb.sql(sql).fetchone() == (3,)
+    assert translate_to_duckdb("HLL_COUNT.EXTRACT(users)") == "len(users)"
+
+
+def test_qualify_tables_points_at_another_dataset():
+    from database.backend import qualify_tables
+
+    sql = f"FROM {DATASET}.cleaned_events JOIN `my-project.{DATASET}.sessions` USING (session_id)"
+    assert qualify_tables(sql, "analytics_999") \
+        == "FROM analytics_999.cleaned_events JOIN `analytics_999.sessions` USING (session_id)"
+    assert qualify_tables(sql, DATASET) == sql
+    # Names that merely contain the dataset are left alone
+    other = f"SELECT x_{DATASET}.t, other.{DATASET}_copy FROM t"
+    assert qualify_tables(other, "analytics_999") == other
@@ -0,0 +1,84 @@
+import json
+
+import pytest
+
+from database.collector import MAX_EVENTS_PER_REQUEST, parse_events
+
+CHROME = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0 Safari/537.36"
+RECEIVED = 1_700_000_000_000_000  # micros
+
+
+def body(events, sent_ms=RECEIVED // 1000):
+    return json.dumps({"sent": sent_ms, "events": events})
+
+
+def event(**fields):
+    return {"name": "page_view", "ts": RECEIVED // 1000 - 500, "cid": "c1", "sid": 42,
+            "url": "https://example.com/c/intro", **fields}
+
+
+def test_columns_for_valid_events():
+    columns = parse_events(body([event(title="Intro", engagement_time_msec=1200)]), CHROME, RECEIVED)
+    assert columns["event_timestamp"] == [RECEIVED - 500_000]
+    assert columns["session_id"] == ["c1.42"]
+    assert columns["user_pseudo_id"] == ["c1"]
+    assert (columns["device_category"], columns["browser"]) == (["desktop"], ["Chrome"])
+    assert (columns["source"], columns["medium"]) == (["(direct)"], ["(none)"])
+    assert columns["page_title"] == ["Intro"]
+    assert columns["engagement_time_msec"] == [1200]
+
+
+def test_client_clock_offset_is_removed():
+    # The client clock runs 60 s fast: sent and ts are both shifted by it
+    skew_ms = 60_000
+    columns = parse_events(body([event(ts=RECEIVED // 1000 - 500 + skew_ms)], RECEIVED // 1000 + skew_ms),
+                           CHROME, RECEIVED)
+    assert columns["event_timestamp"] == [RECEIVED - 500_000]
+
+
+def test_implausible_clock_uses_receive_time():
+    columns = parse_events(body([event(ts=0)], sent_ms=1), CHROME, RECEIVED)
+    assert columns["event_timestamp"] == [RECEIVED]
+
+
+def test_future_events_are_capped_at_receive_time():
+    columns = parse_events(body([event(ts=RECEIVED // 1000 + 5_000)]), CHROME, RECEIVED)
+    assert columns["event_timestamp"] == [RECEIVED]
+
+
+def test_invalid_events_are_skipped():
+    columns = parse_events(body([
+        event(name="purchase"),
+        event(cid=None),
+        event(url=7),
+        "not an event",
+        event(engagement_time_msec="12"),
+    ]), CHROME, RECEIVED)
+    assert len(columns["event_name"]) == 1
+    assert columns["engagement_time_msec"] == [None]
+
+
+def test_traffic_source_from_utm_and_referrer():
+    columns = parse_events(body([
+        event(url="https://example.com/?utm_source=newsletter&utm_medium=email"),
+        event(ref="https://www.reddit.com/r/C_Programming"),
+        event(ref="https://example.com/c/arrays"),
+    ]), CHROME, RECEIVED)
+    assert list(zip(columns["source"], columns["medium"])) == [
+        ("newsletter", "email"), ("reddit.com", "referral"), ("(direct)", "(none)"),
+    ]
+
+
+@pytest.mark.parametrize("payload", [
+    json.dumps({"events": []}),
+    json.dumps([event()]),
+    json.dumps({"events": [event()] * (MAX_EVENTS_PER_REQUEST + 1)}),
+])
+def test_malformed_bodies_raise(payload):
+    with pytest.raises(ValueError):
+        parse_events(payload, CHROME, RECEIVED)
+
+
+def test_invalid_json_raises_value_error():
+    with pytest.raises(ValueError):
+        parse_events("{not json", CHROME, RECEIVED)
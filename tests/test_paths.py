@@ -0,0 +1,123 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from database.paths import ENTRANCE, EXIT, PATH_SEPARATOR, analyze_paths
+
+PAGES = ["/", "/c/intro", "/c/pointers", "/c/arrays", "/c/structs", "/about"]
+FUNNEL = ["/c/intro", "/c/pointers", "/c/arrays"]
+
+
+def make_events(num_sessions=300, seed=7):
+    """Page views sorted by (session_id, time), with reloads of the same page mixed in."""
+    rng = np.random.default_rng(seed)
+    session_ids, urls = [], []
+    for session in range(num_sessions):
+        length = rng.integers(1, 9)
+        pages = rng.choice(PAGES, size=length, p=[0.1, 0.3, 0.25, 0.2, 0.1, 0.05])
+        session_ids += [f"s{session:05d}"] * length
+        urls += list(pages)
+    return pa.table({"session_id": session_ids, "page_url": urls})
+
+
+def reference(table, funnel_steps, path_steps=4):
+    """The same statistics computed session by session with pandas."""
+    df = table.to_pandas()
+    transitions, paths = {}, {}
+    funnel = [0] * len(funnel_steps)
+    for _, pages in df.groupby("session_id", sort=False)["page_url"]:
+        pages = list(pages)
+        # Funnel: first matching view after the previous step, repeats included
+        position = -1
+        for step, url in enumerate(funnel_steps):
+            matches = [i for i, page in enumerate(pages) if page == url and i > position]
+            if not matches:
+                break
+            position = matches[0]
+            funnel[step] += 1
+        collapsed = [page for i, page in enumerate(pages) if i == 0 or page != pages[i - 1]]
+        for pair in zip([ENTRANCE] + collapsed, collapsed + [EXIT]):
+            transitions[pair] = transitions.get(pair, 0) + 1
+        path = collapsed[:path_steps] + ([EXIT] if len(collapsed) <= path_steps else [])
+        label = PATH_SEPARATOR.join(path)
+        paths[label] = paths.get(label, 0) + 1
+    return {
+        "sessions": df["session_id"].nunique(),
+        "page_views": len(df),
+        "transitions": transitions,
+        "paths": paths,
+        "funnel": funnel,
+    }
+
+
+def check_against_reference(accumulator, expected):
+    assert accumulator.sessions == expected["sessions"]
+    assert accumulator.page_views == expected["page_views"]
+    df_transitions = accumulator.transitions()
+    assert dict(zip(zip(df_transitions["from_page"], df_transitions["to_page"]), df_transitions["transitions"])) \
+        == expected["transitions"]
+    df_paths = accumulator.top_paths(n=len(expected["paths"]) + 1)
+    assert dict(zip(df_paths["path"], df_paths["sessions"])) == expected["paths"]
+    assert (df_paths["error"] == 0).all()
+    assert accumulator.funnel()["sessions"].tolist() == expected["funnel"]
+
+
+@pytest.mark.parametrize("batch_rows", [1, 2, 7, 64, 100_000])
+def test_matches_pandas_reference_for_any_batch_size(batch_rows):
+    table = make_events()
+    accumulator = analyze_paths(table.to_batches(max_chunksize=batch_rows), FUNNEL)
+    check_against_reference(accumulator, reference(table, FUNNEL))
+
+
+def test_session_split_across_batches_is_counted_once():
+    table = pa.table({
+        "session_id": ["a", "a", "a", "b", "b"],
+        "page_url": ["/c/intro", "/c/intro", "/c/pointers", "/c/intro", "/about"],
+    })
+    accumulator = analyze_paths([table.slice(0, 1), table.slice(1, 1), table.slice(2, 2), table.slice(4)], FUNNEL)
+    assert accumulator.sessions == 2
+    assert accumulator.page_views == 5
+    paths = accumulator.top_paths()
+    assert dict(zip(paths["path"], paths["sessions"])) == {
+        PATH_SEPARATOR.join(["/c/intro", "/c/pointers", EXIT]): 1,
+        PATH_SEPARATOR.join(["/c/intro", "/about", EXIT]): 1,
+    }
+    assert accumulator.funnel()["sessions"].tolist() == [2, 1, 0]
+
+
+def test_empty_batches_between_sessions():
+    table = make_events(num_sessions=20)
+    empty = table.slice(0, 0)
+    batches = [empty]
+    for batch in table.to_batches(max_chunksize=5):
+        batches += [batch, empty]
+    check_against_reference(analyze_paths(batches, FUNNEL), reference(table, FUNNEL))
+
+
+def test_empty_input():
+    accumulator = analyze_paths([], FUNNEL)
+    assert accumulator.sessions == 0
+    assert accumulator.transitions().empty
+    assert accumulator.top_paths().empty
+    assert accumulator.funnel()["sessions"].tolist() == [0, 0, 0]
+    assert analyze_paths([]).funnel().empty
+
+
+def test_funnel_needs_steps_in_order():
+    table = pa.table({
+        "session_id": ["a", "a", "b", "b", "b"],
+        "page_url": ["/c/pointers", "/c/intro", "/c/intro", "/about", "/c/pointers"],
+    })
+    df = analyze_paths([table], FUNNEL).funnel()
+    assert df["sessions"].tolist() == [2, 1, 0]
+    assert df["drop_off"].tolist() == [0, 1, 1]
+    assert df["pct_of_first"].tolist() == [100.0, 50.0, 0.0]
+
+
+def test_transition_shares_sum_to_one_per_page():
+    df = analyze_paths([make_events()]).transitions()
+    shares = df.groupby("from_page")["share"].sum()
+    assert np.allclose(shares, 1.0)
+    assert EXIT not in set(df["from_page"])
+    assert ENTRANCE not in set(df["to_page"])
@@ -0,0 +1,81 @@
+import pytest
+
+from database import backend as backend_module
+from database.backend import BigQueryBackend
+from database.properties import Property, QuotaExceeded
+
+GB = 1024 ** 3
+
+
+def test_reserve_caps_concurrent_jobs_by_the_remaining_quota():
+    prop = Property("site", daily_bytes_quota=25 * GB)
+    assert [prop.reserve(10 * GB) for _ in range(3)] == [10 * GB, 10 * GB, 5 * GB]
+    assert prop.bytes_billed_today == 25 * GB
+    with pytest.raises(QuotaExceeded):
+        prop.reserve(10 * GB)
+
+
+def test_settle_swaps_the_reservation_for_the_billed_bytes():
+    prop = Property("site", daily_bytes_quota=25 * GB)
+    cap = prop.reserve(10 * GB)
+    prop.settle(cap, 2 * GB)
+    assert prop.bytes_billed_today == 2 * GB
+    assert prop.reserve(30 * GB) == 23 * GB
+
+
+def test_no_quota_reserves_the_budget():
+    prop = Property("site")
+    assert prop.reserve(10 * GB) == 10 * GB
+    prop.settle(10 * GB, 3 * GB)
+    assert prop.bytes_billed_today == 3 * GB
+
+
+class FakeJob:
+    project = "project"
+
+    def __init__(self, job_config, billed, fail=False):
+        self.cap = job_config.maximum_bytes_billed
+        self.billed, self.fail = billed, fail
+        self.total_bytes_billed = None
+
+    def result(self, **kwargs):
+        if self.fail:
+            raise RuntimeError("bytesBilledLimitExceeded")
+        self.total_bytes_billed = self.billed
+        return self
+
+    def cancel(self):
+        pass
+
+
+class FakeClient:
+    def __init__(self, billed, fail=False):
+        self.billed, self.fail = billed, fail
+
+    def query(self, sql, job_config=None):
+        return FakeJob(job_config, self.billed, self.fail)
+
+
+def quota_backend(monkeypatch, quota, billed, fail=False):
+    prop = Property("site", daily_bytes_quota=quota)
+    backend = BigQueryBackend(prop)
+    monkeypatch.setattr(backend, "_client", lambda: FakeClient(billed, fail))
+    monkeypatch.setattr(backend_module, "record_job", lambda job: None)
+    return prop, backend
+
+
+def test_backend_settles_finished_failed_and_cancelled_jobs(monkeypatch):
+    monkeypatch.setattr(backend_module, "MAX_BYTES_BILLED", 10 * GB)
+    prop, backend = quota_backend(monkeypatch, 25 * GB, billed=GB)
+    finished, never_waited = backend.start("SELECT 1"), backend.start("SELECT 1")
+    assert (finished.cap, never_waited.cap) == (10 * GB, 10 * GB)
+    backend.wait_rows(finished)
+    assert prop.bytes_billed_today == 11 * GB
+    backend.cancel(never_waited)
+    assert prop.bytes_billed_today == GB
+
+    backend._client = lambda: FakeClient(GB, fail=True)
+    with pytest.raises(RuntimeError):
+        backend.wait_rows(backend.start("SELECT 1"))
+    assert prop.bytes_billed_today == GB
+    assert backend._reserved == {}
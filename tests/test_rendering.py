@@ -0,0 +1,71 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+
+from dashboard.rendering import lttb, page_slice, pick_granularity, prepare_trends, top_n_with_other
+
+
+def test_granularity_follows_range_width():
+    start = datetime.date(2024, 1, 1)
+    assert pick_granularity(start, start + datetime.timedelta(days=2)) == "hour"
+    assert pick_granularity(start, start + datetime.timedelta(days=30)) == "day"
+    assert pick_granularity(start, start + datetime.timedelta(days=365)) == "week"
+    assert pick_granularity(start, start + datetime.timedelta(days=1000)) == "month"
+
+
+def test_lttb_keeps_endpoints_and_peaks():
+    x = pd.date_range("2024-01-01", periods=10_000, freq="min")
+    y = np.sin(np.linspace(0, 20, len(x)))
+    y[4_321] = 50  # a spike downsampling must not drop
+    df = lttb(pd.DataFrame({"x": x, "y": y}), "x", "y", threshold=200)
+    assert len(df) == 200
+    assert df["x"].iloc[0] == x[0] and df["x"].iloc[-1] == x[-1]
+    assert df["y"].max() == 50
+    assert df["x"].is_monotonic_increasing
+
+
+def test_lttb_leaves_short_series_alone():
+    df = pd.DataFrame({"x": range(10), "y": range(10)})
+    assert lttb(df, "x", "y", threshold=10) is df
+
+
+def test_top_n_with_other_sums_the_tail():
+    df = pd.DataFrame({"browser": list("abcdef"), "sessions": [1, 50, 3, 40, 2, 30], "page_views": [1, 1, 1, 1, 1, 1]})
+    result = top_n_with_other(df, "browser", n=3, other_label="Other")
+    assert result["browser"].tolist() == ["b", "d", "f", "Other"]
+    assert result["sessions"].tolist() == [50, 40, 30, 6]
+    assert result["page_views"].sum() == 6
+    # One row past n is kept as is rather than becoming "Other"
+    assert len(top_n_with_other(df.head(4), "browser", n=3)) == 4
+
+
+def test_prepare_trends_rolls_days_up_to_weeks():
+    df = pd.DataFrame({
+        "event_date": pd.date_range("2024-01-01", periods=14).date,  # Monday to Sunday, twice
+        "daily_sessions": 1,
+        "daily_users": [1] * 13 + [None],
+        "daily_page_views": 2,
+    })
+    daily = prepare_trends(df, "day")
+    assert list(daily.columns) == ["period", "sessions", "users", "page_views"]
+    assert daily["users"].iloc[-1] == 0
+    weekly = prepare_trends(df, "week")
+    assert weekly["period"].tolist() == [pd.Timestamp("2024-01-01"), pd.Timestamp("2024-01-08")]
+    assert weekly["sessions"].tolist() == [7, 7]
+    assert weekly["page_views"].tolist() == [14, 14]
+
+
+def test_prepare_trends_plots_utc_hours_as_naive_times():
+    df = pd.DataFrame({
+        "event_hour": pd.to_datetime(["2024-01-01 01:00", "2024-01-01 00:00"], utc=True),
+        "daily_sessions": [2, 1], "daily_users": [2, 1], "daily_page_views": [4, 2],
+    })
+    result = prepare_trends(df, "hour")
+    assert result["period"].dt.tz is None
+    assert result["sessions"].tolist() == [1, 2]
+
+
+def test_page_slice():
+    df = pd.DataFrame({"n": range(120)})
+    assert page_slice(df, 3, page_size=50)["n"].tolist() == list(range(100, 120))
@@ -0,0 +1,95 @@
+import datetime
+
+import pandas as pd
+
+from database import result_cache
+from database.result_cache import ResultCache, is_closed
+
+OLD_DAY = datetime.date(2020, 1, 1)
+
+
+def frame(values):
+    return pd.DataFrame({"value": values})
+
+
+def test_put_and_get(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    assert cache.get("kpis") is None
+    cache.put("kpis", frame([1, 2]))
+    assert cache.get("kpis")["value"].tolist() == [1, 2]
+    # A new instance reads the same entries from index.json
+    assert ResultCache(str(tmp_path)).get("kpis")["value"].tolist() == [1, 2]
+
+
+def test_entries_expire_unless_immutable(tmp_path, monkeypatch):
+    cache = ResultCache(str(tmp_path), ttl=60)
+    cache.put("recent", frame([1]))
+    cache.put("closed", frame([2]), immutable=True)
+    now = result_cache.time.time()
+    monkeypatch.setattr(result_cache.time, "time", lambda: now + 61)
+    assert cache.get("recent") is None
+    assert cache.get("closed")["value"].tolist() == [2]
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    cache.put("a", frame(list(range(100))))
+    cache.put("b", frame(list(range(100))))
+    cache.max_bytes = cache._index["b"]["bytes"] + 1
+    cache.put("c", frame(list(range(100))))
+    assert cache.get("a") is None and cache.get("b") is None
+    assert cache.get("c") is not None
+
+
+def test_get_or_fetch_fetches_once(tmp_path):
+    cache, calls = ResultCache(str(tmp_path)), []
+
+    def fetch():
+        calls.append(1)
+        return frame([3])
+
+    for _ in range(3):
+        assert cache.get_or_fetch("kpis", fetch)["value"].tolist() == [3]
+    assert len(calls) == 1
+
+
+def days(start, count):
+    return [start + datetime.timedelta(days=i) for i in range(count)]
+
+
+def test_get_range_fetches_only_missing_runs(tmp_path):
+    cache, calls = ResultCache(str(tmp_path)), []
+
+    def fetch(start, end):
+        calls.append((start, end))
+        return pd.DataFrame({"event_date": days(start, (end - start).days + 1), "sessions": 1})
+
+    first = cache.get_range("cube", OLD_DAY + datetime.timedelta(days=2), OLD_DAY + datetime.timedelta(days=3), fetch)
+    assert len(first) == 2
+    df = cache.get_range("cube", OLD_DAY, OLD_DAY + datetime.timedelta(days=5), fetch)
+    assert df["event_date"].tolist() == days(OLD_DAY, 6)
+    assert calls[1:] == [
+        (OLD_DAY, OLD_DAY + datetime.timedelta(days=1)),
+        (OLD_DAY + datetime.timedelta(days=4), OLD_DAY + datetime.timedelta(days=5)),
+    ]
+    # Closed days never expire
+    assert all(entry["immutable"] for entry in cache._index.values())
+
+
+def test_get_range_caches_days_without_rows(tmp_path):
+    cache, calls = ResultCache(str(tmp_path)), []
+
+    def fetch(start, end):
+        calls.append((start, end))
+        return pd.DataFrame({"event_date": [start], "sessions": [5]})
+
+    end = OLD_DAY + datetime.timedelta(days=2)
+    assert cache.get_range("cube", OLD_DAY, end, fetch)["sessions"].tolist() == [5]
+    assert cache.get_range("cube", OLD_DAY, end, fetch)["sessions"].tolist() == [5]
+    assert len(calls) == 1
+
+
+def test_recent_days_are_not_closed():
+    today = datetime.date.today()
+    assert not is_closed(today)
+    assert is_closed(today - datetime.timedelta(days=result_cache.CLOSED_AFTER_DAYS + 1))
@@ -0,0 +1,148 @@
+import threading
+import time
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+
+import pytest
+
+from database.scheduler import ConcurrencyGate, JobTracker, QueryScheduler
+
+
+class FakeBackend:
+    """Records the jobs it was asked to cancel; a cancelled job's waiters wake up."""
+
+    def __init__(self):
+        self.cancelled = []
+        self.cancel_event = threading.Event()
+
+    def cancel(self, job):
+        self.cancelled.append(job)
+        self.cancel_event.set()
+
+
+@pytest.fixture
+def executor():
+    pool = ThreadPoolExecutor(max_workers=4)
+    yield pool
+    pool.shutdown(wait=True)
+
+
+def test_tracker_cancel_cancels_tracked_jobs():
+    backend, tracker = FakeBackend(), JobTracker(timeout=None)
+    tracker.track(backend, "job-1")
+    tracker.track(backend, "job-2")
+    tracker.untrack("job-2")
+    tracker.cancel()
+    assert backend.cancelled == ["job-1"]
+    # Jobs started after the cancel are cancelled at once
+    with pytest.raises(CancelledError):
+        tracker.track(backend, "job-3")
+    assert backend.cancelled == ["job-1", "job-3"]
+
+
+def test_tracker_timeout_cancels_the_job():
+    backend, tracker = FakeBackend(), JobTracker(timeout=0.05)
+    tracker.track(backend, "slow")
+    assert backend.cancel_event.wait(2)
+    assert tracker.timed_out
+    assert backend.cancelled == ["slow"]
+
+
+def test_untracked_job_is_not_timed_out():
+    backend, tracker = FakeBackend(), JobTracker(timeout=0.05)
+    tracker.track(backend, "fast")
+    tracker.untrack("fast")
+    time.sleep(0.15)
+    assert not tracker.timed_out
+    assert backend.cancelled == []
+
+
+def test_submit_runs_a_key_once_per_generation(executor):
+    scheduler, release, calls = QueryScheduler(timeout=None, executor=executor), threading.Event(), []
+
+    def query(value, _tracker=None):
+        calls.append(value)
+        release.wait(2)
+        return value
+
+    first = scheduler.submit("kpis", query, 1)
+    assert scheduler.submit("kpis", query, 2) is first
+    release.set()
+    assert first.result(2) == 1
+    assert scheduler.submit("kpis", query, 3) is first
+    assert calls == [1]
+
+
+def test_failed_query_is_resubmitted(executor):
+    scheduler, attempts = QueryScheduler(timeout=None, executor=executor), []
+
+    def flaky(_tracker=None):
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("quota")
+        return "ok"
+
+    with pytest.raises(RuntimeError):
+        scheduler.submit("kpis", flaky).result(2)
+    assert scheduler.submit("kpis", flaky).result(2) == "ok"
+    assert len(attempts) == 2
+
+
+def test_reset_cancels_running_queries(executor):
+    scheduler, backend, started = QueryScheduler(timeout=None, executor=executor), FakeBackend(), threading.Event()
+    scheduler.reset("range-1")
+
+    def query(_tracker=None):
+        _tracker.track(backend, "job")
+        started.set()
+        backend.cancel_event.wait(2)
+        raise RuntimeError("job cancelled")
+
+    future = scheduler.submit("kpis", query)
+    assert started.wait(2)
+    scheduler.reset("range-2")
+    with pytest.raises(CancelledError):
+        future.result(2)
+    assert backend.cancelled == ["job"]
+    assert scheduler.status() == {}
+
+
+def test_timeout_is_reported_as_timeout_error(executor):
+    scheduler, backend = QueryScheduler(timeout=0.05, executor=executor), FakeBackend()
+
+    def query(_tracker=None):
+        _tracker.track(backend, "job")
+        backend.cancel_event.wait(2)
+        raise RuntimeError("job cancelled")
+
+    with pytest.raises(TimeoutError):
+        scheduler.submit("kpis", query).result(2)
+    assert scheduler.status() == {"kpis": "failed"}
+
+
+def test_gate_limits_concurrent_queries(executor):
+    gate, lock = ConcurrencyGate(2, executor=executor), threading.Lock()
+    running, peak = [0], [0]
+
+    def query():
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.02)
+        with lock:
+            running[0] -= 1
+
+    futures = [gate.submit(query) for _ in range(6)]
+    for future in futures:
+        future.result(2)
+    assert peak[0] == 2
+
+
+def test_gate_skips_queries_cancelled_while_queued(executor):
+    gate, release, ran = ConcurrencyGate(1, executor=executor), threading.Event(), []
+    blocker = gate.submit(release.wait, 2)
+    queued = gate.submit(ran.append, "queued")
+    assert queued.cancel()
+    release.set()
+    blocker.result(2)
+    gate.submit(lambda: None).result(2)
+    assert ran == []
@@ -0,0 +1,76 @@
+import datetime
+
+import pyarrow as pa
+
+from database.sessions import sessionize
+
+UTC = datetime.timezone.utc
+
+
+def events(rows):
+    """cleaned_events rows from (session_id, minutes since 2024-01-01, event_name, page_url) tuples."""
+    start = datetime.datetime(2024, 1, 1, tzinfo=UTC)
+    return pa.table({
+        "session_id": [row[0] for row in rows],
+        "user_pseudo_id": [row[0].split(".")[0] for row in rows],
+        "event_datetime": pa.array(
+            [start + datetime.timedelta(minutes=row[1]) for row in rows], pa.timestamp("us", tz="UTC"),
+        ),
+        "event_name": [row[2] for row in rows],
+        "page_url": [row[3] for row in rows],
+        "device_category": ["desktop"] * len(rows),
+        "browser": ["Chrome"] * len(rows),
+        "source": ["google"] * len(rows),
+        "medium": ["organic"] * len(rows),
+    })
+
+
+def by_session(table):
+    return {row["session_id"]: row for row in table.to_pylist()}
+
+
+def test_sessions_from_unsorted_events():
+    table = events([
+        ("u1.1", 5, "page_view", "/b"),
+        ("u2.1", 0, "page_view", "/x"),
+        ("u1.1", 0, "page_view", "/a"),
+        ("u1.1", 10, "conversion", "/b"),
+        ("u1.1", 3, "scroll", "/a"),
+    ])
+    sessions = by_session(sessionize(table))
+    assert sorted(sessions) == ["u1.1", "u2.1"]
+    first = sessions["u1.1"]
+    assert first["page_views"] == 2
+    assert first["conversions"] == 1
+    assert first["session_duration"] == 600
+    assert first["is_bounce"] == 0
+    assert (first["entry_page"], first["exit_page"]) == ("/a", "/b")
+    assert first["user_pseudo_id"] == "u1"
+    second = sessions["u2.1"]
+    assert second["is_bounce"] == 1
+    assert second["session_duration"] == 0
+    assert second["session_date"] == datetime.date(2024, 1, 1)
+
+
+def test_session_without_page_views_has_no_entry_page():
+    sessions = by_session(sessionize(events([("u1.1", 0, "scroll", "/a"), ("u1.1", 1, "user_engagement", "/a")])))
+    assert sessions["u1.1"]["page_views"] == 0
+    assert sessions["u1.1"]["entry_page"] is None
+    assert sessions["u1.1"]["exit_page"] is None
+
+
+def test_date_range_keeps_sessions_by_start_day():
+    table = events([
+        ("u1.1", 24 * 60 - 1, "page_view", "/a"),  # starts Jan 1, crosses midnight
+        ("u1.1", 24 * 60 + 1, "page_view", "/b"),
+        ("u2.1", 24 * 60 + 5, "page_view", "/a"),  # starts Jan 2
+    ])
+    sessions = by_session(sessionize(table, datetime.date(2024, 1, 1), datetime.date(2024, 1, 1)))
+    assert list(sessions) == ["u1.1"]
+    assert sessions["u1.1"]["page_views"] == 2
+
+
+def test_empty_events():
+    sessions = sessionize(events([]))
+    assert sessions.num_rows == 0
+    assert "session_duration" in sessions.column_names
@@ -0,0 +1,32 @@
+import datetime
+
+import pytest
+
+from database.shards import QueryBudgetExceeded, check_budget, format_bytes, shard_parameters, table_suffix_range
+
+
+def test_suffix_range_covers_the_daily_shards():
+    assert table_suffix_range(datetime.date(2024, 12, 30), datetime.date(2025, 1, 2)) == ("20241230", "20250102")
+    assert shard_parameters(datetime.date(2024, 3, 5), datetime.date(2024, 3, 5)) \
+        == {"start_suffix": "20240305", "end_suffix": "20240305"}
+
+
+def test_suffix_range_rejects_reversed_dates():
+    with pytest.raises(ValueError):
+        table_suffix_range(datetime.date(2024, 1, 2), datetime.date(2024, 1, 1))
+
+
+def test_check_budget():
+    check_budget("kpis", 100, budget=100)
+    check_budget("kpis", None, budget=100)  # no estimate: nothing to check
+    check_budget("kpis", 10 ** 15, budget=0)  # no budget
+    with pytest.raises(QueryBudgetExceeded) as error:
+        check_budget("kpis", 3 * 1024 ** 3, budget=1024 ** 3)
+    assert error.value.query_name == "kpis"
+    assert "3.0 GB" in str(error.value) and "1.0 GB" in str(error.value)
+
+
+def test_format_bytes():
+    assert format_bytes(512) == "512.0 B"
+    assert format_bytes(1536) == "1.5 KB"
+    assert format_bytes(5 * 1024 ** 4) == "5.0 TB"
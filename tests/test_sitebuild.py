@@ -0,0 +1,92 @@
+import os
+import re
+
+import pytest
+
+from sitebuild.build import STATIC_DIR, SiteBuild
+
+
+def write(root, path, content):
+    full = os.path.join(root, path)
+    os.makedirs(os.path.dirname(full), exist_ok=True)
+    with open(full, 'wb' if isinstance(content, bytes) else 'w') as f:
+        f.write(content)
+
+
+@pytest.fixture
+def site(tmp_path):
+    root = str(tmp_path / "site")
+    write(root, "css/style.css", "body { background: url('../img/bg.svg'); }")
+    write(root, "img/bg.svg", "<svg/>")
+    write(root, "img/copy-of-bg.svg", "<svg/>")
+    write(root, "js/app.js", "console.log(1);")
+    write(root, "about.html", "<html></html>")
+    out = str(tmp_path / "out")
+    os.makedirs(os.path.join(out, STATIC_DIR))
+    return SiteBuild(root, out, formats=[])
+
+
+def static_file(build, name):
+    with open(os.path.join(build.out_dir, STATIC_DIR, name), 'r') as f:
+        return f.read()
+
+
+def test_asset_references_point_at_hashed_static_files(site):
+    html = site.rewrite_html("tutorials/c/intro.html", (
+        '<link rel="stylesheet" href="/css/style.css">'
+        '<script src="../../js/app.js?v=2"></script>'
+        '<a href="/about.html#team">About</a>'
+        '<a href="#top">Top</a>'
+        '<script src="https://cdn.example.com/lib.js"></script>'
+        '<img src="/img/missing.png">'
+    ))
+    css, js = re.search(r'href="([^"]+\.css)"', html).group(1), re.search(r'src="([^"]+\.js\?v=2)"', html).group(1)
+    assert re.fullmatch(r"\.\./\.\./static/style\.[0-9a-f]{10}\.css", css)
+    assert re.fullmatch(r"\.\./\.\./static/app\.[0-9a-f]{10}\.js\?v=2", js)
+    # Page links, in-page anchors, other hosts and missing files are left alone
+    for unchanged in ('href="/about.html#team"', 'href="#top"', 'src="https://cdn.example.com/lib.js"',
+                      'src="/img/missing.png"'):
+        assert unchanged in html
+
+
+def test_stylesheet_urls_are_rewritten_inside_static(site):
+    site.rewrite_html("index.html", '<link rel="stylesheet" href="css/style.css">')
+    css = static_file(site, site.published["css/style.css"])
+    assert re.fullmatch(r"body \{ background: url\('bg\.[0-9a-f]{10}\.svg'\); \}", css)
+
+
+def test_identical_files_share_one_static_file(site):
+    html = site.rewrite_html("index.html", '<img src="img/bg.svg"><img src="img/copy-of-bg.svg">')
+    sources = re.findall(r'src="([^"]+)"', html)
+    assert len(sources) == 2 and sources[0] == sources[1]
+    assert site.published["img/bg.svg"] == site.published["img/copy-of-bg.svg"]
+
+
+def test_srcset_candidates_are_rewritten(site):
+    html = site.rewrite_html("index.html", '<img srcset="img/bg.svg 1x, https://example.org/x.svg 2x">')
+    assert re.search(r'srcset="static/bg\.[0-9a-f]{10}\.svg 1x, https://example.org/x\.svg 2x"', html)
+
+
+def test_images_become_pictures_and_later_ones_are_lazy(tmp_path):
+    Image = pytest.importorskip("PIL.Image")
+    from sitebuild.images import image_support
+
+    if "webp" not in image_support():
+        pytest.skip("Pillow was built without WebP")
+    root, out = str(tmp_path / "site"), str(tmp_path / "out")
+    os.makedirs(os.path.join(root, "img"))
+    Image.new("RGB", (1200, 600), "navy").save(os.path.join(root, "img", "hero.png"))
+    Image.new("RGB", (300, 300), "teal").save(os.path.join(root, "img", "thumb.jpg"))
+    os.makedirs(os.path.join(out, STATIC_DIR))
+    build = SiteBuild(root, out, formats=["webp"])
+    html = build.rewrite_html("index.html", '<img src="img/hero.png" alt="Hero"><img src="img/thumb.jpg" alt="">')
+    pictures = re.findall(r"<picture>.*?</picture>", html)
+    assert len(pictures) == 2
+    assert re.search(r'<source type="image/webp" srcset="static/hero-480w\.[0-9a-f]{10}\.webp 480w, '
+                     r'static/hero-960w\.[0-9a-f]{10}\.webp 960w, static/hero-1200w\.[0-9a-f]{10}\.webp 1200w"',
+                     pictures[0])
+    assert 'loading="lazy"' not in pictures[0]
+    assert '<img loading="lazy" decoding="async" src="static/thumb.' in pictures[1]
+    # An <img> already inside a <picture> is left as it is
+    nested = '<picture><source srcset="a.webp"><img src="img/thumb.jpg"></picture>'
+    assert "<picture><picture>" not in build.rewrite_html("other.html", nested)
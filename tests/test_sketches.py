@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from database.sketches import CountMin, HyperLogLog, SpaceSaving
+
+
+def test_hyperloglog_merge_counts_the_union():
+    left, right = HyperLogLog(), HyperLogLog()
+    left.add_many([f"user{i}" for i in range(0, 60_000)])
+    right.add_many([f"user{i}" for i in range(40_000, 100_000)])
+    merged = HyperLogLog().merge(left).merge(right)
+    assert abs(merged.count() - 100_000) <= 4 * merged.relative_error * 100_000
+    # Merging is idempotent: the union with itself does not change
+    assert HyperLogLog().merge(merged).merge(merged).count() == merged.count()
+
+
+def test_hyperloglog_small_and_empty():
+    hll = HyperLogLog()
+    assert hll.count() == 0
+    hll.add_many([])
+    assert hll.count() == 0
+    hll.add_many(["a", "b", "c", "a"])
+    assert hll.count() == 3
+
+
+def test_hyperloglog_rejects_other_precision():
+    with pytest.raises(ValueError):
+        HyperLogLog(12).merge(HyperLogLog(14))
+
+
+def test_space_saving_merge_is_exact_under_capacity():
+    left = SpaceSaving(10).update(["a", "b", "a"], [1, 2, 3])
+    right = SpaceSaving(10).update(["b", "c"], [5, 1])
+    merged = left.merge(right)
+    assert dict(zip(merged.items, merged.counts)) == {"a": 4, "b": 7, "c": 1}
+    assert merged.errors.tolist() == [0, 0, 0]
+    assert merged.floor == 0
+
+
+def test_space_saving_merge_bounds_counts_past_capacity():
+    rng = np.random.default_rng(3)
+    items = rng.zipf(1.5, size=20_000) % 500
+    exact = np.bincount(items, minlength=500)
+    days = [SpaceSaving(50).update(chunk.astype(str), np.ones(len(chunk), dtype=np.int64))
+            for chunk in np.array_split(items, 8)]
+    merged = SpaceSaving(50)
+    for day in days:
+        merged.merge(day)
+    assert len(merged.items) == 50
+    for item, count, error in zip(merged.items, merged.counts, merged.errors):
+        assert count - error <= exact[int(item)] <= count
+    # Anything not kept could not have been heavier than the floor
+    missing = np.setdiff1d(np.arange(500), merged.items.astype(int))
+    assert exact[missing].max() <= merged.floor
+    # The heaviest items survive the merges
+    assert set(np.argsort(-exact)[:5].astype(str)) <= set(merged.items)
+
+
+def test_count_min_merge_equals_one_sketch_of_everything():
+    items = np.array([f"/page/{i % 300}" for i in range(5_000)], dtype=object)
+    weights = np.arange(5_000) % 7 + 1
+    whole = CountMin(256, 4).update(items, weights)
+    merged = CountMin(256, 4).update(items[:2_000], weights[:2_000]).merge(
+        CountMin(256, 4).update(items[2_000:], weights[2_000:])
+    )
+    assert np.array_equal(whole.table, merged.table)
+    exact = {}
+    for item, weight in zip(items, weights):
+        exact[item] = exact.get(item, 0) + weight
+    keys = list(exact)
+    assert (merged.estimate(np.array(keys, dtype=object)) >= np.array([exact[k] for k in keys])).all()
+    assert len(merged.estimate([])) == 0
+
+
+def test_count_min_rejects_other_shape():
+    with pytest.raises(ValueError):
+        CountMin(256, 4).merge(CountMin(128, 4))
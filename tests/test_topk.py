@@ -0,0 +1,113 @@
+import datetime
+import os
+
+import numpy as np
+import pyarrow as pa
+import pytest
+
+from database import topk
+from database.topk import DIMENSIONS, get_day_sketches, load_day, save_day, top_k
+
+DAY = datetime.date(2020, 1, 1)
+
+
+def day(offset):
+    return DAY + datetime.timedelta(days=offset)
+
+
+def counts(rows):
+    """phase_4_daily_topk_counts.sql rows from (day offset, dimension, item, weight) tuples."""
+    return pa.table({
+        "event_date": pa.array([day(row[0]) for row in rows], pa.date32()),
+        "dimension": [row[1] for row in rows],
+        "item": [row[2] for row in rows],
+        "weight": pa.array([row[3] for row in rows], pa.int64()),
+    })
+
+
+def complete(offset, page="/a", weight=3):
+    return [(offset, "page_url", page, weight), (offset, "source", "google", 2), (offset, "browser", "Chrome", 2)]
+
+
+class FakeQuery:
+    """Stands in for the sketch query: serves rows from self.rows and records the ranges asked for."""
+
+    def __init__(self):
+        self.rows = counts([])
+        self.calls = []
+
+    def __call__(self, name, start_date, end_date, **kwargs):
+        self.calls.append((start_date, end_date))
+        dates = self.rows.column("event_date").to_pylist()
+        return self.rows.filter(pa.array([start_date <= d <= end_date for d in dates], pa.bool_()))
+
+
+@pytest.fixture
+def query(monkeypatch):
+    fake = FakeQuery()
+    monkeypatch.setattr(topk, "run_query", fake)
+    return fake
+
+
+def stored(sketch_dir):
+    return sorted(os.listdir(sketch_dir)) if os.path.isdir(sketch_dir) else []
+
+
+def test_only_days_the_rollups_cover_are_saved(tmp_path, query):
+    # Day 1 is empty before covered day 2; day 3 has pages but no sessions yet; day 4 is empty after it
+    query.rows = counts(complete(0) + complete(2) + [(3, "page_url", "/b", 1)])
+    get_day_sketches(day(0), day(4), sketch_dir=str(tmp_path))
+    assert stored(tmp_path) == ["2020-01-01.npz", "2020-01-02.npz", "2020-01-03.npz"]
+
+
+def test_saved_days_are_not_queried_again(tmp_path, query):
+    query.rows = counts(complete(0) + complete(1))
+    get_day_sketches(day(0), day(1), sketch_dir=str(tmp_path))
+    get_day_sketches(day(0), day(1), sketch_dir=str(tmp_path))
+    assert query.calls == [(day(0), day(1))]
+
+
+def test_open_days_are_never_saved(tmp_path, query):
+    today = datetime.date.today()
+    query.rows = pa.table({
+        "event_date": pa.array([today] * 3, pa.date32()),
+        "dimension": list(DIMENSIONS),
+        "item": ["/a", "google", "Chrome"],
+        "weight": pa.array([1, 1, 1], pa.int64()),
+    })
+    get_day_sketches(today, today, sketch_dir=str(tmp_path))
+    assert stored(tmp_path) == []
+
+
+def test_sketches_of_another_version_are_rebuilt(tmp_path, query, monkeypatch):
+    query.rows = counts(complete(0))
+    get_day_sketches(day(0), day(0), sketch_dir=str(tmp_path))
+    assert load_day(str(tmp_path), day(0)) is not None
+    monkeypatch.setattr(topk, "SKETCH_VERSION", "other")
+    assert load_day(str(tmp_path), day(0)) is None
+    get_day_sketches(day(0), day(0), sketch_dir=str(tmp_path))
+    assert len(query.calls) == 2
+
+
+def test_rebuild_ignores_stored_sketches(tmp_path, query):
+    query.rows = counts(complete(0, weight=3))
+    get_day_sketches(day(0), day(0), sketch_dir=str(tmp_path))
+    query.rows = counts(complete(0, weight=9))
+    get_day_sketches(day(0), day(0), sketch_dir=str(tmp_path), rebuild=True)
+    assert load_day(str(tmp_path), day(0))["page_url"].top(1)["estimate"].tolist() == [9]
+
+
+def test_save_and_load_round_trip(tmp_path):
+    sketches = topk.build_day_sketches(counts(complete(0, page="/a?utm=x") + [(0, "page_url", "/a#top", 2)]))[day(0)]
+    save_day(str(tmp_path), day(0), sketches)
+    loaded = load_day(str(tmp_path), day(0))
+    for dimension in DIMENSIONS:
+        assert np.array_equal(loaded[dimension].sketch.table, sketches[dimension].sketch.table)
+    # Query strings and fragments are stripped before counting
+    assert loaded["page_url"].top(5)[["item", "estimate"]].values.tolist() == [["/a", 5]]
+
+
+def test_top_k_merges_days(tmp_path, query):
+    query.rows = counts(complete(0, "/a", 3) + complete(1, "/b", 2) + complete(2, "/b", 2))
+    df = top_k("page_url", day(0), day(2), n=2, sketch_dir=str(tmp_path))
+    assert df[["item", "estimate", "error"]].values.tolist() == [["/b", 4, 0], ["/a", 3, 0]]
@@ -0,0 +1,127 @@
+/*
+  First-party analytics beacon for database/collector.py.
+  Include with:
+    <script async src="/js/beacon.js" data-endpoint="/collect"></script>
+  with the collector proxied at /collect on the site's origin (or its full URL).
+  Sends page_view on load, scroll at 90% depth and user_engagement (with
+  engagement_time_msec) when the page is hidden. Events are queued and sent
+  in batches; if the collector is busy (503) or unreachable they stay queued
+  for the next send.
+*/
+(function () {
+  'use strict';
+
+  var script = document.currentScript;
+  var endpoint = script && script.getAttribute('data-endpoint');
+  if (!endpoint || !window.JSON) return;
+
+  var SESSION_TIMEOUT_MS = 30 * 60 * 1000;
+  var FLUSH_DELAY_MS = 1000;
+  var MAX_QUEUE = 500;
+  var queue = [];
+  var timer = null;
+  var sending = false;
+
+  function store(key, value) {
+    try {
+      if (value === undefined) return window.localStorage.getItem(key);
+      window.localStorage.setItem(key, value);
+    } catch (e) {
+      return null;
+    }
+    return value;
+  }
+
+  // Client id: random, kept across visits, like GA4's user_pseudo_id
+  var clientId = store('_sk_cid');
+  if (!clientId) {
+    clientId = Math.floor(Math.random() * 2147483647) + '.' + Math.floor(Date.now() / 1000);
+    store('_sk_cid', clientId);
+  }
+
+  // Session id: start time in seconds, renewed after 30 minutes without events, like ga_session_id
+  function sessionId() {
+    var now = Date.now();
+    var session = (store('_sk_sid') || '').split('.');
+    if (session.length !== 2 || now - Number(session[1]) > SESSION_TIMEOUT_MS) {
+      session = [String(Math.floor(now / 1000)), ''];
+    }
+    store('_sk_sid', session[0] + '.' + now);
+    return session[0];
+  }
+
+  function send(useBeacon) {
+    timer = null;
+    // The page may be closing: sendBeacon goes out even while an XHR is in flight
+    if (!queue.length || (sending && !useBeacon)) return;
+    var batch = queue.splice(0, MAX_QUEUE);
+    // text/plain keeps the request "simple", so browsers skip the CORS preflight
+    var body = JSON.stringify({ sent: Date.now(), events: batch });
+    if (useBeacon && navigator.sendBeacon) {
+      if (!navigator.sendBeacon(endpoint, new Blob([body], { type: 'text/plain' }))) {
+        queue = batch.concat(queue);
+      }
+      return;
+    }
+    sending = true;
+    var xhr = new XMLHttpRequest();
+    xhr.open('POST', endpoint, true);
+    xhr.setRequestHeader('Content-Type', 'text/plain');
+    xhr.onloadend = function () {
+      sending = false;
+      if (xhr.status === 503 || xhr.status === 0) {
+        // Busy or unreachable: keep the events (up to MAX_QUEUE) and back off
+        queue = batch.concat(queue).slice(0, MAX_QUEUE);
+        schedule(5000);
+      } else if (queue.length) {
+        schedule(FLUSH_DELAY_MS);
+      }
+    };
+    xhr.send(body);
+  }
+
+  function schedule(delay) {
+    if (!timer) timer = setTimeout(send, delay);
+  }
+
+  function track(name, extra) {
+    var event = {
+      name: name,
+      ts: Date.now(),
+      cid: clientId,
+      sid: sessionId(),
+      url: location.href,
+      title: document.title,
+      ref: document.referrer
+    };
+    for (var key in extra) event[key] = extra[key];
+    if (queue.length < MAX_QUEUE) queue.push(event);
+    schedule(FLUSH_DELAY_MS);
+  }
+
+  // Engagement: time the page was visible, reported when it is hidden
+  var visibleSince = document.visibilityState === 'visible' ? Date.now() : null;
+  var engaged = 0;
+  document.addEventListener('visibilitychange', function () {
+    if (document.visibilityState === 'hidden') {
+      if (visibleSince !== null) engaged += Date.now() - visibleSince;
+      visibleSince = null;
+      if (engaged > 0) track('user_engagement', { engagement_time_msec: engaged });
+      engaged = 0;
+      send(true);
+    } else {
+      visibleSince = Date.now();
+    }
+  });
+
+  var scrolled = false;
+  window.addEventListener('scroll', function () {
+    var doc = document.documentElement;
+    if (!scrolled && window.scrollY + window.innerHeight >= 0.9 * doc.scrollHeight) {
+      scrolled = true;
+      track('scroll', {});
+    }
+  }, { passive: true });
+
+  track('page_view', {});
+})();